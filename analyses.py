@@ -0,0 +1,252 @@
+"""Model-backed portfolio analyses, shared by the Streamlit app and the headless batch runner."""
+import os
+
+from batching import BatchRunner
+from llm_cache import make_cache_key
+from prompt_encoding import (COMPETITOR_FIELDS, PROPERTY_FIELDS, RECOMMENDATION_FIELDS, PromptBudgetExceeded,
+                             TokenAccounting, encode_table, json_length, row_tokens, rows_within_budget)
+from single_flight import SingleFlight
+from spatial import CompetitorIndex
+from structured_output import (COMPETITOR_SCHEMA, MARKET_NARRATIVE_SCHEMA, RECOMMENDATIONS_SCHEMA, PartialJSONParser,
+                               json_generation_config, parse_reply, repair_prompt)
+
+# Model every analysis is asked of; part of every response cache key
+MODEL_NAME = 'gemini-1.5-pro'
+
+# Bump a prompt's version whenever its template changes so stale cached answers are not reused
+PROMPT_VERSIONS = {
+    "analyze_market_trends": 5,
+    "get_property_recommendations": 3,
+    "analyze_competitors": 4,
+    "summarize_chat": 1,
+}
+
+# Input-token budget per analysis prompt; data tables are trimmed to fit and the final prompt is checked
+PROMPT_TOKEN_BUDGETS = {
+    "analyze_market_trends": 4000,
+    "get_property_recommendations": 4000,
+    "analyze_competitors": 12000,
+}
+
+# Room left in each budget for the data tables once the instructions are counted
+PROMPT_TEMPLATE_ALLOWANCE = 400
+
+# Nearest competitors per property that make up its competitive set in the analysis prompt
+COMPETITIVE_SET_SIZE = int(os.getenv("PROPINSIGHT_COMPETITIVE_SET_SIZE", "5"))
+
+# Properties per recommendations request, on top of the token budget, and requests in flight at once
+RECOMMENDATION_BATCH_SIZE = int(os.getenv("PROPINSIGHT_RECOMMENDATION_BATCH_SIZE", "25"))
+RECOMMENDATION_CONCURRENCY = int(os.getenv("PROPINSIGHT_RECOMMENDATION_CONCURRENCY", "4"))
+
+
+class Analyst:
+    """Runs the analyses against one model backend, response cache and set of counters.
+
+    The app builds one per process and shares it between sessions and the
+    precompute worker; the batch runner builds its own. Every method is safe
+    to call from any thread.
+    """
+
+    def __init__(self, model, model_name, response_cache, metrics, token_accounting=None, single_flight=None):
+        self.model = model
+        self.model_name = model_name
+        self.response_cache = response_cache
+        self.metrics = metrics
+        self.token_accounting = token_accounting or TokenAccounting()
+        self.single_flight = single_flight or SingleFlight()
+        # Batches properties into recommendations requests and retries only the properties a batch failed on
+        self.recommendation_batches = BatchRunner(
+            self.recommend_batch,
+            cost=lambda prop: row_tokens(prop, RECOMMENDATION_FIELDS),
+            budget=PROMPT_TOKEN_BUDGETS["get_property_recommendations"] - PROMPT_TEMPLATE_ALLOWANCE,
+            check=lambda recommendations: None if recommendations else "no recommendations",
+            max_items=RECOMMENDATION_BATCH_SIZE,
+            max_workers=RECOMMENDATION_CONCURRENCY,
+            metrics=metrics,
+            name="get_property_recommendations",
+        )
+
+    def response_cache_key(self, name, *inputs):
+        return make_cache_key(name, PROMPT_VERSIONS[name], self.model_name, *inputs)
+
+    # Return name's cached answer for inputs, or compute it with one call however many sessions ask at once
+    def cached_single_flight(self, name, inputs, compute):
+        cache_key = self.response_cache_key(name, *inputs)
+        cached = self.response_cache.get(cache_key)
+        self.metrics.increment("propinsight_llm_cache_requests_total", analysis=name,
+                               result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+        def run():
+            # A call for the same key may have finished between the lookup above and taking the lead
+            cached = self.response_cache.get(cache_key, count=False)
+            if cached is not None:
+                return cached
+            result = compute()
+            self.response_cache.set(cache_key, result)
+            return result
+
+        return self.single_flight.do(cache_key, run)
+
+    # Build a prompt whose data tables fit name's token budget, send it, then record usage and the tokens saved.
+    # build_prompt(table_budget) returns (prompt, data_chars); legacy_chars is the data's length as JSON.
+    # If count_tokens shows the estimate-based trim overshot, the tables are refit once before giving up.
+    # Streamed responses report usage only once consumed, so their callers record it.
+    def generate_accounted(self, name, build_prompt, legacy_chars, stream=False, generation_config=None):
+        budget = PROMPT_TOKEN_BUDGETS[name]
+        table_budget = budget - PROMPT_TEMPLATE_ALLOWANCE
+        prompt, data_chars = build_prompt(table_budget)
+        prompt_tokens = self.model.count_tokens(prompt)
+        if prompt_tokens > budget:
+            table_budget = int(table_budget * budget / prompt_tokens * 0.9)
+            prompt, data_chars = build_prompt(table_budget)
+            prompt_tokens = self.model.count_tokens(prompt)
+        if prompt_tokens > budget:
+            raise PromptBudgetExceeded(f"{name} prompt is {prompt_tokens} tokens, over its budget of {budget}")
+        response = self.model.generate_content(prompt, stream=stream, generation_config=generation_config)
+        legacy_tokens = round(prompt_tokens * (len(prompt) - data_chars + legacy_chars) / len(prompt))
+        self.token_accounting.record(name, prompt_tokens, legacy_tokens)
+        if not stream:
+            self.token_accounting.record_usage(name, response.usage_metadata)
+        return response
+
+    # Request JSON matching schema, passing each growing partial result to on_partial while it streams.
+    # A reply that fails to decode or validate gets one targeted repair call; ValueError if that fails too.
+    def generate_structured(self, name, build_prompt, legacy_chars, schema, on_partial=None):
+        config = json_generation_config(schema)
+        response = self.generate_accounted(name, build_prompt, legacy_chars, stream=on_partial is not None,
+                                           generation_config=config)
+        if on_partial is None:
+            text = response.text
+        else:
+            parser = PartialJSONParser()
+            for chunk in response:
+                snapshot = parser.feed(chunk.text)
+                if snapshot is not None:
+                    on_partial(snapshot)
+            text = parser.text
+            self.token_accounting.record_usage(name, response.usage_metadata)
+
+        result, problems = parse_reply(text, schema)
+        if result is not None:
+            return result
+        repair = repair_prompt(text, schema, problems)
+        response = self.generate_accounted(name, lambda table_budget: (repair, 0), 0, generation_config=config)
+        result, problems = parse_reply(response.text, schema)
+        if result is None:
+            raise ValueError(f"{name} reply still failed validation after a repair: {'; '.join(problems)}")
+        return result
+
+    # Analyze market trends for property data. The figures are computed locally and exactly; the model only
+    # narrates them. on_partial receives the computed figures at once, then the narrative as it streams in.
+    def analyze_market_trends(self, market_data, on_partial=None):
+        def compute():
+            from market_analytics import FORECAST_PERIODS, ROLLING_WINDOW, SUMMARY_FIELDS, market_summary
+
+            summary = market_summary(market_data)
+            rent = next((row for row in summary if row["series"] == "avgRent"), None)
+            computed = {
+                "trend": rent["trend"] if rent else "stable",
+                "percentageChange": (rent["changePct"] or 0.0) if rent else 0.0,
+                "series": summary,
+            }
+            if on_partial is not None:
+                on_partial(computed)
+
+            def build_prompt(table_budget):
+                table = encode_table(summary, SUMMARY_FIELDS, table_budget)
+                prompt = f"""Write insights on the following rental market statistics. They were computed from the monthly
+        market data and are exact, so use them as given. One row per series, fields separated by "|":
+        changePct is the change over the whole period and lastChangePct over the latest month, rollingAvg the
+        {ROLLING_WINDOW}-month average, slopePctPerPeriod the fitted monthly trend as a percentage of the mean, and
+        forecast the linear projection {FORECAST_PERIODS} months ahead. The "trend" column classifies each series.
+        Series named "submarket:metric" cover one submarket; the others are the whole market.
+        {table}
+        
+        Respond in JSON: "insights" are three key observations and "recommendations" two actions."""
+                return prompt, len(table)
+
+            narrative_partial = None if on_partial is None else lambda partial: on_partial({**computed, **partial})
+            narrative = self.generate_structured("analyze_market_trends", build_prompt, json_length(market_data),
+                                                 MARKET_NARRATIVE_SCHEMA, narrative_partial)
+            return {**computed, "insights": narrative["insights"], "recommendations": narrative["recommendations"]}
+
+        return self.cached_single_flight("analyze_market_trends", (market_data,), compute)
+
+    # Recommendations for one batch of properties, keyed by id. Batches are packed to fit the prompt budget;
+    # rows still trimmed after a token recount are simply missing from the reply and get retried.
+    def recommend_batch(self, batch):
+        def build_prompt(table_budget):
+            table = encode_table(batch, RECOMMENDATION_FIELDS, table_budget)
+            prompt = f"""Based on the following property data, provide specific recommendations to optimize rental income and property management for each property.
+        The table has a header row and fields are separated by "|".
+        
+        {table}
+        
+        Respond in JSON: "results" has one entry per property, with its "id" from the table and
+        "recommendations" listing 3-5 actionable recommendations for that property."""
+            return prompt, len(table)
+
+        reply = self.generate_structured("get_property_recommendations", build_prompt, json_length(batch),
+                                         RECOMMENDATIONS_SCHEMA)
+        return {result["id"]: result["recommendations"] for result in reply["results"]}
+
+    # Generate property management recommendations for many properties at once, keyed by property id.
+    # Each property's answer is cached on its own, so only properties without one are sent to the model.
+    # Returns (recommendations by id, problem by id for properties that failed every attempt).
+    def get_property_recommendations(self, properties, on_partial=None):
+        results, missing = {}, []
+        for prop in properties:
+            cached = self.response_cache.get(self.response_cache_key("get_property_recommendations", prop))
+            self.metrics.increment("propinsight_llm_cache_requests_total", analysis="get_property_recommendations",
+                                   result="miss" if cached is None else "hit")
+            if cached is None:
+                missing.append(prop)
+            else:
+                results[prop["id"]] = cached
+
+        def progress(fresh):
+            if on_partial is not None:
+                on_partial({**results, **fresh})
+
+        fresh, failures = self.recommendation_batches.run(missing, progress)
+        for prop in missing:
+            if prop["id"] in fresh:
+                self.response_cache.set(self.response_cache_key("get_property_recommendations", prop),
+                                        fresh[prop["id"]])
+        results.update(fresh)
+        return results, failures
+
+    # Analyze competitor data; on_partial receives the analysis as it streams in
+    def analyze_competitors(self, competitor_data, your_properties, on_partial=None):
+        def compute():
+            index = CompetitorIndex(competitor_data)
+
+            def build_prompt(table_budget):
+                # Split the data allowance evenly between the two tables; the competitors are the nearest
+                # ones to the properties that fit, not the whole market
+                shown = your_properties[:rows_within_budget(your_properties, PROPERTY_FIELDS, table_budget // 2)]
+                competitive_set = index.competitive_set(shown, COMPETITIVE_SET_SIZE)
+                properties_table = encode_table(your_properties, PROPERTY_FIELDS, table_budget // 2)
+                competitors_table = encode_table(competitive_set, COMPETITOR_FIELDS, table_budget // 2)
+                prompt = f"""Compare the following competitor data with my properties and suggest competitive strategies.
+        Each table has a header row; fields are separated by "|" and amenities by ";".
+        Competitors are the {COMPETITIVE_SET_SIZE} nearest to each of my properties; proximity is the distance in miles
+        to the nearest of my properties, named in nearestProperty.
+        
+        My properties:
+        {properties_table}
+        
+        Competitors:
+        {competitors_table}
+        
+        Respond in JSON: "competitivePosition" rates my overall position, "strengths", "weaknesses",
+        "opportunities" and "threats" form a SWOT analysis of two points each, and "strategies" lists three strategies."""
+                return prompt, len(properties_table) + len(competitors_table)
+
+            return self.generate_structured("analyze_competitors", build_prompt,
+                                            json_length(your_properties) + json_length(competitor_data),
+                                            COMPETITOR_SCHEMA, on_partial)
+
+        return self.cached_single_flight("analyze_competitors", (competitor_data, your_properties), compute)
@@ -0,0 +1,218 @@
+"""Headless batch analysis: refresh the market, competitor and per-property analyses for a whole dataset.
+
+Runs the same analyses as the app, without Streamlit, as a pipeline: a reader
+stage streams work items from the data store, a pool of async workers runs
+them, and a writer appends each finished result to a JSONL file. Model calls
+run on threads behind one shared scheduler, so every worker stays within the
+same rate limits the app uses.
+
+The output file is also the checkpoint. Each line is flushed to disk as soon
+as its item finishes, and a rerun skips every item already in the file, so a
+run that crashed or was stopped resumes without redoing finished work. Items
+that failed are written as error lines and are retried on the next run.
+
+Usage:
+    python batch_analysis.py results.jsonl --db portfolio.db
+    python batch_analysis.py results.jsonl --analyses recommendations --workers 8
+    python batch_analysis.py results.jsonl --fresh      # discard earlier results and start over
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from analyses import MODEL_NAME, RECOMMENDATION_BATCH_SIZE, Analyst
+from datastore import PortfolioStore
+from llm import backend_from_env
+from llm_cache import cache_from_env
+from metrics import InstrumentedBackend, Metrics
+from scheduler import ScheduledBackend, scheduler_from_env
+
+ANALYSES = ("market", "competitors", "recommendations")
+
+# Properties handed to a worker at a time; a few recommendation batches each
+DEFAULT_CHUNK_SIZE = 4 * RECOMMENDATION_BATCH_SIZE
+DEFAULT_WORKERS = 4
+
+
+class ResultLog:
+    """Append-only JSONL of finished items that doubles as the run's checkpoint.
+
+    Lines are ``{"analysis", "key", "result" or "error", "computedAt"}``. Each
+    write is flushed and fsynced, so after a crash the file holds every item
+    that finished plus at most one torn last line, which reopening drops.
+    """
+
+    def __init__(self, path, fresh=False):
+        self.path = path
+        self.done = set()
+        self.resumed = 0
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(complete)
+        for line in data[:complete].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if "result" in entry:
+                self.done.add((entry["analysis"], entry["key"]))
+        self.resumed = len(self.done)
+
+    # Append entries and make them durable before returning
+    def write(self, entries):
+        for entry in entries:
+            self._file.write(json.dumps(entry, default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.update((entry["analysis"], entry["key"]) for entry in entries if "result" in entry)
+
+    def close(self):
+        self._file.close()
+
+
+def _entry(analysis, key, result=None, error=None):
+    entry = {"analysis": analysis, "key": key, "computedAt": datetime.now().isoformat(timespec="seconds")}
+    if error is None:
+        entry["result"] = result
+    else:
+        entry["error"] = error
+    return entry
+
+
+# Work items in the order they run: the portfolio-wide analyses, then properties in id order, chunk_size
+# at a time, leaving out whatever done already holds
+def plan_items(store, analyses, chunk_size, done):
+    for analysis in ("market", "competitors"):
+        if analysis in analyses and (analysis, analysis) not in done:
+            yield analysis, None
+    if "recommendations" not in analyses:
+        return
+    chunk = []
+    for prop in store.iter_records("properties"):
+        if ("recommendations", prop["id"]) in done:
+            continue
+        chunk.append(prop)
+        if len(chunk) == chunk_size:
+            yield "recommendations", chunk
+            chunk = []
+    if chunk:
+        yield "recommendations", chunk
+
+
+# Run one work item and return its log entries, one per analysed record; failures become error entries
+def run_item(analyst, store, analysis, payload):
+    if analysis == "recommendations":
+        results, failures = analyst.get_property_recommendations(payload)
+        return [
+            _entry(analysis, prop["id"], results[prop["id"]]) if prop["id"] in results
+            else _entry(analysis, prop["id"], error=failures.get(prop["id"], "no result"))
+            for prop in payload
+        ]
+    try:
+        if analysis == "market":
+            result = analyst.analyze_market_trends(store.list_market_data())
+        else:
+            result = analyst.analyze_competitors(store.list_competitors(), store.list_properties())
+    except Exception as e:
+        return [_entry(analysis, analysis, error=f"{type(e).__name__}: {e}")]
+    return [_entry(analysis, analysis, result)]
+
+
+# Reader -> workers -> writer pipeline; returns (entries written, errors written)
+async def run_pipeline(analyst, store, log, analyses, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                       progress=None):
+    queue = asyncio.Queue(maxsize=workers * 2)
+    counts = {"written": 0, "errors": 0}
+
+    async def read():
+        items = plan_items(store, analyses, chunk_size, set(log.done))
+        while True:
+            # The store is read on a thread so a slow query never stalls the workers
+            item = await asyncio.to_thread(next, items, None)
+            if item is None:
+                break
+            await queue.put(item)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            entries = await asyncio.to_thread(run_item, analyst, store, *item)
+            # Workers share the event loop thread, so writes never interleave
+            log.write(entries)
+            counts["written"] += len(entries)
+            counts["errors"] += sum("error" in entry for entry in entries)
+            if progress:
+                progress(counts)
+
+    await asyncio.gather(read(), *(work() for _ in range(workers)))
+    return counts["written"], counts["errors"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="JSONL file of results, and the checkpoint a rerun resumes from")
+    parser.add_argument("--db", default=os.getenv("PROPINSIGHT_DB_PATH"), help="SQLite file (default: PROPINSIGHT_DB_PATH)")
+    parser.add_argument("--analyses", nargs="+", choices=ANALYSES, default=list(ANALYSES))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="work items in flight at once")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="properties per work item")
+    parser.add_argument("--fresh", action="store_true", help="discard earlier results instead of resuming")
+    parser.add_argument("--metrics", default=os.getenv("PROPINSIGHT_METRICS_PATH"),
+                        help="write run metrics here in the Prometheus text format (default: PROPINSIGHT_METRICS_PATH)")
+    load_dotenv()
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error("--db is required when PROPINSIGHT_DB_PATH is not set")
+    if os.getenv("PROPINSIGHT_LLM_BACKEND", "gemini") in ("gemini", "record") and not os.getenv("GEMINI_API_KEY"):
+        parser.error("GEMINI_API_KEY is not set")
+
+    metrics = Metrics()
+    model = ScheduledBackend(InstrumentedBackend(backend_from_env(MODEL_NAME), metrics), scheduler_from_env())
+    analyst = Analyst(model, MODEL_NAME, cache_from_env(), metrics)
+    store = PortfolioStore(args.db)
+    log = ResultLog(args.output, fresh=args.fresh)
+    if log.resumed:
+        print(f"Resuming: {log.resumed:,} finished items in {args.output} are skipped")
+
+    started = time.perf_counter()
+
+    def show_progress(counts):
+        elapsed = time.perf_counter() - started
+        print(f"\r{counts['written']:,} written, {counts['errors']:,} failed, {elapsed:,.0f}s", end="", flush=True)
+
+    try:
+        written, errors = asyncio.run(run_pipeline(analyst, store, log, set(args.analyses), args.chunk_size,
+                                                   args.workers, show_progress))
+    finally:
+        log.close()
+        if args.metrics:
+            metrics.write_prometheus(args.metrics)
+    print()
+    print(f"{written:,} items written in {time.perf_counter() - started:,.1f}s, {errors:,} failed "
+          f"({analyst.recommendation_batches.stats()['batches']:,} recommendation batches)")
+    if errors:
+        print("Rerun the same command to retry the failed items.", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
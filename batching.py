@@ -0,0 +1,115 @@
+"""Token-budgeted batching of per-record model requests, with bounded concurrency and per-item retries."""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# Split items, in order, into batches whose summed cost stays within budget and length within max_items.
+# An item that alone exceeds the budget gets a batch of its own.
+def pack_batches(items, cost, budget, max_items=None):
+    batches = []
+    batch, used = [], 0
+    for item in items:
+        item_cost = cost(item)
+        if batch and (used + item_cost > budget or (max_items is not None and len(batch) >= max_items)):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(item)
+        used += item_cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class BatchRunner:
+    """Sends items through ``run_batch(batch) -> {key: result}`` a batch at a time.
+
+    Batches are packed to ``budget`` by ``cost`` and run at most
+    ``max_workers`` at once. Only the items a batch failed on (missing from its
+    reply, rejected by ``check``, or all of them if the call raised) are
+    retried, in new batches, up to ``max_attempts`` tries per item. A batch
+    that raised is retried in halves so one bad item cannot sink the rest.
+    """
+
+    def __init__(self, run_batch, cost, budget, key=lambda item: item["id"], check=None, max_items=None,
+                 max_workers=4, max_attempts=3, metrics=None, name="batch"):
+        self.run_batch = run_batch
+        self.cost = cost
+        self.budget = budget
+        self.key = key
+        self.check = check
+        self.max_items = max_items
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.metrics = metrics
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "retry_batches": 0, "items": 0, "retried": 0, "failed": 0}
+
+    def _count(self, metric, amount=1, **labels):
+        if self.metrics is not None and amount:
+            self.metrics.increment(metric, amount, analysis=self.name, **labels)
+
+    # Results of one finished batch: ({key: result}, [(item, problem)] for the items it failed on)
+    def _settle(self, batch, future):
+        try:
+            replies = future.result()
+            error = None
+        except Exception as e:
+            replies, error = {}, f"{type(e).__name__}: {e}"
+        done, failed = {}, []
+        for item in batch:
+            key = self.key(item)
+            reply = replies.get(key)
+            problem = error or ("missing from the reply" if reply is None else self.check and self.check(reply))
+            if problem:
+                failed.append((item, problem))
+            else:
+                done[key] = reply
+        return done, failed, error is not None
+
+    # Run every item; returns ({key: result}, {key: problem} for items that failed every attempt).
+    # on_progress, if given, receives a copy of the results so far after each batch.
+    def run(self, items, on_progress=None):
+        results, failures = {}, {}
+        if not items:
+            return results, failures
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"propinsight-{self.name}") as pool:
+            pending = {}
+
+            def submit(batches, attempt):
+                for batch in batches:
+                    pending[pool.submit(self.run_batch, batch)] = (batch, attempt)
+                with self._lock:
+                    self._stats["batches" if attempt == 1 else "retry_batches"] += len(batches)
+                self._count("propinsight_llm_batches_total", len(batches), attempt="first" if attempt == 1 else "retry")
+
+            submit(pack_batches(items, self.cost, self.budget, self.max_items), 1)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch, attempt = pending.pop(future)
+                    done, failed, raised = self._settle(batch, future)
+                    results.update(done)
+                    retry = []
+                    for item, problem in failed:
+                        if attempt < self.max_attempts:
+                            retry.append(item)
+                        else:
+                            failures[self.key(item)] = problem
+                    if retry:
+                        max_items = max(1, len(batch) // 2) if raised else self.max_items
+                        submit(pack_batches(retry, self.cost, self.budget, max_items), attempt + 1)
+                    with self._lock:
+                        self._stats["items"] += len(done) + len(failed) - len(retry)
+                        self._stats["retried"] += len(retry)
+                        self._stats["failed"] += len(failed) - len(retry)
+                    self._count("propinsight_llm_batch_items_total", len(done), result="ok")
+                    self._count("propinsight_llm_batch_items_total", len(retry), result="retried")
+                    self._count("propinsight_llm_batch_items_total", len(failed) - len(retry), result="failed")
+                    if on_progress is not None:
+                        on_progress(dict(results))
+        return results, failures
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,254 @@
+"""Per-page performance regression benchmark for main.py.
+
+Runs every page headlessly with streamlit.testing.v1.AppTest against the
+offline fake model backend, at several portfolio sizes, and records script-run
+wall time, model calls, peak traced memory and the size of the session's
+state afterwards, which should stay small since records are shared by the
+process rather than copied into sessions. Each page is measured in a new
+session once the process-wide caches are loaded and the background precompute
+worker has caught up, so model calls counted are the ones the page makes itself. Results are compared with a
+stored baseline; any extra model call, or time/memory growth beyond the
+tolerance, fails the run with a non-zero exit code.
+
+Usage:
+    python benchmarks/page_bench.py                      # compare with baseline.json
+    python benchmarks/page_bench.py --update-baseline    # record a new baseline
+    python benchmarks/page_bench.py --sizes 10 1000      # limit the portfolio sizes
+
+Timings are machine-dependent, so record the baseline on the machine that
+runs the comparison.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "main.py")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+PAGES = ["Dashboard", "Properties", "Financials", "Market Trends", "Competitor Analysis", "AI Assistant"]
+DEFAULT_SIZES = [10, 1000, 50000]
+
+# Absolute slack added to the relative tolerances so tiny measurements don't flap
+TIME_SLACK_SECONDS = 0.05
+MEMORY_SLACK_MB = 1.0
+SESSION_SLACK_KB = 4.0
+
+# Bounding box the synthetic properties and competitors are scattered over, roughly 40 x 30 miles
+METRO_LATITUDES = (39.55, 39.95)
+METRO_LONGITUDES = (-105.15, -104.70)
+
+# Always benchmark against the offline backend, with no model latency
+os.environ["PROPINSIGHT_LLM_BACKEND"] = "fake"
+os.environ["PROPINSIGHT_FAKE_LATENCY_MS"] = "0"
+os.environ["PROPINSIGHT_FAKE_TOKENS_PER_SEC"] = "0"
+sys.path.insert(0, ROOT)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from datastore import PortfolioStore  # noqa: E402
+from llm import model_calls  # noqa: E402
+from metrics import deep_sizeof  # noqa: E402
+from precompute import running_workers  # noqa: E402
+
+# AppTest runs without a server, which streamlit reports as warnings on every run
+logging.disable(logging.WARNING)
+
+
+# Deterministic synthetic portfolio with n records of each kind
+def make_portfolio(n, seed=0):
+    rng = random.Random(seed)
+    # Coordinates come from their own generator so the other fields stay as they were
+    geo = random.Random(seed + 1)
+    statuses = ["occupied", "vacant", "pending_renewal"]
+    properties = [
+        {
+            "id": i,
+            "name": f"Property {i}",
+            "address": f"{i} Main Street, Springfield",
+            "units": rng.randint(4, 120),
+            "status": rng.choice(statuses),
+            "currentRent": rng.randint(900, 3500),
+            "lastRenoDate": f"20{rng.randint(10, 23)}-{rng.randint(1, 12):02d}-15",
+            "occupancyRate": round(rng.uniform(0.5, 1.0), 2),
+            "latitude": round(geo.uniform(*METRO_LATITUDES), 6),
+            "longitude": round(geo.uniform(*METRO_LONGITUDES), 6),
+        }
+        for i in range(1, n + 1)
+    ]
+    categories = {"income": ["rent", "fees"], "expense": ["maintenance", "utilities", "taxes"]}
+    financial_records = []
+    for i in range(1, n + 1):
+        record_type = rng.choice(["income", "expense"])
+        financial_records.append({
+            "id": i,
+            "propertyId": rng.randint(1, n),
+            "date": f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "type": record_type,
+            "amount": rng.randint(100, 50000),
+            "category": rng.choice(categories[record_type]),
+            "description": f"Record {i}",
+        })
+    market_data = [
+        {
+            "id": i,
+            "month": f"{2000 + (i - 1) // 12}-{(i - 1) % 12 + 1:02d}-01",
+            "avgPrice": rng.randint(200000, 400000),
+            "avgRent": rng.randint(1500, 2500),
+            "vacancyRate": round(rng.uniform(0.02, 0.1), 3),
+            "inventoryCount": rng.randint(50, 200),
+            "avgDaysOnMarket": rng.randint(10, 60),
+        }
+        for i in range(1, n + 1)
+    ]
+    competitors = [
+        {
+            "id": i,
+            "name": f"Competitor {i}",
+            "avgRent": rng.randint(1500, 2800),
+            "units": rng.randint(10, 200),
+            "occupancyRate": round(rng.uniform(0.7, 1.0), 2),
+            "amenities": rng.sample(["Pool", "Gym", "Covered Parking", "Pet Friendly", "Rooftop Terrace"], 2),
+            "proximity": round(rng.uniform(0.1, 10.0), 1),
+            "lastUpdated": "2023-04-01",
+            "latitude": round(geo.uniform(*METRO_LATITUDES), 6),
+            "longitude": round(geo.uniform(*METRO_LONGITUDES), 6),
+        }
+        for i in range(1, n + 1)
+    ]
+    return {
+        "properties": properties,
+        "financial_records": financial_records,
+        "market_data": market_data,
+        "competitors": competitors,
+    }
+
+
+# Write a portfolio to a SQLite file that main.py opens through PROPINSIGHT_DB_PATH
+def build_database(portfolio, path):
+    store = PortfolioStore(path)
+    for table, records in portfolio.items():
+        store.insert_many(table, records)
+
+
+# Run one page in a fresh session after priming the caches and return
+# (seconds, model calls, peak MB, KB the session's state holds afterwards)
+def run_page(page, trace_memory=False):
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    # Load the store and start the precompute worker and retrieval index, then let both finish their first pass
+    AppTest.from_file(APP_PATH, default_timeout=600).run()
+    for worker in running_workers():
+        worker.wake()
+        worker.wait_idle(timeout=600)
+    for thread in threading.enumerate():
+        if thread.name == "propinsight-retrieval-index":
+            thread.join(timeout=600)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.session_state["page"] = page
+
+    model_calls.reset()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    peak_mb = 0.0
+    if trace_memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+    if at.exception:
+        raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+    return elapsed, model_calls.value, peak_mb, deep_sizeof(at.session_state.filtered_state) / 1024
+
+
+def run_suite(sizes, repeat):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="propinsight-bench-")
+    for size in sizes:
+        db_path = os.path.join(workdir, f"portfolio-{size}.db")
+        build_database(make_portfolio(size), db_path)
+        os.environ["PROPINSIGHT_DB_PATH"] = db_path
+        for page in PAGES:
+            timings = []
+            for _ in range(repeat):
+                seconds, calls, _, session_kb = run_page(page)
+                timings.append(seconds)
+            # Memory is traced in a separate run because tracemalloc skews timings
+            _, _, peak_mb, _ = run_page(page, trace_memory=True)
+            key = f"{page}[{size}]"
+            results[key] = {"seconds": round(min(timings), 4), "model_calls": calls, "peak_mb": round(peak_mb, 2),
+                            "session_kb": round(session_kb, 1)}
+            print(f"{key:<32} {min(timings):8.3f}s {calls:3d} calls {peak_mb:9.2f} MB {session_kb:7.1f} KB/session",
+                  flush=True)
+    return results
+
+
+# Return a list of human-readable regressions against the baseline
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    failures = []
+    for key, current in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if current["model_calls"] > expected["model_calls"]:
+            failures.append(f"{key}: {current['model_calls']} model calls (baseline {expected['model_calls']})")
+        if current["seconds"] > expected["seconds"] * time_tolerance + TIME_SLACK_SECONDS:
+            failures.append(f"{key}: {current['seconds']:.3f}s (baseline {expected['seconds']:.3f}s)")
+        if current["peak_mb"] > expected["peak_mb"] * memory_tolerance + MEMORY_SLACK_MB:
+            failures.append(f"{key}: {current['peak_mb']:.2f} MB peak (baseline {expected['peak_mb']:.2f} MB)")
+        if "session_kb" in expected and current["session_kb"] > expected["session_kb"] * memory_tolerance + SESSION_SLACK_KB:
+            failures.append(f"{key}: {current['session_kb']:.1f} KB per session (baseline {expected['session_kb']:.1f} KB)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per page; the fastest is kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--time-tolerance", type=float, default=1.5)
+    parser.add_argument("--memory-tolerance", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.repeat)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first.")
+        return 1
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    failures = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if not failures:
+        print("No regressions against baseline.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Token-budgeted conversation context for the AI Assistant chat."""
+
+ROLE_LABELS = {"user": "User", "assistant": "PropInsight"}
+
+
+def format_turn(message):
+    return f"{ROLE_LABELS.get(message['role'], message['role'])}: {message['content']}"
+
+
+class ChatContext:
+    """Rolling summary of older turns plus a window of recent turns that fits a token budget.
+
+    Token counts are cached on each history message under ``"tokens"``, so every
+    message is counted once. When the window overflows, the oldest turns are
+    folded into the summary until the window is back under ``target_ratio`` of
+    the budget, which keeps compaction (one summarization call) occasional.
+    """
+
+    def __init__(self, budget, target_ratio=0.5):
+        self.budget = budget
+        self.target_ratio = target_ratio
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summarized_upto = 0
+
+    @staticmethod
+    def _tokens(message, count_tokens):
+        if "tokens" not in message:
+            message["tokens"] = count_tokens(format_turn(message))
+        return message["tokens"]
+
+    # Return the conversation block for a prompt whose fixed parts use reserved_tokens
+    def build(self, history, reserved_tokens, count_tokens, summarize):
+        # History can be cleared or replaced, which invalidates the summary
+        if self.summarized_upto > len(history):
+            self.summary, self.summary_tokens, self.summarized_upto = "", 0, 0
+
+        window = history[self.summarized_upto:]
+        available = max(0, self.budget - reserved_tokens - self.summary_tokens)
+        window_tokens = sum(self._tokens(m, count_tokens) for m in window)
+
+        if window_tokens > available:
+            target = available * self.target_ratio
+            folded = 0
+            while folded < len(window) and window_tokens > target:
+                window_tokens -= self._tokens(window[folded], count_tokens)
+                folded += 1
+            turns = "\n".join(format_turn(m) for m in window[:folded])
+            summary = summarize(self.summary, turns)
+            # If summarization fails the folded turns are dropped rather than overflowing the budget
+            if summary is not None:
+                self.summary = summary
+                self.summary_tokens = count_tokens(summary)
+            self.summarized_upto += folded
+            window = window[folded:]
+
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+        if window:
+            parts.append("Recent conversation:\n" + "\n".join(format_turn(m) for m in window))
+        return "\n\n".join(parts)
@@ -0,0 +1,321 @@
+"""Embedded SQLite store for portfolio data, shared by every Streamlit session."""
+import json
+import sqlite3
+import threading
+from collections import deque
+
+# Column definitions per table; NUMERIC keeps whole numbers as integers
+SCHEMA = {
+    "properties": [
+        ("id", "INTEGER PRIMARY KEY"),
+        ("name", "TEXT NOT NULL"),
+        ("address", "TEXT"),
+        ("units", "INTEGER"),
+        ("status", "TEXT"),
+        ("currentRent", "NUMERIC"),
+        ("lastRenoDate", "TEXT"),
+        ("occupancyRate", "NUMERIC"),
+        ("latitude", "REAL"),
+        ("longitude", "REAL"),
+    ],
+    "financial_records": [
+        ("id", "INTEGER PRIMARY KEY"),
+        ("propertyId", "INTEGER"),
+        ("date", "TEXT"),
+        ("type", "TEXT"),
+        ("amount", "NUMERIC"),
+        ("category", "TEXT"),
+        ("description", "TEXT"),
+    ],
+    "market_data": [
+        ("id", "INTEGER PRIMARY KEY"),
+        ("month", "TEXT"),
+        ("avgPrice", "NUMERIC"),
+        ("avgRent", "NUMERIC"),
+        ("vacancyRate", "NUMERIC"),
+        ("inventoryCount", "INTEGER"),
+        ("avgDaysOnMarket", "NUMERIC"),
+        ("submarket", "TEXT"),
+    ],
+    "competitors": [
+        ("id", "INTEGER PRIMARY KEY"),
+        ("name", "TEXT NOT NULL"),
+        ("avgRent", "NUMERIC"),
+        ("units", "INTEGER"),
+        ("occupancyRate", "NUMERIC"),
+        ("amenities", "TEXT"),
+        ("proximity", "NUMERIC"),
+        ("lastUpdated", "TEXT"),
+        ("latitude", "REAL"),
+        ("longitude", "REAL"),
+    ],
+}
+
+INDEXES = [
+    ("properties", "status"),
+    ("properties", "name"),
+    ("properties", "currentRent"),
+    ("properties", "occupancyRate"),
+    ("market_data", "month"),
+]
+
+# Indexes older files were created with that no query uses; each one only slowed down bulk inserts
+DROPPED_INDEXES = [
+    ("financial_records", "propertyId"),
+    ("financial_records", "date"),
+    ("financial_records", "type"),
+    ("financial_records", "category"),
+]
+
+# Columns the property lists may be sorted by
+PROPERTY_SORT_COLUMNS = ("id", "name", "currentRent", "occupancyRate")
+
+# Writes remembered for incremental consumers; older history forces a full rebuild
+CHANGE_LOG_SIZE = 256
+
+# Columns stored as JSON text and decoded on read
+JSON_COLUMNS = {"competitors": {"amenities"}}
+
+# Tables whose rows carry a version, for caches keyed on individual records
+VERSIONED_TABLES = ("properties",)
+
+
+class PortfolioStore:
+    """Thread-safe access to properties, financial records, market data and competitors.
+
+    ``version`` increases on every write so callers can key derived data on it,
+    ``table_version`` is the version that last wrote any of the given tables, for
+    data derived from only some of them, and ``changes_since`` reports which
+    rows recent writes touched. Rows of
+    ``VERSIONED_TABLES`` also remember the version that last wrote them.
+    Writes committed to the same file by another process (the importer CLI,
+    for one) also bump ``version``; since their rows are unknown they count
+    as a change to everything, so consumers rebuild from scratch.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._version = 0
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self._table_versions = dict.fromkeys(SCHEMA, 0)
+        self._row_versions = {table: {} for table in VERSIONED_TABLES}
+        # Version of rows written before this process or without an id; every such row shares it
+        self._base_versions = dict.fromkeys(VERSIONED_TABLES, 0)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            for table, columns in SCHEMA.items():
+                column_sql = ", ".join(f'"{name}" {kind}' for name, kind in columns)
+                self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_sql})")
+                # Files created before a column was added get it as NULLs
+                existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for name, kind in columns:
+                    if name not in existing:
+                        self._conn.execute(f'ALTER TABLE {table} ADD COLUMN "{name}" {kind}')
+            for table, column in INDEXES:
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ("{column}")')
+            for table, column in DROPPED_INDEXES:
+                self._conn.execute(f"DROP INDEX IF EXISTS idx_{table}_{column}")
+            self._conn.commit()
+            # Changes only when another connection commits, never for this one's own writes
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # Bump the version, forgetting the change log and row versions, if another process wrote to the file
+    def _check_external_writes(self):
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        self._version += 1
+        self._changes.clear()
+        self._table_versions = dict.fromkeys(SCHEMA, self._version)
+        for table in VERSIONED_TABLES:
+            self._base_versions[table] = self._version
+            self._row_versions[table].clear()
+
+    @property
+    def version(self):
+        with self._lock:
+            self._check_external_writes()
+            return self._version
+
+    # Version that last wrote any of the given tables
+    def table_version(self, *tables):
+        with self._lock:
+            self._check_external_writes()
+            return max(self._table_versions[table] for table in tables)
+
+    def _rows(self, table, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        json_columns = JSON_COLUMNS.get(table, ())
+        records = []
+        for row in rows:
+            record = dict(row)
+            for column in json_columns:
+                if record.get(column) is not None:
+                    record[column] = json.loads(record[column])
+            records.append(record)
+        return records
+
+    # Bulk insert or replace records into a table
+    def insert_many(self, table, records):
+        columns = [name for name, _ in SCHEMA[table]]
+        json_columns = JSON_COLUMNS.get(table, ())
+        placeholders = ", ".join("?" for _ in columns)
+        column_sql = ", ".join(f'"{name}"' for name in columns)
+        ids = []
+
+        def rows():
+            for r in records:
+                ids.append(r.get("id"))
+                yield tuple(json.dumps(r.get(c)) if c in json_columns else r.get(c) for c in columns)
+
+        with self._lock:
+            self._conn.executemany(f"INSERT OR REPLACE INTO {table} ({column_sql}) VALUES ({placeholders})", rows())
+            self._conn.commit()
+            self._check_external_writes()
+            self._version += 1
+            self._changes.append((self._version, table, ids))
+            self._table_versions[table] = self._version
+            if table in self._row_versions:
+                if None in ids:
+                    self._base_versions[table] = self._version
+                    self._row_versions[table].clear()
+                else:
+                    self._row_versions[table].update(dict.fromkeys(ids, self._version))
+
+    # Version that last wrote each of the rows with the given ids, for a table in VERSIONED_TABLES
+    def row_versions(self, table, ids):
+        with self._lock:
+            self._check_external_writes()
+            versions = self._row_versions[table]
+            base = self._base_versions[table]
+            return [versions.get(i, base) for i in ids]
+
+    # (table, ids) written after version, or None when the change log no longer covers it
+    def changes_since(self, version):
+        with self._lock:
+            self._check_external_writes()
+            if version == self._version:
+                return []
+            if version > self._version or not self._changes or self._changes[0][0] > version + 1:
+                return None
+            return [(table, ids) for changed_at, table, ids in self._changes if changed_at > version]
+
+    # (current version, changes_since(version)) read together, so no write falls between the two
+    def version_and_changes(self, version):
+        with self._lock:
+            changes = self.changes_since(version)
+            return self._version, changes
+
+    # Stream every record of a table in id order, one batch per query
+    def iter_records(self, table, batch_size=5000):
+        last_id = None
+        while True:
+            if last_id is None:
+                batch = self._rows(table, f"SELECT * FROM {table} ORDER BY id LIMIT ?", (batch_size,))
+            else:
+                batch = self._rows(table, f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1]["id"]
+
+    # Records of a table with the given ids, in no particular order
+    def get_records(self, table, ids, batch_size=500):
+        ids = list(ids)
+        records = []
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            placeholders = ", ".join("?" for _ in chunk)
+            records.extend(self._rows(table, f"SELECT * FROM {table} WHERE id IN ({placeholders})", chunk))
+        return records
+
+    # The given columns of every record in id order, as one list per column, without decoding whole records
+    def select_columns(self, table, columns):
+        known = {name for name, _ in SCHEMA[table]}
+        if not known.issuperset(columns):
+            raise ValueError(f"Unknown {table} columns {sorted(set(columns) - known)}")
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id").fetchall()
+        if not rows:
+            return [[] for _ in columns]
+        return [list(values) for values in zip(*rows)]
+
+    def count(self, table):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def is_empty(self):
+        return all(self.count(table) == 0 for table in SCHEMA)
+
+    # Properties
+
+    # Properties sorted in SQL, optionally filtered by status and limited to one page
+    def list_properties(self, status=None, order_by="id", descending=False, limit=None, offset=0):
+        if order_by not in PROPERTY_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort properties by {order_by!r}; expected one of {PROPERTY_SORT_COLUMNS}")
+        where, params = ("WHERE status = ?", [status]) if status is not None else ("", [])
+        direction = "DESC" if descending else "ASC"
+        sql = f'SELECT * FROM properties {where} ORDER BY "{order_by}" {direction}, id'
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return self._rows("properties", sql, params)
+
+    def count_properties(self, status=None):
+        with self._lock:
+            if status is None:
+                return self._conn.execute("SELECT COUNT(*) FROM properties").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM properties WHERE status = ?", (status,)).fetchone()[0]
+
+    def first_property(self):
+        rows = self._rows("properties", "SELECT * FROM properties ORDER BY id LIMIT 1")
+        return rows[0] if rows else None
+
+    # Portfolio totals for the Dashboard stat cards
+    def property_summary(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), SUM(status = 'occupied'), AVG(currentRent), SUM(units) FROM properties"
+            ).fetchone()
+        return {
+            "count": row[0],
+            "occupied": row[1] or 0,
+            "avg_rent": row[2] or 0,
+            "total_units": row[3] or 0,
+        }
+
+    # Financial records
+
+    # Financial records as one list per column, in the order Ledger expects
+    def financial_record_columns(self):
+        columns = ("id", "propertyId", "date", "type", "amount", "category", "description")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM financial_records ORDER BY id"
+            ).fetchall()
+        if not rows:
+            return [[] for _ in columns]
+        return [list(values) for values in zip(*rows)]
+
+    # Market data and competitors
+
+    # Market data by month, optionally limited to one page
+    def list_market_data(self, limit=None, offset=0):
+        sql, params = "SELECT * FROM market_data ORDER BY month, id", []
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return self._rows("market_data", sql, params)
+
+    # Whether any market data row names a submarket
+    def has_submarkets(self):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM market_data WHERE submarket <> '' LIMIT 1").fetchone()
+        return row is not None
+
+    def list_competitors(self):
+        return self._rows("competitors", "SELECT * FROM competitors ORDER BY id")
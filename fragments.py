@@ -0,0 +1,68 @@
+"""HTML for the property and stat cards, memoized across tabs and sessions."""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+# CSS class and label per property status; anything else is shown as pending renewal
+PROPERTY_STATUSES = {"occupied": ("occupied", "Occupied"), "vacant": ("vacant", "Vacant")}
+OTHER_STATUS = ("pending", "Pending Renewal")
+
+
+def property_card_html(prop):
+    status_class, status_text = PROPERTY_STATUSES.get(prop["status"], OTHER_STATUS)
+    return (f'<div class="property-card {status_class}">'
+            f'<h3>{prop["name"]}</h3>'
+            f'<p>{prop["address"]}</p>'
+            f'<p>Units: {prop["units"]} | Status: {status_text} | Current Rent: ${prop["currentRent"]}</p>'
+            f'<p>Occupancy Rate: {prop["occupancyRate"] * 100:.1f}%</p>'
+            f'</div>')
+
+
+# Stat card with an optional note under the value; few distinct cards exist, so keep them all
+@lru_cache(maxsize=256)
+def stat_card_html(title, value, note=None):
+    note_html = f'<div>{note}</div>' if note else ""
+    return f'<div class="stat-card"><h3>{title}</h3><div class="stat-value">{value}</div>{note_html}</div>'
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered HTML keyed by record id and version.
+
+    A record's key changes whenever it is written, so entries never need
+    invalidating; superseded versions simply age out.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # HTML for each record, rendering only those whose (id, version) is not cached
+    def render_all(self, records, versions, render):
+        parts = []
+        missing = []
+        with self._lock:
+            for record, version in zip(records, versions):
+                key = (record["id"], version)
+                html = self._entries.get(key)
+                if html is None:
+                    missing.append((len(parts), key, record))
+                else:
+                    self._entries.move_to_end(key)
+                parts.append(html)
+            self.hits += len(parts) - len(missing)
+            self.misses += len(missing)
+
+        rendered = [(index, key, render(record)) for index, key, record in missing]
+        with self._lock:
+            for index, key, html in rendered:
+                parts[index] = self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return parts
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
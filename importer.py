@@ -0,0 +1,260 @@
+"""Streaming, chunked import of portfolio data from CSV or JSONL files.
+
+Rows are read lazily, validated a chunk at a time and bulk-written to the
+data store, so memory stays bounded by the chunk size however large the file.
+
+Usage:
+    python importer.py properties exports/properties.csv --db portfolio.db
+    python importer.py financial_records exports/ledger.jsonl --db portfolio.db --chunk-size 20000
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+from datetime import date
+from itertools import islice
+
+from datastore import SCHEMA, PortfolioStore
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Validation error messages kept per import; later ones are only counted
+MAX_REPORTED_ERRORS = 100
+
+PROPERTY_STATUSES = {"occupied", "vacant", "pending_renewal"}
+RECORD_TYPES = {"income", "expense"}
+
+# Fields each page relies on, with the parser applied to them; other fields are passed through
+REQUIRED_FIELDS = {
+    "properties": {
+        "id": "integer", "name": "text", "status": "status", "units": "integer",
+        "currentRent": "number", "occupancyRate": "rate",
+    },
+    "financial_records": {
+        "id": "integer", "propertyId": "integer", "date": "date", "type": "record_type",
+        "amount": "number", "category": "text",
+    },
+    "market_data": {
+        "id": "integer", "month": "date", "avgPrice": "number", "avgRent": "number",
+        "vacancyRate": "rate", "inventoryCount": "integer", "avgDaysOnMarket": "number",
+    },
+    "competitors": {
+        "id": "integer", "name": "text", "avgRent": "number", "units": "integer",
+        "occupancyRate": "rate", "proximity": "number",
+    },
+}
+
+# Fields parsed when present but allowed to be missing or empty
+OPTIONAL_FIELDS = {
+    "properties": {"latitude": "latitude", "longitude": "longitude"},
+    "market_data": {"submarket": "text"},
+    "competitors": {"latitude": "latitude", "longitude": "longitude"},
+}
+
+# Columns the store keeps per table; anything else in an input row is dropped
+COLUMNS = {table: frozenset(name for name, _ in columns) for table, columns in SCHEMA.items()}
+
+
+class ImportValidationError(ValueError):
+    """Raised in strict mode when a row fails validation."""
+
+
+# A finite int or float; NaN and infinities would poison every total they reach
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = value
+    else:
+        text = str(value).strip()
+        try:
+            number = int(text)
+        except ValueError:
+            number = float(text)
+    if not math.isfinite(number):
+        raise ValueError(f"must be a finite number, got {value!r}")
+    return number
+
+
+def _parse(kind, value):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        raise ValueError("is missing")
+    if kind == "text":
+        return str(value).strip()
+    if kind == "integer":
+        number = _number(value)
+        if number != int(number):
+            raise ValueError(f"must be a whole number, got {value!r}")
+        return int(number)
+    if kind == "number":
+        return _number(value)
+    if kind == "rate":
+        number = _number(value)
+        if not 0 <= number <= 1:
+            raise ValueError(f"must be between 0 and 1, got {value!r}")
+        return number
+    if kind in ("latitude", "longitude"):
+        number = float(_number(value))
+        limit = 90 if kind == "latitude" else 180
+        if not -limit <= number <= limit:
+            raise ValueError(f"must be between -{limit} and {limit}, got {value!r}")
+        return number
+    if kind == "date":
+        return date.fromisoformat(str(value).strip()).isoformat()
+    if kind == "status":
+        if value not in PROPERTY_STATUSES:
+            raise ValueError(f"must be one of {sorted(PROPERTY_STATUSES)}, got {value!r}")
+        return value
+    if kind == "record_type":
+        if value not in RECORD_TYPES:
+            raise ValueError(f"must be one of {sorted(RECORD_TYPES)}, got {value!r}")
+        return value
+    raise ValueError(f"unknown field kind {kind!r}")
+
+
+# Validate and normalize one row; returns the cleaned record or raises ValueError
+def validate_row(table, row):
+    if not isinstance(row, dict):
+        raise ValueError(f"row must be an object, got {type(row).__name__}")
+    columns = COLUMNS[table]
+    record = {key: value for key, value in row.items() if key in columns}
+    for field, kind in REQUIRED_FIELDS[table].items():
+        try:
+            record[field] = _parse(kind, row.get(field))
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f"{field} {e}") from None
+    for field, kind in OPTIONAL_FIELDS.get(table, {}).items():
+        value = row.get(field)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            record.pop(field, None)
+            continue
+        try:
+            record[field] = _parse(kind, value)
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f"{field} {e}") from None
+    if table == "competitors" and isinstance(record.get("amenities"), str):
+        # CSV exports carry amenities as a JSON list or a semicolon-separated string
+        text = record["amenities"].strip()
+        record["amenities"] = json.loads(text) if text.startswith("[") else [a.strip() for a in text.split(";") if a.strip()]
+    return record
+
+
+class ImportReport:
+    """Running totals for an import, passed to the progress callback after every chunk."""
+
+    def __init__(self, table, total_bytes=None):
+        self.table = table
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rows_rejected = 0
+        self.chunks = 0
+        self.errors = []
+
+    @property
+    def fraction(self):
+        if not self.total_bytes:
+            return None
+        return min(1.0, self.bytes_read / self.total_bytes)
+
+    def reject(self, line_number, message):
+        self.rows_rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_number}: {message}")
+
+
+def _rows(text_stream, file_format):
+    if file_format == "csv":
+        # Line 1 is the header, so data rows start at line 2
+        for line_number, row in enumerate(csv.DictReader(text_stream), start=2):
+            yield line_number, row
+    else:
+        # JSON lines are decoded during validation so a malformed line rejects only that row
+        for line_number, line in enumerate(text_stream, start=1):
+            if line.strip():
+                yield line_number, line
+
+
+def _format_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}; use a .csv, .jsonl or .ndjson file")
+
+
+# Import rows from a binary stream into store.table, one validated chunk at a time
+def import_stream(binary_stream, table, file_format, store, chunk_size=DEFAULT_CHUNK_SIZE,
+                  strict=False, total_bytes=None, progress=None):
+    if table not in REQUIRED_FIELDS:
+        raise ValueError(f"Unknown table {table!r}; expected one of {sorted(REQUIRED_FIELDS)}")
+    report = ImportReport(table, total_bytes)
+    text_stream = io.TextIOWrapper(binary_stream, encoding="utf-8", newline="")
+    rows = _rows(text_stream, file_format)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        valid = []
+        for line_number, row in chunk:
+            try:
+                if isinstance(row, str):
+                    row = json.loads(row)
+                valid.append(validate_row(table, row))
+            except ValueError as e:
+                if strict:
+                    raise ImportValidationError(f"{table} line {line_number}: {e}") from None
+                report.reject(line_number, str(e))
+        if valid:
+            store.insert_many(table, valid)
+        report.rows_read += len(chunk)
+        report.rows_written += len(valid)
+        report.chunks += 1
+        report.bytes_read = binary_stream.tell()
+        if progress:
+            progress(report)
+    text_stream.detach()
+    return report
+
+
+# Import a CSV or JSONL file from disk into the store
+def import_file(path, table, store, chunk_size=DEFAULT_CHUNK_SIZE, strict=False, progress=None):
+    with open(path, "rb") as f:
+        return import_stream(f, table, _format_for(path), store, chunk_size=chunk_size, strict=strict,
+                             total_bytes=os.path.getsize(path), progress=progress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", choices=sorted(REQUIRED_FIELDS))
+    parser.add_argument("path")
+    parser.add_argument("--db", default=os.getenv("PROPINSIGHT_DB_PATH"), help="SQLite file (default: PROPINSIGHT_DB_PATH)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--strict", action="store_true", help="stop at the first invalid row")
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error("--db is required when PROPINSIGHT_DB_PATH is not set")
+
+    def show_progress(report):
+        percent = f"{report.fraction * 100:5.1f}%" if report.fraction is not None else ""
+        print(f"\r{percent} {report.rows_written:,} written, {report.rows_rejected:,} rejected", end="", flush=True)
+
+    try:
+        report = import_file(args.path, args.table, PortfolioStore(args.db), chunk_size=args.chunk_size,
+                             strict=args.strict, progress=show_progress)
+    except ImportValidationError as e:
+        print(f"\n{e}", file=sys.stderr)
+        return 1
+    print()
+    for error in report.errors:
+        print(f"rejected {error}", file=sys.stderr)
+    if report.rows_rejected > len(report.errors):
+        print(f"... and {report.rows_rejected - len(report.errors)} more rejected rows", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
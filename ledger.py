@@ -0,0 +1,108 @@
+"""Column-oriented, NumPy-backed views of the portfolio used by the Financials page."""
+import numpy as np
+
+
+class PropertyIndex:
+    """id -> property and name -> id lookups built once per data version."""
+
+    def __init__(self, properties):
+        self.by_id = {p["id"]: p for p in properties}
+        self.id_by_name = {}
+        for p in properties:
+            # Keep the first property for duplicate names, like the old linear search did
+            self.id_by_name.setdefault(p["name"], p["id"])
+        self.names = [p["name"] for p in properties]
+        self._sorted_ids = np.array(sorted(self.by_id), dtype=np.int64)
+        self._sorted_names = np.array([self.by_id[i]["name"] for i in self._sorted_ids] + ["Unknown"], dtype=object)
+
+    # Vectorized join of property ids to names; unknown ids map to "Unknown"
+    def names_for(self, property_ids):
+        if not len(self._sorted_ids):
+            return np.full(len(property_ids), "Unknown", dtype=object)
+        positions = np.searchsorted(self._sorted_ids, property_ids)
+        clipped = np.minimum(positions, len(self._sorted_ids) - 1)
+        found = self._sorted_ids[clipped] == property_ids
+        return self._sorted_names[np.where(found, clipped, len(self._sorted_ids))]
+
+
+class Ledger:
+    """Financial records stored as parallel column arrays.
+
+    ``type`` and ``category`` are dictionary-encoded as integer codes so that
+    totals are single ``np.bincount`` reductions and filters are boolean masks.
+    """
+
+    GROUP_COLUMNS = ("type", "category", "propertyId")
+    SORT_COLUMNS = ("id", "date", "amount")
+
+    def __init__(self, ids, property_ids, dates, types, amounts, categories, descriptions):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.property_ids = np.asarray(property_ids, dtype=np.int64)
+        self.dates = np.asarray(dates, dtype=object)
+        self.amounts = np.asarray(amounts, dtype=np.float64)
+        self.descriptions = np.asarray(descriptions, dtype=object)
+        self.type_labels, self.type_codes = self._encode(types)
+        self.category_labels, self.category_codes = self._encode(categories)
+        self._sort_orders = {}
+
+    @staticmethod
+    def _encode(values):
+        labels, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+        return labels, codes.astype(np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Boolean mask for the Financials filters; None means "all"
+    def mask(self, property_id=None, record_type=None):
+        selected = np.ones(len(self), dtype=bool)
+        if property_id is not None:
+            selected &= self.property_ids == property_id
+        if record_type is not None:
+            code = np.searchsorted(self.type_labels, record_type)
+            if code >= len(self.type_labels) or self.type_labels[code] != record_type:
+                return np.zeros(len(self), dtype=bool)
+            selected &= self.type_codes == code
+        return selected
+
+    # Row indices of the masked records sorted by a column; each column's order is computed once
+    def ordered_rows(self, mask, sort_by="id", descending=False):
+        if sort_by not in self.SORT_COLUMNS:
+            raise ValueError(f"Cannot sort ledger by {sort_by!r}; expected one of {self.SORT_COLUMNS}")
+        if sort_by not in self._sort_orders:
+            column = {"id": self.ids, "date": self.dates.astype(str), "amount": self.amounts}[sort_by]
+            self._sort_orders[sort_by] = np.argsort(column, kind="stable")
+        order = self._sort_orders[sort_by]
+        if descending:
+            order = order[::-1]
+        return order[mask[order]]
+
+    # Sum of amounts grouped by "type", "category" or "propertyId", optionally within a mask
+    def totals(self, by, mask=None):
+        weights = self.amounts if mask is None else np.where(mask, self.amounts, 0.0)
+        if by == "type":
+            sums = np.bincount(self.type_codes, weights=weights, minlength=len(self.type_labels))
+            return dict(zip(self.type_labels.tolist(), sums.tolist()))
+        if by == "category":
+            sums = np.bincount(self.category_codes, weights=weights, minlength=len(self.category_labels))
+            return dict(zip(self.category_labels.tolist(), sums.tolist()))
+        if by == "propertyId":
+            keys, codes = np.unique(self.property_ids, return_inverse=True)
+            sums = np.bincount(codes, weights=weights, minlength=len(keys))
+            return dict(zip(keys.tolist(), sums.tolist()))
+        raise ValueError(f"Cannot group ledger by {by!r}; expected one of {self.GROUP_COLUMNS}")
+
+    @staticmethod
+    def _display_labels(labels):
+        return np.array([label.capitalize() for label in labels], dtype=object)
+
+    # Display table for the given row indices, joined to property names in one pass
+    def table(self, rows, property_index):
+        return {
+            "Date": self.dates[rows].tolist(),
+            "Property": property_index.names_for(self.property_ids[rows]).tolist(),
+            "Type": self._display_labels(self.type_labels)[self.type_codes[rows]].tolist(),
+            "Category": self._display_labels(self.category_labels)[self.category_codes[rows]].tolist(),
+            "Amount": [f"${amount:,.2f}" for amount in self.amounts[rows]],
+            "Description": self.descriptions[rows].tolist(),
+        }
@@ -0,0 +1,328 @@
+"""Interchangeable LLM backends behind the PropInsight analysis functions.
+
+Every backend exposes the subset of ``genai.GenerativeModel`` the app uses:
+``generate_content(prompt, stream=False, generation_config=None)`` returning an
+object with ``.text`` and ``.usage_metadata`` (iterable into chunks when
+streaming), plus ``count_tokens(prompt)`` returning an int.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+
+# Rough token estimate used by the offline backends (about four characters per token)
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class CallCounter:
+    """Thread-safe count of generate_content calls made in this process."""
+
+    def __init__(self):
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self._count += 1
+
+    def reset(self):
+        with self._lock:
+            self._count = 0
+
+    @property
+    def value(self):
+        return self._count
+
+
+# Shared by every backend so benchmarks can count calls without reaching into cached resources
+model_calls = CallCounter()
+
+
+class LLMResponse:
+    """Response returned by the offline backends, mimicking GenerateContentResponse."""
+
+    def __init__(self, chunks, prompt_tokens, output_tokens=None):
+        self._chunks = chunks
+        self._text = None
+        self._prompt_tokens = prompt_tokens
+        self._output_tokens = output_tokens
+
+    def __iter__(self):
+        parts = []
+        for chunk in self._chunks:
+            parts.append(chunk)
+            yield SimpleNamespace(text=chunk)
+        self._text = "".join(parts)
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self._chunks)
+        return self._text
+
+    @property
+    def usage_metadata(self):
+        output_tokens = self._output_tokens if self._output_tokens is not None else estimate_tokens(self.text)
+        return SimpleNamespace(
+            prompt_token_count=self._prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=self._prompt_tokens + output_tokens,
+        )
+
+
+class GeminiBackend:
+    """The real Gemini client."""
+
+    def __init__(self, model_name, api_key):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        model_calls.increment()
+        return self._model.generate_content(prompt, stream=stream, generation_config=generation_config)
+
+    def count_tokens(self, prompt):
+        return self._model.count_tokens(prompt).total_tokens
+
+
+# Canned answer for a prompt, shaped like what each analysis function asks for
+def default_fake_response(prompt):
+    if '"competitivePosition"' in prompt:
+        return json.dumps({
+            "competitivePosition": "moderate",
+            "strengths": ["Competitive rents relative to nearby properties", "Recent renovations"],
+            "weaknesses": ["Fewer amenities than the closest competitors"],
+            "opportunities": ["Add pet-friendly units", "Bundle parking with premium units"],
+            "threats": ["New supply from competitors with modern amenities"],
+            "strategies": ["Target renovations at the lowest-occupancy properties",
+                           "Match competitor amenities where rent premiums justify it",
+                           "Offer renewal incentives ahead of peak season"],
+        })
+    if '"trend"' in prompt:
+        return json.dumps({
+            "trend": "increasing",
+            "percentageChange": 3.9,
+            "insights": ["Average rents rose steadily over the period",
+                         "Vacancy is tightening while inventory shrinks",
+                         "Homes are selling faster each month"],
+            "recommendations": ["Review rents at renewal against the market average",
+                                "Shorten vacancy turnaround to capture demand"],
+        })
+    if '"results"' in prompt:
+        # Batched recommendations: answer every id in the table whose header starts with "id|"
+        lines = prompt.splitlines()
+        start = next((i for i, line in enumerate(lines) if line.strip().startswith("id|")), len(lines))
+        results = []
+        for line in lines[start + 1:]:
+            cell = line.strip().split("|")[0]
+            if not cell.isdigit():
+                break
+            results.append({"id": int(cell), "recommendations": [
+                "Benchmark current rent against comparable units and adjust at renewal.",
+                "Schedule preventive maintenance to reduce emergency repair costs.",
+                "Offer lease renewal incentives to tenants with good payment history.",
+            ]})
+        return json.dumps({"results": results})
+    if "recommendations" in prompt:
+        return "\n".join([
+            "Benchmark current rent against comparable units and adjust at renewal.",
+            "Schedule preventive maintenance to reduce emergency repair costs.",
+            "Offer lease renewal incentives to tenants with good payment history.",
+            "Market vacant units with updated photos and virtual tours.",
+        ])
+    return ("Thanks for your question. As your property management assistant I'd suggest reviewing "
+            "rent levels against the local market, keeping maintenance proactive, and tracking "
+            "occupancy monthly so you can act early on vacancies.")
+
+
+class FakeBackend:
+    """Deterministic local stand-in with configurable latency and token-rate distributions.
+
+    Latency and token rate are drawn from normal distributions seeded by the
+    prompt text and ``seed``, so the same prompt always takes the same time.
+    """
+
+    model_name = "fake"
+
+    def __init__(self, latency_ms=(0.0, 0.0), tokens_per_second=(0.0, 0.0), seed=0, responder=None):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.seed = seed
+        self.responder = responder or default_fake_response
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        model_calls.increment()
+        rng = random.Random(f"{self.seed}:{prompt}")
+        latency = max(0.0, rng.gauss(*self.latency_ms)) / 1000
+        rate = max(0.0, rng.gauss(*self.tokens_per_second))
+        text = self.responder(prompt)
+        # Split on whitespace boundaries so each chunk is roughly one token
+        chunks = [word + " " for word in text.split(" ")]
+        chunks[-1] = chunks[-1][:-1]
+
+        if not stream:
+            time.sleep(latency + (estimate_tokens(text) / rate if rate else 0.0))
+            return LLMResponse(chunks, estimate_tokens(prompt))
+
+        def paced():
+            time.sleep(latency)
+            for chunk in chunks:
+                if rate:
+                    time.sleep(estimate_tokens(chunk) / rate)
+                yield chunk
+
+        return LLMResponse(paced(), estimate_tokens(prompt))
+
+    def count_tokens(self, prompt):
+        return estimate_tokens(prompt)
+
+
+class ReplayMissError(LookupError):
+    """Raised when a replay file has no captured response for a prompt."""
+
+
+class ReplayBackend:
+    """Records responses from another backend to JSONL, or plays them back.
+
+    With ``inner`` set, every call is forwarded and its text appended to
+    ``path``, along with the token counts the model reported, and so is every
+    ``count_tokens`` result. Without it, calls are answered from the captured
+    file only, and token counts come from it too, so budgets trimmed against
+    them match the recorded run; prompts never counted fall back to the
+    character estimate.
+    """
+
+    def __init__(self, path, inner=None):
+        self.path = path
+        self.inner = inner
+        self.model_name = inner.model_name if inner else "replay"
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._token_counts = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if "tokens" in entry:
+                            self._token_counts[entry["key"]] = entry["tokens"]
+                        else:
+                            self._responses[entry["key"]] = entry
+
+    def _append(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    @staticmethod
+    def _key(prompt, generation_config):
+        payload = json.dumps({"prompt": prompt, "config": generation_config}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        key = self._key(prompt, generation_config)
+        if self.inner is None:
+            if key not in self._responses:
+                raise ReplayMissError(f"No recorded response for prompt {key[:12]}")
+            model_calls.increment()
+            entry = self._responses[key]
+        else:
+            response = self.inner.generate_content(prompt, generation_config=generation_config)
+            usage = getattr(response, "usage_metadata", None)
+            entry = {
+                "key": key,
+                "text": response.text,
+                "prompt_tokens": getattr(usage, "prompt_token_count", None),
+                "output_tokens": getattr(usage, "candidates_token_count", None),
+            }
+            with self._lock:
+                self._responses[key] = entry
+                self._append(entry)
+        text = entry["text"]
+        prompt_tokens = entry.get("prompt_tokens")
+        chunks = [text[i:i + 64] for i in range(0, len(text), 64)] or [""]
+        return LLMResponse(chunks if not stream else iter(chunks),
+                           prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+                           entry.get("output_tokens"))
+
+    def count_tokens(self, prompt):
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        if self.inner is None:
+            tokens = self._token_counts.get(key)
+            return tokens if tokens is not None else estimate_tokens(prompt)
+        tokens = self.inner.count_tokens(prompt)
+        with self._lock:
+            if self._token_counts.get(key) != tokens:
+                self._token_counts[key] = tokens
+                self._append({"key": key, "tokens": tokens})
+        return tokens
+
+
+class LazyBackend:
+    """Builds a backend on its first call instead of at startup.
+
+    Building the Gemini backend imports and configures the google.generativeai
+    SDK, the largest part of a cold start, so pages that never call the model
+    should not pay for it. The build runs once per instance, under a lock;
+    ``load_seconds`` records how long it took and ``on_load`` is told as well.
+    """
+
+    def __init__(self, factory, model_name, on_load=None):
+        self.model_name = model_name
+        self.load_seconds = None
+        self._factory = factory
+        self._on_load = on_load
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._backend is not None
+
+    def _get(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    start = time.perf_counter()
+                    backend = self._factory()
+                    self.load_seconds = time.perf_counter() - start
+                    self._backend = backend
+                    if self._on_load:
+                        self._on_load(self.load_seconds)
+        return self._backend
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        return self._get().generate_content(prompt, stream=stream, generation_config=generation_config)
+
+    def count_tokens(self, prompt):
+        return self._get().count_tokens(prompt)
+
+
+def _parse_distribution(value):
+    mean, _, stddev = value.partition(",")
+    return float(mean), float(stddev or 0)
+
+
+# Build the backend selected by PROPINSIGHT_LLM_BACKEND (gemini, fake, replay or record)
+def backend_from_env(model_name):
+    kind = os.getenv("PROPINSIGHT_LLM_BACKEND", "gemini")
+    if kind == "fake":
+        return FakeBackend(
+            latency_ms=_parse_distribution(os.getenv("PROPINSIGHT_FAKE_LATENCY_MS", "0")),
+            tokens_per_second=_parse_distribution(os.getenv("PROPINSIGHT_FAKE_TOKENS_PER_SEC", "0")),
+            seed=int(os.getenv("PROPINSIGHT_FAKE_SEED", "0")),
+        )
+    replay_path = os.getenv("PROPINSIGHT_REPLAY_PATH", "llm_replay.jsonl")
+    if kind == "replay":
+        return ReplayBackend(replay_path)
+    gemini = GeminiBackend(model_name, os.getenv("GEMINI_API_KEY"))
+    if kind == "record":
+        return ReplayBackend(replay_path, inner=gemini)
+    return gemini
@@ -0,0 +1,147 @@
+"""Content-addressed cache for model responses, shared across Streamlit sessions."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Memory hits whose last_used is written to the backing file in one batch
+TOUCH_BATCH_SIZE = 64
+
+
+# Build a stable cache key from the function name, prompt version, model name and inputs
+def make_cache_key(name, prompt_version, model_name, *inputs):
+    canonical = json.dumps(
+        {"name": name, "version": prompt_version, "model": model_name, "inputs": inputs},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU cache with TTL expiry and an optional SQLite backing file.
+
+    Values must be JSON-serializable. When ``path`` is set, entries are written
+    through to SQLite so they survive process restarts; misses in memory fall
+    back to the database before counting as a miss. Memory hits refresh the
+    on-disk ``last_used`` too, in batches and always before the file is pruned,
+    so the entries read most are not the first ones evicted from disk.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    # Look up key; count=False skips the hit/miss counters for internal re-checks
+    def get(self, key, count=True):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += int(count)
+                    if self._db is not None:
+                        self._touched[key] = now
+                        if len(self._touched) >= TOUCH_BATCH_SIZE:
+                            self._flush_touched()
+                            self._db.commit()
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, value, row[1])
+                    self.hits += int(count)
+                    return value
+
+            self.misses += int(count)
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, now),
+                )
+                self._touched.pop(key, None)
+                self._flush_touched()
+                # Apply the same expiry and LRU bound to the on-disk copy
+                self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                self._db.execute(
+                    "DELETE FROM responses WHERE key NOT IN "
+                    "(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._touched.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    # Write the last_used times of memory hits to the backing file; the caller holds the lock and commits
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                                 [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def _remember(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Create a cache configured from environment variables
+def cache_from_env():
+    return ResponseCache(
+        max_entries=int(os.getenv("PROPINSIGHT_CACHE_SIZE", "256")),
+        ttl_seconds=float(os.getenv("PROPINSIGHT_CACHE_TTL", "3600")),
+        path=os.getenv("PROPINSIGHT_CACHE_PATH") or None,
+    )
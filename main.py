@@ -1,13 +1,37 @@
+import time
+imports_started = time.perf_counter()
+
 import streamlit as st
-import google.generativeai as genai
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from dotenv import load_dotenv
 import os
-import json
+import math
+import functools
 from datetime import datetime
+from analyses import MODEL_NAME, Analyst
+from chat_context import ChatContext
+from datastore import PortfolioStore
+from fragments import FragmentCache, property_card_html, stat_card_html
+from importer import import_stream
+from llm import LazyBackend, backend_from_env
+from llm_cache import cache_from_env
+from metrics import DeltaCounter, InstrumentedBackend, Metrics, deep_sizeof
+from precompute import AnalysisResults, PrecomputeWorker, describe_age, running_workers
+from prompt_encoding import TokenAccounting
+from records import RecordTable
+from retrieval import RetrievalIndex, format_records, retrieve
+from scheduler import INTERACTIVE, ScheduledBackend, scheduler_from_env
+from single_flight import SingleFlight
+from spatial import CompetitorIndex
+
+# The AI SDK, numpy and the sample data are imported where first used, not here
+imports_seconds = time.perf_counter() - imports_started
 
 # Load environment variables
 load_dotenv()
 
+script_started = time.perf_counter()
+
 # Page configuration
 st.set_page_config(
     page_title="PropInsight - Property Management Assistant",
@@ -16,315 +40,443 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize the Google AI model
+# Initialize the model backend (gemini by default; fake/replay run offline without an API key)
+LLM_BACKEND = os.getenv("PROPINSIGHT_LLM_BACKEND", "gemini")
+
 api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
+if LLM_BACKEND in ("gemini", "record") and not api_key:
     st.error("Error: GEMINI_API_KEY not found in environment variables. Please set up your API key.")
     st.stop()
 
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Latency, token, error, page and startup metrics shared by every session
+@st.cache_resource
+def get_metrics():
+    metrics = Metrics()
+    # Created on the process's first run, the one that actually paid for the imports
+    metrics.set("propinsight_startup_seconds", imports_seconds, phase="imports")
+    return metrics
+
+metrics = get_metrics()
+
+# Prometheus text export, rewritten at most every PROPINSIGHT_METRICS_INTERVAL seconds when a path is set
+METRICS_PATH = os.getenv("PROPINSIGHT_METRICS_PATH")
+METRICS_INTERVAL = float(os.getenv("PROPINSIGHT_METRICS_INTERVAL", "15"))
+
+# One backend per process, shared by every session and throttled by one scheduler. The client (and
+# the Gemini SDK import) is only built when an AI feature first calls the model.
+@st.cache_resource
+def get_llm_backend():
+    backend = LazyBackend(lambda: backend_from_env(MODEL_NAME), MODEL_NAME,
+                          on_load=lambda seconds: metrics.set("propinsight_startup_seconds", seconds,
+                                                              phase="model_client"))
+    return ScheduledBackend(InstrumentedBackend(backend, metrics), scheduler_from_env())
+
+model = get_llm_backend()
+
+# Model response cache shared by every session in this process
+@st.cache_resource
+def get_response_cache():
+    return cache_from_env()
+
+response_cache = get_response_cache()
+
+# In-flight model calls keyed by request fingerprint, shared by every session
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight()
+
+single_flight = get_single_flight()
+
+# Prompt token counts, reported usage and savings over the old JSON prompts, shared by every session
+@st.cache_resource
+def get_token_accounting():
+    return TokenAccounting()
+
+token_accounting = get_token_accounting()
+
+# Analyses run against this process's backend, caches and counters, shared by every session and the
+# precompute worker
+@st.cache_resource
+def get_analyst():
+    return Analyst(model, MODEL_NAME, response_cache, metrics, token_accounting, single_flight)
+
+analyst = get_analyst()
+cached_single_flight = analyst.cached_single_flight
+analyze_market_trends = analyst.analyze_market_trends
+analyze_competitors = analyst.analyze_competitors
+get_property_recommendations = analyst.get_property_recommendations
+
+# Seconds between the reruns of a pending or refreshing AI panel, which pick up partial, finished and
+# refreshed results
+AI_PANEL_REFRESH = float(os.getenv("PROPINSIGHT_PANEL_REFRESH", "2"))
+
+# Seconds an AI panel may stay pending before it says it is taking longer than usual
+AI_PANEL_TIMEOUT = float(os.getenv("PROPINSIGHT_PANEL_TIMEOUT", "20"))
+
+# Token budget for the conversation sent with each chat message
+CHAT_TOKEN_BUDGET = int(os.getenv("PROPINSIGHT_CHAT_TOKEN_BUDGET", "2000"))
+
+# Portfolio records retrieved for each chat message, and the token cap on them
+RETRIEVAL_TOP_K = 8
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("PROPINSIGHT_RETRIEVAL_TOKEN_BUDGET", "600"))
 
 # Initialize chat history in session state if it doesn't exist
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-if "properties" not in st.session_state:
-    # Sample property data (would be loaded from a database in a real app)
-    st.session_state.properties = [
-        {
-            "id": 1,
-            "name": "Lakeside Apartments",
-            "address": "123 Lake Drive, Laketown",
-            "units": 24,
-            "status": "occupied",
-            "currentRent": 1800,
-            "lastRenoDate": "2022-05-15",
-            "occupancyRate": 0.92,
-        },
-        {
-            "id": 2,
-            "name": "Highland Towers",
-            "address": "456 Mountain View, Highland",
-            "units": 16,
-            "status": "occupied",
-            "currentRent": 2100,
-            "lastRenoDate": "2021-08-10",
-            "occupancyRate": 0.88,
-        },
-        {
-            "id": 3,
-            "name": "Meadow Gardens",
-            "address": "789 Green Valley, Meadowville",
-            "units": 12,
-            "status": "vacant",
-            "currentRent": 1650,
-            "lastRenoDate": "2023-01-20",
-            "occupancyRate": 0.75,
-        },
-        {
-            "id": 4,
-            "name": "Sunset Condos",
-            "address": "101 Sunset Boulevard, Westside",
-            "units": 8,
-            "status": "pending_renewal",
-            "currentRent": 2300,
-            "lastRenoDate": "2022-11-05",
-            "occupancyRate": 0.95,
-        }
-    ]
-
-if "financial_records" not in st.session_state:
-    # Sample financial data (would be loaded from a database in a real app)
-    st.session_state.financial_records = [
-        {
-            "id": 1,
-            "propertyId": 1,
-            "date": "2023-01-15",
-            "type": "income",
-            "amount": 43200,
-            "category": "rent",
-            "description": "January rent collection"
-        },
-        {
-            "id": 2,
-            "propertyId": 1,
-            "date": "2023-01-25",
-            "type": "expense",
-            "amount": 5500,
-            "category": "maintenance",
-            "description": "HVAC system repair"
-        },
-        {
-            "id": 3,
-            "propertyId": 2,
-            "date": "2023-01-15",
-            "type": "income",
-            "amount": 33600,
-            "category": "rent",
-            "description": "January rent collection"
-        },
-        {
-            "id": 4,
-            "propertyId": 2,
-            "date": "2023-01-20",
-            "type": "expense",
-            "amount": 2800,
-            "category": "utilities",
-            "description": "Water and electricity"
-        }
-    ]
-
-if "market_data" not in st.session_state:
-    # Sample market data (would be loaded from a database in a real app)
-    st.session_state.market_data = [
-        {
-            "id": 1,
-            "month": "2023-01-01",
-            "avgPrice": 255000,
-            "avgRent": 1850,
-            "vacancyRate": 0.05,
-            "inventoryCount": 120,
-            "avgDaysOnMarket": 35
-        },
-        {
-            "id": 2,
-            "month": "2023-02-01",
-            "avgPrice": 258000,
-            "avgRent": 1870,
-            "vacancyRate": 0.045,
-            "inventoryCount": 115,
-            "avgDaysOnMarket": 32
-        },
-        {
-            "id": 3,
-            "month": "2023-03-01",
-            "avgPrice": 262000,
-            "avgRent": 1890,
-            "vacancyRate": 0.042,
-            "inventoryCount": 110,
-            "avgDaysOnMarket": 30
-        },
-        {
-            "id": 4,
-            "month": "2023-04-01",
-            "avgPrice": 265000,
-            "avgRent": 1900,
-            "vacancyRate": 0.04,
-            "inventoryCount": 105,
-            "avgDaysOnMarket": 28
-        }
-    ]
-
-if "competitors" not in st.session_state:
-    # Sample competitor data (would be loaded from a database in a real app)
-    st.session_state.competitors = [
-        {
-            "id": 1,
-            "name": "Horizon Properties",
-            "avgRent": 2100,
-            "units": 45,
-            "occupancyRate": 0.95,
-            "amenities": ["Pool", "Gym", "Covered Parking"],
-            "proximity": 2.5,
-            "lastUpdated": "2023-04-01"
-        },
-        {
-            "id": 2,
-            "name": "Prestige Rentals",
-            "avgRent": 1950,
-            "units": 32,
-            "occupancyRate": 0.90,
-            "amenities": ["Pool", "Pet Friendly", "On-site Laundry"],
-            "proximity": 1.8,
-            "lastUpdated": "2023-03-25"
-        },
-        {
-            "id": 3,
-            "name": "Urban Living",
-            "avgRent": 2200,
-            "units": 50,
-            "occupancyRate": 0.93,
-            "amenities": ["Gym", "Rooftop Terrace", "Smart Home Features"],
-            "proximity": 3.2,
-            "lastUpdated": "2023-04-05"
-        }
-    ]
+if "chat_context" not in st.session_state:
+    st.session_state.chat_context = ChatContext(CHAT_TOKEN_BUDGET)
 
-# Process user message and get AI response
-def get_gemini_response(message):
-    try:
-        system_prompt = """You are a helpful property management assistant named PropInsight. 
+# Portfolio data lives in a SQLite store shared by every session. The default in-memory store is seeded
+# with sample data; a file named by PROPINSIGHT_DB_PATH holds real data and is never seeded.
+@st.cache_resource
+def get_store():
+    start = time.perf_counter()
+    path = os.getenv("PROPINSIGHT_DB_PATH", ":memory:")
+    store = PortfolioStore(path)
+    if path == ":memory:":
+        from sample_data import SAMPLE_COMPETITORS, SAMPLE_FINANCIAL_RECORDS, SAMPLE_MARKET_DATA, SAMPLE_PROPERTIES
+        
+        store.insert_many("properties", SAMPLE_PROPERTIES)
+        store.insert_many("financial_records", SAMPLE_FINANCIAL_RECORDS)
+        store.insert_many("market_data", SAMPLE_MARKET_DATA)
+        store.insert_many("competitors", SAMPLE_COMPETITORS)
+    metrics.set("propinsight_startup_seconds", time.perf_counter() - start, phase="data_bootstrap")
+    return store
+
+store = get_store()
+
+# Array-backed ledger and property lookups, rebuilt only when the tables they read change.
+# Only the Financials page uses them, so numpy is imported on first use.
+@st.cache_resource(max_entries=1)
+def get_ledger(data_version):
+    from ledger import Ledger
+    
+    return Ledger(*store.financial_record_columns())
+
+@st.cache_resource(max_entries=1)
+def get_property_index(data_version):
+    from ledger import PropertyIndex
+    
+    return PropertyIndex(get_property_table(data_version))
+
+# Columns the pages look properties and competitors up by; full records are fetched from the store
+# for the few rows a page actually shows
+PROPERTY_LOOKUP_FIELDS = ("id", "name", "latitude", "longitude")
+COMPETITOR_LOOKUP_FIELDS = ("id", "latitude", "longitude", "proximity")
+
+# Column-wise, immutable lookup tables shared by every session, so a session holds no copy of any records
+@st.cache_resource(max_entries=1)
+def get_property_table(data_version):
+    table = RecordTable(PROPERTY_LOOKUP_FIELDS, store.select_columns("properties", PROPERTY_LOOKUP_FIELDS))
+    metrics.set("propinsight_shared_table_bytes", table.nbytes(), table="properties")
+    return table
+
+@st.cache_resource(max_entries=1)
+def get_competitor_index(data_version):
+    table = RecordTable(COMPETITOR_LOOKUP_FIELDS, store.select_columns("competitors", COMPETITOR_LOOKUP_FIELDS))
+    metrics.set("propinsight_shared_table_bytes", table.nbytes(), table="competitors")
+    return CompetitorIndex(table)
+
+# Prompt for the AI Assistant chat
+CHAT_PROMPT = """You are a helpful property management assistant named PropInsight. 
         You help users manage rental properties, track finances, analyze market trends, and suggest optimizations.
         You should be friendly, professional, and knowledgeable about property management topics.
-        Provide concise, useful information and never claim to have access to specific user data unless explicitly provided in the conversation.
+        Provide concise, useful information and never claim to have access to specific user data unless explicitly provided below or in the conversation.
         If you don't know something, acknowledge it and suggest alternative approaches.
         
+        Portfolio records that may be relevant to the query (they are a search result, not the full portfolio):
+        {portfolio}
+        
+        {conversation}
+        
         User query: {message}
         
         Your response:"""
-        
-        response = model.generate_content(system_prompt.format(message=message))
-        return response.text
-    except Exception as e:
-        st.error(f"Error getting response from Gemini: {str(e)}")
-        return "I'm sorry, I encountered an error while processing your request. Please try again later."
 
-# Analyze market trends for property data
-def analyze_market_trends(market_data):
-    try:
-        prompt = f"""Analyze the following market trend data for rental properties and provide insights:
-        {json.dumps(market_data)}
+# Prompt that folds older chat turns into the rolling summary
+SUMMARY_PROMPT = """Update the running summary of a conversation between a property manager and the PropInsight assistant.
+        Keep facts, figures, decisions and open questions; drop greetings and pleasantries. Use at most 150 words.
         
-        Format your response as JSON with the following structure:
-        {{
-          "trend": "increasing/decreasing/stable",
-          "percentageChange": 5.2,
-          "insights": ["Insight 1", "Insight 2", "Insight 3"],
-          "recommendations": ["Recommendation 1", "Recommendation 2"]
-        }}"""
+        Current summary:
+        {summary}
         
-        response = model.generate_content(prompt)
+        New turns:
+        {turns}
         
-        try:
-            # Try to parse the response as JSON
-            result = json.loads(response.text)
-            return result
-        except json.JSONDecodeError:
-            # If parsing fails, try to extract JSON from the text
-            import re
-            json_match = re.search(r'({[\s\S]*})', response.text)
-            if json_match:
-                try:
-                    return json.loads(json_match.group(1))
-                except:
-                    pass
-            
-            # If all else fails, return a formatted error response
-            return {
-                "trend": "unknown",
-                "insights": ["Could not analyze market trends at this time."],
-                "recommendations": ["Try again later."]
-            }
-    except Exception as e:
-        st.error(f"Error analyzing market trends: {str(e)}")
-        return {
-            "trend": "unknown",
-            "insights": ["Could not analyze market trends at this time."],
-            "recommendations": ["Try again later."]
-        }
+        Updated summary:"""
+
+CHAT_ERROR_MESSAGE = "I'm sorry, I encountered an error while processing your request. Please try again later."
+
+# Token count of the chat template itself, counted once per process
+@st.cache_resource
+def get_chat_template_tokens():
+    return model.count_tokens(CHAT_PROMPT.format(portfolio="", conversation="", message=""))
+
+# Retrieval index over the portfolio, shared by every session and synced with the store on use.
+# The first full index is built in the background, so no chat message waits for it.
+@st.cache_resource
+def get_retrieval_index():
+    index = RetrievalIndex()
+    index.sync(store, background=True)
+    return index
+
+# Fold older chat turns into the rolling summary; returns None if the model call fails
+def summarize_chat(summary, turns):
+    def compute():
+        response = model.generate_content(SUMMARY_PROMPT.format(summary=summary or "(none yet)", turns=turns),
+                                          priority=INTERACTIVE)
+        return response.text.strip()
 
-# Generate property management recommendations
-def get_property_recommendations(property_data):
     try:
-        prompt = f"""Based on the following property data, provide specific recommendations to optimize rental income and property management:
-        {json.dumps(property_data)}
-        
-        Provide 3-5 actionable recommendations."""
-        
-        response = model.generate_content(prompt)
-        recommendations = response.text.split('\n')
-        return [rec for rec in recommendations if rec.strip()]
+        return cached_single_flight("summarize_chat", (summary, turns), compute)
+    except Exception:
+        return None
+
+# Build the chat prompt for message with the earlier conversation kept under CHAT_TOKEN_BUDGET
+def build_chat_prompt(message, history):
+    hits = retrieve(get_retrieval_index(), store, message, k=RETRIEVAL_TOP_K)
+    portfolio = format_records(hits, RETRIEVAL_TOKEN_BUDGET) or "(no matching records)"
+    reserved_tokens = get_chat_template_tokens() + model.count_tokens(f"{portfolio}\n{message}")
+    conversation = st.session_state.chat_context.build(history, reserved_tokens, model.count_tokens, summarize_chat)
+    return CHAT_PROMPT.format(portfolio=portfolio, conversation=conversation, message=message)
+
+# Process user message and get AI response
+def get_gemini_response(message, history=()):
+    try:
+        response = model.generate_content(build_chat_prompt(message, history), priority=INTERACTIVE)
+        return response.text
     except Exception as e:
-        st.error(f"Error generating property recommendations: {str(e)}")
-        return ["Could not generate property recommendations at this time."]
+        st.error(f"Error getting response from Gemini: {str(e)}")
+        return CHAT_ERROR_MESSAGE
 
-# Analyze competitor data
-def analyze_competitors(competitor_data, your_properties):
+# Stream the AI response chunk by chunk, recording time-to-first-token and total time in timings
+def stream_gemini_response(message, timings, history=()):
+    start = time.perf_counter()
     try:
-        prompt = f"""Compare the following competitor data with my properties and suggest competitive strategies:
-        
-        My properties:
-        {json.dumps(your_properties)}
-        
-        Competitors:
-        {json.dumps(competitor_data)}
-        
-        Format your response as JSON with the following structure:
-        {{
-          "competitivePosition": "strong/moderate/weak",
-          "strengths": ["Strength 1", "Strength 2"],
-          "weaknesses": ["Weakness 1", "Weakness 2"],
-          "opportunities": ["Opportunity 1", "Opportunity 2"],
-          "threats": ["Threat 1", "Threat 2"],
-          "strategies": ["Strategy 1", "Strategy 2", "Strategy 3"]
-        }}"""
-        
-        response = model.generate_content(prompt)
-        
-        try:
-            # Try to parse the response as JSON
-            result = json.loads(response.text)
-            return result
-        except json.JSONDecodeError:
-            # If parsing fails, try to extract JSON from the text
-            import re
-            json_match = re.search(r'({[\s\S]*})', response.text)
-            if json_match:
-                try:
-                    return json.loads(json_match.group(1))
-                except:
-                    pass
-            
-            # If all else fails, return a formatted error response
-            return {
-                "competitivePosition": "unknown",
-                "strengths": [],
-                "weaknesses": [],
-                "opportunities": [],
-                "threats": [],
-                "strategies": ["Could not analyze competitor data at this time."]
-            }
+        response = model.generate_content(build_chat_prompt(message, history), stream=True, priority=INTERACTIVE)
+        for chunk in response:
+            if not chunk.text:
+                continue
+            if "ttft" not in timings:
+                timings["ttft"] = time.perf_counter() - start
+            yield chunk.text
     except Exception as e:
-        st.error(f"Error analyzing competitors: {str(e)}")
-        return {
-            "competitivePosition": "unknown",
-            "strengths": [],
-            "weaknesses": [],
-            "opportunities": [],
-            "threats": [],
-            "strategies": ["Could not analyze competitor data at this time."]
-        }
+        st.error(f"Error getting response from Gemini: {str(e)}")
+        yield CHAT_ERROR_MESSAGE
+    finally:
+        timings["total"] = time.perf_counter() - start
+        timings.setdefault("ttft", timings["total"])
+
+# Shown in place of an analysis whose latest computation failed
+ANALYSIS_FALLBACKS = {
+    "market": {
+        "trend": "unknown",
+        "insights": ["Could not analyze market trends at this time."],
+        "recommendations": ["Try again later."]
+    },
+    "competitors": {
+        "competitivePosition": "unknown",
+        "strengths": [],
+        "weaknesses": [],
+        "opportunities": [],
+        "threats": [],
+        "strategies": ["Could not analyze competitor data at this time."]
+    },
+    "recommendations": {},
+}
+
+# Shown for a property whose recommendations could not be generated
+NO_RECOMMENDATIONS = ["Could not generate property recommendations at this time."]
+
+# Properties whose recommendations are precomputed, in batches: the ones listed first on the Dashboard
+PRECOMPUTED_RECOMMENDATIONS = int(os.getenv("PROPINSIGHT_PRECOMPUTED_RECOMMENDATIONS", "10"))
+
+# Latest precomputed analyses, shared by every session
+@st.cache_resource
+def get_analysis_results():
+    return AnalysisResults()
+
+analysis_results = get_analysis_results()
+
+# Whether name has no good value yet or its last computation failed, so the next pass must run it
+def precompute_due(results, name):
+    entry = results.get(name)
+    return entry is None or entry["value"] is None or entry["error"] is not None
+
+# Analyses to recompute for the store's changes since the last pass (None means everything), plus any
+# whose last computation failed
+def plan_precompute(changes, results):
+    tables = None if changes is None else {table for table, _ in changes}
+    jobs = []
+    if tables is None or "market_data" in tables or precompute_due(results, "market"):
+        jobs.append(("market", lambda on_partial: analyze_market_trends(store.list_market_data(), on_partial)))
+    if tables is None or tables & {"competitors", "properties"} or precompute_due(results, "competitors"):
+        jobs.append(("competitors", lambda on_partial: analyze_competitors(
+            store.list_competitors(), store.list_properties(), on_partial)))
+    if tables is None or "properties" in tables or precompute_due(results, "recommendations"):
+        jobs.append(("recommendations", precompute_recommendations))
+    return jobs
+
+# Recommendations for the properties listed first on the Dashboard, keyed by id. Fails when the property the
+# Dashboard shows got none, so its panel reports the error and the worker retries instead of storing a gap.
+def precompute_recommendations(on_partial):
+    properties = store.list_properties(limit=PRECOMPUTED_RECOMMENDATIONS)
+    results, failures = get_property_recommendations(properties, on_partial)
+    if properties and properties[0]["id"] in failures:
+        raise RuntimeError(f"No recommendations for {properties[0]['name']}: {failures[properties[0]['id']]}")
+    return results
+
+# Worker that keeps the analyses up to date with the store. Its threads have no script context, so
+# everything it runs uses the module-level resources rather than calling st.cache_resource getters.
+@st.cache_resource
+def get_precompute_worker():
+    # A worker orphaned by clearing the resource cache would otherwise keep running
+    for worker in running_workers():
+        worker.stop()
+    return PrecomputeWorker(store, analysis_results, plan_precompute)
+
+# Render a precomputed analysis into panel without calling the model or waiting for it: the stored value
+# (even while it is being refreshed), otherwise the worker's partial result so far
+def show_analysis(name, render, panel, status, pending_text, error_label):
+    entry = analysis_results.get(name)
+    pending_since = st.session_state.setdefault("ai_panels_pending_since", {})
+    if entry is None or (entry["value"] is None and (entry["computing"] or (entry["stale"] and not entry["error"]))):
+        started = pending_since.setdefault(name, time.monotonic())
+        if entry and entry["partial"]:
+            with panel.container():
+                render(entry["partial"])
+        else:
+            panel.info(pending_text)
+        if time.monotonic() - started > AI_PANEL_TIMEOUT:
+            status.warning("Still generating. This panel will update as soon as it is ready.")
+        return
+    pending_since.pop(name, None)
+
+    if entry["value"] is None:
+        status.error(f"{error_label}: {entry['error']}")
+        with panel.container():
+            render(ANALYSIS_FALLBACKS[name])
+        return
+    with panel.container():
+        render(entry["value"])
+    note = f"Computed {describe_age(entry['computed_at'])}"
+    if entry["stale"] or entry["computing"]:
+        note += " · updating with the latest data"
+    elif entry["error"]:
+        note += f" · last refresh failed: {entry['error']}"
+    status.caption(note)
+
+# st.fragment that also records how long each of its runs takes, inline or on its own
+def timed_fragment(name, run_every=None):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe("propinsight_fragment_run_seconds", time.perf_counter() - start, fragment=name)
+        return st.fragment(timed, run_every=run_every)
+    return decorate
+
+# Whether name's analysis has nothing left to wait for: a value (or an error) that no computation is replacing
+def analysis_settled(name):
+    entry = analysis_results.get(name)
+    return entry is not None and not entry["computing"] and (not entry["stale"] or entry["error"] is not None)
+
+# A precomputed analysis still pending or being refreshed, redrawn every AI_PANEL_REFRESH seconds without
+# rerunning the page. Streamlit offers no way to stop run_every short of a full app rerun, so it keeps
+# polling after the analysis settles; the page's next rerun draws the panel with settled_ai_panel instead.
+@timed_fragment("ai_panel", run_every=AI_PANEL_REFRESH)
+def live_ai_panel(name, render, pending_text, error_label):
+    panel = st.empty()
+    status = st.empty()
+    show_analysis(name, render, panel, status, pending_text, error_label)
+
+# A settled analysis; it is only redrawn when the page reruns, so an open tab sends nothing while idle
+@timed_fragment("ai_panel")
+def settled_ai_panel(name, render, pending_text, error_label):
+    panel = st.empty()
+    status = st.empty()
+    show_analysis(name, render, panel, status, pending_text, error_label)
+
+# A precomputed analysis that keeps itself up to date while it is pending or stale
+def ai_panel(name, render, pending_text, error_label):
+    panel_fragment = settled_ai_panel if analysis_settled(name) else live_ai_panel
+    panel_fragment(name, render, pending_text, error_label)
+
+# Streamlit releases whose run context sends messages through the private _enqueue attribute
+DELTA_COUNTER_STREAMLIT_VERSIONS = ("1.44.",)
+
+# Counter of the elements this session's script runs send, installed on its run context once. It wraps a
+# private attribute, so on other Streamlit releases it returns None and element counts are not recorded.
+def element_counter():
+    ctx = get_script_run_ctx()
+    if ctx is None or not st.__version__.startswith(DELTA_COUNTER_STREAMLIT_VERSIONS):
+        return None
+    if not callable(getattr(ctx, "_enqueue", None)):
+        return None
+    if not isinstance(ctx._enqueue, DeltaCounter):
+        ctx._enqueue = DeltaCounter(ctx._enqueue)
+    return ctx._enqueue
+
+# Rows per page offered by the paginated lists
+PAGE_SIZES = [10, 25, 50, 100]
+
+# Number of cards shown under "Recent Properties" on the Dashboard
+RECENT_PROPERTIES_LIMIT = 10
+
+# Render page-size and page-number controls and return the (offset, limit) window to fetch
+def paginate(key, total):
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    pages = max(1, math.ceil(total / page_size))
+    # The cursor lives only in session state, so it can be kept in range when filters shrink the result set
+    # without also giving the widget a default value
+    if st.session_state.setdefault(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    with col2:
+        page_number = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    offset = (page_number - 1) * page_size
+    with col3:
+        if total:
+            st.caption(f"Showing {offset + 1}-{min(offset + page_size, total)} of {total}")
+    return offset, page_size
+
+# Most options a property picker sends to the browser; larger portfolios are narrowed by searching
+PICKER_MATCH_LIMIT = 50
+
+# Search box plus a selectbox of at most PICKER_MATCH_LIMIT matching names; returns the chosen row
+# of names, or None for the all_label option or when nothing matches
+def property_picker(label, key, names, all_label=None):
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        query = st.text_input("Search properties", key=f"{key}_search", placeholder="Part of a name")
+    needle = query.strip().lower()
+    matches = [row for row, name in enumerate(names) if needle in str(name).lower()]
+    options = ([None] if all_label else []) + matches[:PICKER_MATCH_LIMIT]
+    with col2:
+        selected = st.selectbox(label, options, format_func=lambda row: all_label if row is None else names[row])
+    if len(matches) > PICKER_MATCH_LIMIT:
+        st.caption(f"Showing the first {PICKER_MATCH_LIMIT} of {len(matches):,} matching properties; "
+                   f"search to narrow the list")
+    elif not matches:
+        st.caption("No properties match the search")
+    return selected
+
+# Rendered property cards shared by every tab and session
+@st.cache_resource
+def get_card_cache():
+    return FragmentCache()
+
+# Render property cards as a single markdown element, reusing each card's HTML until its record is rewritten
+def show_property_cards(props):
+    if not props:
+        return
+    versions = store.row_versions("properties", [prop["id"] for prop in props])
+    st.markdown("\n".join(get_card_cache().render_all(props, versions, property_card_html)), unsafe_allow_html=True)
 
 # CSS styles
 st.markdown("""
@@ -438,7 +590,7 @@ st.sidebar.divider()
 # Sidebar navigation
 page = st.sidebar.radio("Navigation", 
                         ["Dashboard", "Properties", "Financials", "Market Trends", 
-                         "Competitor Analysis", "AI Assistant"])
+                         "Competitor Analysis", "AI Assistant", "Performance"], key="page")
 
 st.sidebar.divider()
 st.sidebar.markdown("### About PropInsight")
@@ -446,6 +598,44 @@ st.sidebar.markdown("""
 PropInsight is your AI-powered property management assistant. 
 Get insights, manage properties, and optimize your real estate investments with ease.
 """)
+# Bulk import into the shared data store
+with st.sidebar.expander("Import data"):
+    import_table = st.selectbox("Dataset", ["properties", "financial_records", "market_data", "competitors"],
+                                format_func=lambda name: name.replace("_", " ").capitalize())
+    uploaded_file = st.file_uploader("CSV or JSONL file", type=["csv", "jsonl", "ndjson"])
+    if uploaded_file is not None and st.button("Import"):
+        import_progress = st.progress(0.0, text="Importing...")
+        file_format = "csv" if uploaded_file.name.lower().endswith(".csv") else "jsonl"
+        report = import_stream(
+            uploaded_file, import_table, file_format, store, total_bytes=uploaded_file.size,
+            progress=lambda r: import_progress.progress(r.fraction or 0.0, text=f"{r.rows_written:,} rows imported"),
+        )
+        st.success(f"Imported {report.rows_written:,} rows, rejected {report.rows_rejected:,}.")
+        for error in report.errors[:5]:
+            st.caption(error)
+
+# Start the precompute worker, or have it pick up data changes (such as an import) right away,
+# and start indexing the portfolio for the chat before its first message
+get_precompute_worker().wake()
+get_retrieval_index()
+
+cache_stats = response_cache.stats()
+flight_stats = single_flight.stats()
+st.sidebar.caption(f"AI cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses · "
+                   f"{flight_stats['shared']} shared in-flight")
+scheduler_stats = model.scheduler.stats()
+queued = sum(scheduler_stats["queue_depth"].values())
+st.sidebar.caption(f"Model queue: {queued} waiting · chat wait "
+                   f"{scheduler_stats['wait']['interactive']['avg_ms']:.0f} ms avg · "
+                   f"{scheduler_stats['retries']} retries")
+tokens_saved, fraction_saved = token_accounting.savings()
+if tokens_saved:
+    st.sidebar.caption(f"Prompt tokens saved: ~{tokens_saved:,} ({fraction_saved:.0%}) vs JSON prompts")
+
+# Time the selected page's branch and count the elements it sends
+elements = element_counter()
+elements_before = elements.count if elements else 0
+page_started = time.perf_counter()
 
 # Main content based on selected page
 if page == "Dashboard":
@@ -453,177 +643,146 @@ if page == "Dashboard":
     st.markdown("Welcome to your property management dashboard")
     
     # Quick stats in 4 columns
+    summary = store.property_summary()
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown('<div class="stat-card">'
-                    '<h3>TOTAL PROPERTIES</h3>'
-                    f'<div class="stat-value">{len(st.session_state.properties)}</div>'
-                    '<div>+2 from last month</div>'
-                    '</div>', unsafe_allow_html=True)
+        st.markdown(stat_card_html("TOTAL PROPERTIES", summary["count"], "+2 from last month"), unsafe_allow_html=True)
     
     with col2:
-        occupied = sum(1 for p in st.session_state.properties if p["status"] == "occupied")
-        occupied_rate = occupied / len(st.session_state.properties) * 100
-        st.markdown(f'<div class="stat-card">'
-                    f'<h3>OCCUPANCY RATE</h3>'
-                    f'<div class="stat-value">{occupied_rate:.1f}%</div>'
-                    f'<div>+2.5% from last month</div>'
-                    f'</div>', unsafe_allow_html=True)
+        occupied_rate = summary["occupied"] / summary["count"] * 100 if summary["count"] else 0.0
+        st.markdown(stat_card_html("OCCUPANCY RATE", f"{occupied_rate:.1f}%", "+2.5% from last month"),
+                    unsafe_allow_html=True)
     
     with col3:
-        avg_rent = sum(p["currentRent"] for p in st.session_state.properties) / len(st.session_state.properties)
-        st.markdown(f'<div class="stat-card">'
-                    f'<h3>AVERAGE RENT</h3>'
-                    f'<div class="stat-value">${avg_rent:.0f}</div>'
-                    f'<div>+$50 from last month</div>'
-                    f'</div>', unsafe_allow_html=True)
+        avg_rent = summary["avg_rent"]
+        st.markdown(stat_card_html("AVERAGE RENT", f"${avg_rent:.0f}", "+$50 from last month"), unsafe_allow_html=True)
     
     with col4:
-        total_units = sum(p["units"] for p in st.session_state.properties)
-        st.markdown(f'<div class="stat-card">'
-                    f'<h3>TOTAL UNITS</h3>'
-                    f'<div class="stat-value">{total_units}</div>'
-                    f'<div>No change</div>'
-                    f'</div>', unsafe_allow_html=True)
+        total_units = summary["total_units"]
+        st.markdown(stat_card_html("TOTAL UNITS", total_units, "No change"), unsafe_allow_html=True)
     
-    # Recent activity and properties
-    col1, col2 = st.columns([2, 1])
+    first_property = store.first_property()
     
-    with col1:
-        st.markdown("### Recent Properties")
-        for prop in st.session_state.properties:
-            status_class = "occupied" if prop["status"] == "occupied" else "vacant" if prop["status"] == "vacant" else "pending"
-            status_text = "Occupied" if prop["status"] == "occupied" else "Vacant" if prop["status"] == "vacant" else "Pending Renewal"
-            
-            st.markdown(f'<div class="property-card {status_class}">'
-                        f'<h3>{prop["name"]}</h3>'
-                        f'<p>{prop["address"]}</p>'
-                        f'<p>Units: {prop["units"]} | Status: {status_text} | Current Rent: ${prop["currentRent"]}</p>'
-                        f'<p>Occupancy Rate: {prop["occupancyRate"] * 100:.1f}%</p>'
-                        f'</div>', unsafe_allow_html=True)
+    def render_recommendations(recommendations_by_id):
+        recommendations = recommendations_by_id.get(first_property["id"]) or NO_RECOMMENDATIONS
+        for i, rec in enumerate(recommendations[:3], 1):
+            st.markdown(f"**{i}.** {rec}")
     
-    with col2:
-        st.markdown("### AI Recommendations")
-        # Get recommendations based on the first property
-        if st.session_state.properties:
-            recommendations = get_property_recommendations(st.session_state.properties[0])
-            for i, rec in enumerate(recommendations[:3], 1):
-                st.markdown(f"**{i}.** {rec}")
-        
-        st.markdown("### Market Trend")
-        market_analysis = analyze_market_trends(st.session_state.market_data)
+    def render_market_trend(market_analysis):
         st.markdown(f"**Trend:** {market_analysis.get('trend', 'Unknown')}")
         
         insights = market_analysis.get('insights', [])
         if insights:
             st.markdown("**Key Insight:** " + insights[0])
+    
+    # Recent activity and properties
+    col1, col2 = st.columns([2, 1])
+    
+    # Each panel reads precomputed results and refreshes on its own, without rerunning the page
+    with col2:
+        st.markdown("### AI Recommendations")
+        if first_property:
+            ai_panel("recommendations", render_recommendations,
+                     "Generating recommendations...", "Error generating property recommendations")
+        
+        st.markdown("### Market Trend")
+        ai_panel("market", render_market_trend, "Analyzing market trends...", "Error analyzing market trends")
+    
+    with col1:
+        st.markdown("### Recent Properties")
+        if summary["count"] > RECENT_PROPERTIES_LIMIT:
+            st.caption(f"Showing {RECENT_PROPERTIES_LIMIT} of {summary['count']} properties. See the Properties page for the full list.")
+        show_property_cards(store.list_properties(limit=RECENT_PROPERTIES_LIMIT))
 
 elif page == "Properties":
     st.markdown('<div class="main-header">Properties</div>', unsafe_allow_html=True)
     st.markdown("Manage your real estate properties")
     
+    # Sorting is done in the data store; each tab only fetches its visible page
+    sort_options = {"Name": "name", "Current Rent": "currentRent", "Occupancy Rate": "occupancyRate"}
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        sort_label = st.selectbox("Sort by:", list(sort_options), key="properties_sort")
+    with col2:
+        descending = st.toggle("Descending", key="properties_descending")
+    
+    def property_page(key, status=None):
+        offset, limit = paginate(key, store.count_properties(status))
+        return store.list_properties(status=status, order_by=sort_options[sort_label], descending=descending,
+                                     limit=limit, offset=offset)
+    
     # Tabs for different property statuses
     tab1, tab2, tab3 = st.tabs(["All Properties", "Occupied", "Vacant"])
     
+    # The tabs share one card cache, so a property is rendered once however many lists show it
     with tab1:
-        for prop in st.session_state.properties:
-            status_class = "occupied" if prop["status"] == "occupied" else "vacant" if prop["status"] == "vacant" else "pending"
-            status_text = "Occupied" if prop["status"] == "occupied" else "Vacant" if prop["status"] == "vacant" else "Pending Renewal"
-            
-            st.markdown(f'<div class="property-card {status_class}">'
-                        f'<h3>{prop["name"]}</h3>'
-                        f'<p>{prop["address"]}</p>'
-                        f'<p>Units: {prop["units"]} | Status: {status_text} | Current Rent: ${prop["currentRent"]}</p>'
-                        f'<p>Occupancy Rate: {prop["occupancyRate"] * 100:.1f}%</p>'
-                        f'</div>', unsafe_allow_html=True)
+        show_property_cards(property_page("all_properties"))
     
     with tab2:
-        occupied_props = [p for p in st.session_state.properties if p["status"] == "occupied"]
-        for prop in occupied_props:
-            st.markdown(f'<div class="property-card occupied">'
-                        f'<h3>{prop["name"]}</h3>'
-                        f'<p>{prop["address"]}</p>'
-                        f'<p>Units: {prop["units"]} | Status: Occupied | Current Rent: ${prop["currentRent"]}</p>'
-                        f'<p>Occupancy Rate: {prop["occupancyRate"] * 100:.1f}%</p>'
-                        f'</div>', unsafe_allow_html=True)
+        show_property_cards(property_page("occupied_properties", status="occupied"))
     
     with tab3:
-        vacant_props = [p for p in st.session_state.properties if p["status"] == "vacant"]
-        for prop in vacant_props:
-            st.markdown(f'<div class="property-card vacant">'
-                        f'<h3>{prop["name"]}</h3>'
-                        f'<p>{prop["address"]}</p>'
-                        f'<p>Units: {prop["units"]} | Status: Vacant | Current Rent: ${prop["currentRent"]}</p>'
-                        f'<p>Occupancy Rate: {prop["occupancyRate"] * 100:.1f}%</p>'
-                        f'</div>', unsafe_allow_html=True)
+        show_property_cards(property_page("vacant_properties", status="vacant"))
 
 elif page == "Financials":
     st.markdown('<div class="main-header">Financials</div>', unsafe_allow_html=True)
     st.markdown("Track income and expenses for your properties")
     
+    ledger = get_ledger(store.table_version("financial_records"))
+    property_index = get_property_index(store.table_version("properties"))
+    
     # Summary stats
-    total_income = sum(r["amount"] for r in st.session_state.financial_records if r["type"] == "income")
-    total_expenses = sum(r["amount"] for r in st.session_state.financial_records if r["type"] == "expense")
+    totals = ledger.totals("type")
+    total_income = totals.get("income", 0)
+    total_expenses = totals.get("expense", 0)
     net_income = total_income - total_expenses
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.markdown(f'<div class="stat-card">'
-                    f'<h3>TOTAL INCOME</h3>'
-                    f'<div class="stat-value">${total_income:,.2f}</div>'
-                    f'</div>', unsafe_allow_html=True)
+        st.markdown(stat_card_html("TOTAL INCOME", f"${total_income:,.2f}"), unsafe_allow_html=True)
     
     with col2:
-        st.markdown(f'<div class="stat-card">'
-                    f'<h3>TOTAL EXPENSES</h3>'
-                    f'<div class="stat-value">${total_expenses:,.2f}</div>'
-                    f'</div>', unsafe_allow_html=True)
+        st.markdown(stat_card_html("TOTAL EXPENSES", f"${total_expenses:,.2f}"), unsafe_allow_html=True)
     
     with col3:
-        st.markdown(f'<div class="stat-card">'
-                    f'<h3>NET INCOME</h3>'
-                    f'<div class="stat-value">${net_income:,.2f}</div>'
-                    f'</div>', unsafe_allow_html=True)
+        st.markdown(stat_card_html("NET INCOME", f"${net_income:,.2f}"), unsafe_allow_html=True)
     
     # Financial records table
     st.markdown("### Financial Records")
     
     # Property filter
-    property_names = ["All Properties"] + [p["name"] for p in st.session_state.properties]
-    selected_property = st.selectbox("Filter by property:", property_names)
+    selected_row = property_picker("Filter by property:", "financials_property", property_index.names,
+                                   all_label="All Properties")
     
     # Type filter
     record_types = ["All Types", "Income", "Expense"]
     selected_type = st.selectbox("Filter by type:", record_types)
     
-    # Filter records
-    filtered_records = st.session_state.financial_records
-    
-    if selected_property != "All Properties":
-        property_id = next((p["id"] for p in st.session_state.properties if p["name"] == selected_property), None)
-        if property_id:
-            filtered_records = [r for r in filtered_records if r["propertyId"] == property_id]
+    # Filter records with vectorized masks over the ledger columns
+    property_id = None
+    if selected_row is not None:
+        property_id = property_index.id_by_name.get(property_index.names[selected_row])
     
+    type_filter = None
     if selected_type != "All Types":
         type_filter = selected_type.lower()
-        filtered_records = [r for r in filtered_records if r["type"] == type_filter]
-    
-    # Display records
-    if filtered_records:
-        record_data = []
-        for record in filtered_records:
-            property_name = next((p["name"] for p in st.session_state.properties if p["id"] == record["propertyId"]), "Unknown")
-            record_data.append({
-                "Date": record["date"],
-                "Property": property_name,
-                "Type": record["type"].capitalize(),
-                "Category": record["category"].capitalize(),
-                "Amount": f"${record['amount']:,.2f}",
-                "Description": record["description"]
-            })
-        
-        st.table(record_data)
+    
+    # Sort order
+    sort_options = {"Record ID": "id", "Date": "date", "Amount": "amount"}
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        sort_label = st.selectbox("Sort by:", list(sort_options), key="financials_sort")
+    with col2:
+        descending = st.toggle("Descending", key="financials_descending")
+    
+    filtered = ledger.mask(property_id=property_id, record_type=type_filter)
+    rows = ledger.ordered_rows(filtered, sort_by=sort_options[sort_label], descending=descending)
+    
+    # Display only the visible page of records
+    if len(rows):
+        offset, limit = paginate("financial_records", len(rows))
+        st.table(ledger.table(rows[offset:offset + limit], property_index))
     else:
         st.info("No financial records found matching your filters.")
 
@@ -634,9 +793,12 @@ elif page == "Market Trends":
     # Display the market data
     st.markdown("### Market Data")
     
+    has_submarkets = store.has_submarkets()
+    offset, limit = paginate("market_data", store.count("market_data"))
     market_data_table = []
-    for data in st.session_state.market_data:
+    for data in store.list_market_data(limit, offset):
         market_data_table.append({
+            **({"Submarket": data.get("submarket") or "-"} if has_submarkets else {}),
             "Month": data["month"],
             "Avg. Price": f"${data['avgPrice']:,.0f}",
             "Avg. Rent": f"${data['avgRent']:,.0f}",
@@ -650,41 +812,86 @@ elif page == "Market Trends":
     # AI Market Analysis
     st.markdown("### AI Market Analysis")
     
-    market_analysis = analyze_market_trends(st.session_state.market_data)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("#### Market Trend")
-        st.markdown(f"**Direction:** {market_analysis.get('trend', 'Unknown')}")
-        st.markdown(f"**Change:** {market_analysis.get('percentageChange', 0):.1f}%")
+    # Also used for the partial analysis while it streams in, so missing fields are skipped
+    def render_market_analysis(market_analysis):
+        col1, col2 = st.columns(2)
         
-        st.markdown("#### Key Insights")
-        insights = market_analysis.get('insights', [])
-        for insight in insights:
-            st.markdown(f"• {insight}")
+        with col1:
+            st.markdown("#### Market Trend")
+            st.markdown(f"**Direction:** {market_analysis.get('trend', 'Unknown')}")
+            if "percentageChange" in market_analysis:
+                st.markdown(f"**Change:** {market_analysis['percentageChange']:.1f}%")
+            
+            st.markdown("#### Key Insights")
+            insights = market_analysis.get('insights', [])
+            for insight in insights:
+                st.markdown(f"• {insight}")
+        
+        with col2:
+            st.markdown("#### Recommendations")
+            recommendations = market_analysis.get('recommendations', [])
+            for rec in recommendations:
+                st.markdown(f"• {rec}")
+        
+        # Computed locally, so these are exact and arrive before the narrative
+        series = market_analysis.get('series', [])
+        if series:
+            def number(value, suffix=""):
+                return "-" if value is None else f"{value:,.4f}".rstrip("0").rstrip(".") + suffix
+            
+            st.markdown("#### Computed Trends")
+            offset, limit = paginate("market_series", len(series))
+            st.table([{
+                "Series": row["series"],
+                "First": number(row["first"]),
+                "Latest": number(row["last"]),
+                "Change": number(row["changePct"], "%"),
+                "Last Month": number(row["lastChangePct"], "%"),
+                "Trend": row["trend"],
+                "Forecast": number(row["forecast"]),
+            } for row in series[offset:offset + limit]])
     
-    with col2:
-        st.markdown("#### Recommendations")
-        recommendations = market_analysis.get('recommendations', [])
-        for rec in recommendations:
-            st.markdown(f"• {rec}")
+    ai_panel("market", render_market_analysis, "Analyzing market trends...", "Error analyzing market trends")
 
 elif page == "Competitor Analysis":
     st.markdown('<div class="main-header">Competitor Analysis</div>', unsafe_allow_html=True)
     st.markdown("Compare your properties with competitors in the area")
     
-    # Display competitor data
+    # Display each property's nearest competitors
     st.markdown("### Competitors")
     
+    competitor_index = get_competitor_index(store.table_version("competitors"))
+    locations = get_property_table(store.table_version("properties"))
+    
+    selected_index = property_picker("Property:", "competitor_property", locations.column("name"))
+    col1, col2 = st.columns(2)
+    with col1:
+        nearest_count = st.slider("Nearest competitors", 1, 50, 10)
+    with col2:
+        radius = st.number_input("Within (miles, 0 for any)", min_value=0.0, value=0.0, step=0.5)
+    
+    selected = locations[selected_index] if selected_index is not None else {}
+    search_started = time.perf_counter()
+    nearest = competitor_index.nearest(selected, nearest_count, radius or None)
+    search_ms = (time.perf_counter() - search_started) * 1000
+    
+    if competitor_index.measures(selected):
+        st.caption(f"{len(nearest)} nearest of {competitor_index.size:,} competitors to {selected['name']}, "
+                   f"found in {search_ms:.1f} ms")
+    else:
+        st.caption(f"No coordinates for {selected.get('name', 'this portfolio')}; "
+                   f"showing the competitors recorded as closest to the portfolio")
+    
+    records = {r["id"]: r for r in store.get_records("competitors", [loc["id"] for _, loc in nearest])}
     comp_data_table = []
-    for comp in st.session_state.competitors:
+    for miles, loc in nearest:
+        comp = records[loc["id"]]
         comp_data_table.append({
             "Name": comp["name"],
             "Avg. Rent": f"${comp['avgRent']:,.0f}",
             "Units": comp["units"],
             "Occupancy": f"{comp['occupancyRate']*100:.1f}%",
-            "Distance (mi)": comp["proximity"],
+            "Distance (mi)": round(miles, 2),
             "Last Updated": comp["lastUpdated"]
         })
     
@@ -693,73 +900,182 @@ elif page == "Competitor Analysis":
     # AI Competitor Analysis
     st.markdown("### AI Competitive Analysis")
     
-    comp_analysis = analyze_competitors(st.session_state.competitors, st.session_state.properties)
-    
-    # Competitive position
-    st.markdown(f"#### Competitive Position: {comp_analysis.get('competitivePosition', 'Unknown').capitalize()}")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("#### Strengths")
-        strengths = comp_analysis.get('strengths', [])
-        for strength in strengths:
-            st.markdown(f"• {strength}")
+    # Also used for the partial analysis while it streams in, so missing fields are skipped
+    def render_competitor_analysis(comp_analysis):
+        # Competitive position
+        st.markdown(f"#### Competitive Position: {comp_analysis.get('competitivePosition', 'Unknown').capitalize()}")
         
-        st.markdown("#### Weaknesses")
-        weaknesses = comp_analysis.get('weaknesses', [])
-        for weakness in weaknesses:
-            st.markdown(f"• {weakness}")
-    
-    with col2:
-        st.markdown("#### Opportunities")
-        opportunities = comp_analysis.get('opportunities', [])
-        for opportunity in opportunities:
-            st.markdown(f"• {opportunity}")
+        col1, col2 = st.columns(2)
         
-        st.markdown("#### Threats")
-        threats = comp_analysis.get('threats', [])
-        for threat in threats:
-            st.markdown(f"• {threat}")
+        with col1:
+            st.markdown("#### Strengths")
+            strengths = comp_analysis.get('strengths', [])
+            for strength in strengths:
+                st.markdown(f"• {strength}")
+            
+            st.markdown("#### Weaknesses")
+            weaknesses = comp_analysis.get('weaknesses', [])
+            for weakness in weaknesses:
+                st.markdown(f"• {weakness}")
+        
+        with col2:
+            st.markdown("#### Opportunities")
+            opportunities = comp_analysis.get('opportunities', [])
+            for opportunity in opportunities:
+                st.markdown(f"• {opportunity}")
+            
+            st.markdown("#### Threats")
+            threats = comp_analysis.get('threats', [])
+            for threat in threats:
+                st.markdown(f"• {threat}")
+        
+        st.markdown("#### Recommended Strategies")
+        strategies = comp_analysis.get('strategies', [])
+        for strategy in strategies:
+            st.markdown(f"• {strategy}")
     
-    st.markdown("#### Recommended Strategies")
-    strategies = comp_analysis.get('strategies', [])
-    for strategy in strategies:
-        st.markdown(f"• {strategy}")
+    ai_panel("competitors", render_competitor_analysis, "Analyzing competitors...", "Error analyzing competitors")
 
 elif page == "AI Assistant":
     st.markdown('<div class="main-header">AI Assistant</div>', unsafe_allow_html=True)
     st.markdown("Chat with PropInsight, your property management assistant")
     
-    # Display chat messages
-    st.markdown('<div class="chatbox" id="chat-box">', unsafe_allow_html=True)
+    # Welcome message if chat history is empty
+    if not st.session_state.chat_history:
+        st.session_state.chat_history.append({
+            "role": "assistant", 
+            "content": "👋 Hello! I'm PropInsight, your property management assistant. How can I help you today?"
+        })
     
-    for message in st.session_state.chat_history:
+    def show_chat_message(message):
         if message["role"] == "user":
             st.markdown(f'<div class="message-container"><div class="user-message">{message["content"]}</div></div>', unsafe_allow_html=True)
         else:
             st.markdown(f'<div class="message-container"><div class="bot-message">{message["content"]}</div></div>', unsafe_allow_html=True)
+            if "total_time" in message:
+                st.caption(f"First token {message['ttft']:.2f}s · Total {message['total_time']:.2f}s")
+    
+    # Display chat messages; this run draws the history so far and the chat fragment draws later turns
+    st.markdown('<div class="chatbox" id="chat-box">', unsafe_allow_html=True)
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.session_state.chat_rendered = len(st.session_state.chat_history)
+    for message in st.session_state.chat_history:
+        show_chat_message(message)
     
-    # Chat input
-    with st.form(key='chat_form', clear_on_submit=True):
-        user_message = st.text_input("Type your message here:", placeholder="Ask me anything about property management...")
-        submit_button = st.form_submit_button("Send")
+    # Sending a message reruns only this fragment: the sidebar, the page above and the turns already on
+    # screen are not re-executed or re-sent, only the turns added since the page last ran in full
+    @timed_fragment("chat")
+    def chat_panel():
+        for message in st.session_state.chat_history[st.session_state.chat_rendered:]:
+            show_chat_message(message)
+        new_turn = st.container()
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        stream_responses = st.toggle("Stream responses", value=True)
+        
+        # Chat input
+        with st.form(key='chat_form', clear_on_submit=True):
+            user_message = st.text_input("Type your message here:", placeholder="Ask me anything about property management...")
+            submit_button = st.form_submit_button("Send")
         
         if submit_button and user_message:
-            # Add user message to chat history
-            st.session_state.chat_history.append({"role": "user", "content": user_message})
-            
-            # Get response from Gemini
-            with st.spinner("Thinking..."):
-                bot_response = get_gemini_response(user_message)
-            
-            # Add bot response to chat history
-            st.session_state.chat_history.append({"role": "assistant", "content": bot_response})
-            
-            # Force a rerun to update the chat display
-            st.rerun()
+            with new_turn:
+                # Add user message to chat history
+                st.session_state.chat_history.append({"role": "user", "content": user_message})
+                show_chat_message(st.session_state.chat_history[-1])
+                
+                # Get response from Gemini, rendering chunks as they arrive in streaming mode
+                history = st.session_state.chat_history[:-1]
+                timings = {}
+                reply = st.empty()
+                if stream_responses:
+                    with reply.container():
+                        bot_response = st.write_stream(stream_gemini_response(user_message, timings, history))
+                else:
+                    start = time.perf_counter()
+                    with reply.container(), st.spinner("Thinking..."):
+                        bot_response = get_gemini_response(user_message, history)
+                    timings["ttft"] = timings["total"] = time.perf_counter() - start
+                
+                # Add bot response to chat history and redraw the streamed text as a chat bubble
+                st.session_state.chat_history.append({
+                    "role": "assistant",
+                    "content": bot_response,
+                    "ttft": timings["ttft"],
+                    "total_time": timings["total"],
+                })
+                with reply.container():
+                    show_chat_message(st.session_state.chat_history[-1])
+    
+    chat_panel()
+
+elif page == "Performance":
+    st.markdown('<div class="main-header">Performance</div>', unsafe_allow_html=True)
+    st.markdown("Model call and page timings for this server process")
+    st.caption("Percentiles cover the last 1,000 samples of each series from the past 10 minutes; "
+               "counts are since the process started.")
+    
+    snapshot = metrics.snapshot()
+    
+    def metric_table(names, scale=1.0, unit=""):
+        rows = []
+        for row in snapshot:
+            if row["name"] not in names:
+                continue
+            rows.append({
+                "Metric": names[row["name"]],
+                "Labels": ", ".join(f"{key}={value}" for key, value in row["labels"].items()) or "-",
+                "Count": row["count"],
+                **{p.upper(): "-" if row[p] is None else f"{row[p] * scale:,.1f}{unit}" for p in ("p50", "p95", "p99")},
+            })
+        if rows:
+            st.table(rows)
+        else:
+            st.info("No samples yet.")
+    
+    st.markdown("### Model Calls")
+    metric_table({"propinsight_llm_request_seconds": "Latency"}, scale=1000, unit=" ms")
+    metric_table({"propinsight_llm_input_tokens": "Input tokens", "propinsight_llm_output_tokens": "Output tokens"})
+    
+    counters = [row for row in snapshot if row["kind"] == "counter"]
+    if counters:
+        st.table([{
+            "Counter": row["name"].removeprefix("propinsight_"),
+            "Labels": ", ".join(f"{key}={value}" for key, value in row["labels"].items()) or "-",
+            "Value": int(row["value"]),
+        } for row in counters])
+    
+    st.markdown("### Pages")
+    metric_table({"propinsight_script_run_seconds": "Script run", "propinsight_page_render_seconds": "Page branch",
+                  "propinsight_fragment_run_seconds": "Fragment run"}, scale=1000, unit=" ms")
+    metric_table({"propinsight_page_elements": "Elements sent"})
+    
+    st.markdown("### Startup")
+    startup = {row["labels"]["phase"]: row["value"] for row in snapshot if row["name"] == "propinsight_startup_seconds"}
+    startup_phases = {"imports": "Module imports", "data_bootstrap": "Data store bootstrap",
+                      "model_client": "Model client and SDK"}
+    st.table([{
+        "Phase": label,
+        "Time": f"{startup[phase] * 1000:,.1f} ms" if phase in startup else "not loaded yet",
+    } for phase, label in startup_phases.items()])
+    
+    st.markdown("### Memory")
+    st.caption(f"This session's state: {deep_sizeof(st.session_state.to_dict()) / 1024:,.1f} KB. Records are kept "
+               "once per process in shared tables, not copied into sessions.")
+    metric_table({"propinsight_session_state_bytes": "Session state"}, scale=1 / 1024, unit=" KB")
+    shared = [row for row in snapshot if row["name"] == "propinsight_shared_table_bytes"]
+    if shared:
+        st.table([{"Shared table": row["labels"]["table"], "Size": f"{row['value'] / 1024:,.1f} KB"}
+                  for row in shared])
+    
+    st.markdown("### Export")
+    if METRICS_PATH:
+        st.caption(f"Written to {METRICS_PATH} every {METRICS_INTERVAL:.0f}s in the Prometheus text format.")
+    else:
+        st.caption("Set PROPINSIGHT_METRICS_PATH to write these metrics to a Prometheus text file.")
+    st.download_button("Download Prometheus metrics", metrics.prometheus_text(), file_name="propinsight.prom",
+                       mime="text/plain")
 
 # Add auto-scrolling JavaScript to keep the chat at the bottom
 if page == "AI Assistant":
@@ -772,10 +1088,11 @@ if page == "AI Assistant":
     </script>
     """, unsafe_allow_html=True)
 
-# Welcome message if chat history is empty
-if page == "AI Assistant" and not st.session_state.chat_history:
-    st.session_state.chat_history.append({
-        "role": "assistant", 
-        "content": "👋 Hello! I'm PropInsight, your property management assistant. How can I help you today?"
-    })
-    st.rerun()
\ No newline at end of file
+# Record this run's page metrics and refresh the export file
+metrics.observe("propinsight_page_render_seconds", time.perf_counter() - page_started, page=page)
+metrics.observe("propinsight_script_run_seconds", time.perf_counter() - script_started, page=page)
+if elements:
+    metrics.observe("propinsight_page_elements", elements.count - elements_before, page=page)
+metrics.observe("propinsight_session_state_bytes", deep_sizeof(st.session_state.to_dict()))
+if METRICS_PATH:
+    metrics.export_if_due(METRICS_PATH, METRICS_INTERVAL)
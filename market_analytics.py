@@ -0,0 +1,167 @@
+"""Vectorized market-trend statistics, computed locally so the model only has to narrate them."""
+import numpy as np
+
+# Monthly market_data columns analysed as series
+MARKET_METRICS = ("avgPrice", "avgRent", "vacancyRate", "inventoryCount", "avgDaysOnMarket")
+
+# Average change per period, as a fraction of the series mean, within which a series counts as stable
+STABLE_SLOPE = 0.002
+
+# Periods in the rolling average and ahead in the forecast
+ROLLING_WINDOW = 3
+FORECAST_PERIODS = 3
+
+# Group of market_data records that name no submarket when others do
+UNASSIGNED_GROUP = "unassigned"
+
+# Columns of each summary row, in the order the analysis prompt lists them
+SUMMARY_FIELDS = ("series", "periods", "first", "last", "changePct", "lastChangePct", "rollingAvg", "trend",
+                  "slopePctPerPeriod", "forecast")
+
+
+class SeriesMatrix:
+    """Aligned series stored as one (series, periods) float array.
+
+    Every statistic is a whole-array operation over all rows at once, so a
+    thousand series cost about as much as one. Periods a series has no value
+    for are NaN and are skipped by each statistic.
+    """
+
+    def __init__(self, labels, periods, values):
+        self.labels = list(labels)
+        self.periods = list(periods)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.labels), len(self.periods))
+        self._present = ~np.isnan(self.values)
+
+    # One series per metric, or per (group, metric) when records carry group_field, over the sorted periods.
+    # Records without a group value fall into UNASSIGNED_GROUP. Several records for the same period and
+    # group (sample rows overlapping an import, say) are averaged, each metric over the records that have it.
+    @classmethod
+    def from_records(cls, records, metrics=MARKET_METRICS, period_field="month", group_field=None):
+        def group_of(record):
+            return (record.get(group_field) or UNASSIGNED_GROUP) if group_field else None
+
+        periods = sorted({record[period_field] for record in records})
+        groups = sorted({group_of(record) for record in records}) if group_field else [None]
+        labels = [metric if group is None else f"{group}:{metric}" for group in groups for metric in metrics]
+        sums = np.zeros((len(groups), len(metrics), len(periods)))
+        counts = np.zeros_like(sums)
+        period_index = {period: i for i, period in enumerate(periods)}
+        group_index = {group: i for i, group in enumerate(groups)}
+        for record in records:
+            g, p = group_index[group_of(record)], period_index[record[period_field]]
+            for m, metric in enumerate(metrics):
+                if record.get(metric) is not None:
+                    sums[g, m, p] += record[metric]
+                    counts[g, m, p] += 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.where(counts > 0, sums / counts, np.nan)
+        return cls(labels, periods, values.reshape(len(labels), len(periods)))
+
+    # Per-period mean over the groups of a matrix built with group_field, one series per metric
+    def group_means(self, metrics=MARKET_METRICS):
+        stacked = self.values.reshape(-1, len(metrics), len(self.periods))
+        present = ~np.isnan(stacked)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(present, stacked, 0.0).sum(axis=0) / present.sum(axis=0)
+        return SeriesMatrix(metrics, self.periods, means)
+
+    # Value at each series' first and last present period
+    def endpoints(self):
+        rows = np.arange(len(self.labels))
+        first = self.values[rows, np.argmax(self._present, axis=1)]
+        last = self.values[rows, self.values.shape[1] - 1 - np.argmax(self._present[:, ::-1], axis=1)]
+        return first, last
+
+    # Fractional change from each period to the next; NaN where either side is missing or zero
+    def period_changes(self):
+        previous, current = self.values[:, :-1], self.values[:, 1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(previous != 0, current / previous - 1, np.nan)
+
+    # Fractional change from each series' first to its last present value
+    def total_changes(self):
+        first, last = self.endpoints()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(first != 0, last / first - 1, np.nan)
+
+    # Trailing mean over window periods, averaging only the present values
+    def rolling_means(self, window=ROLLING_WINDOW):
+        filled = np.where(self._present, self.values, 0.0)
+        sums = np.cumsum(filled, axis=1)
+        counts = np.cumsum(self._present, axis=1)
+        sums[:, window:] -= sums[:, :-window].copy()
+        counts[:, window:] -= counts[:, :-window].copy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    # Least-squares line through each series' present values: (slope per period, value at period 0)
+    def linear_fits(self):
+        t = np.arange(len(self.periods), dtype=np.float64)
+        n = self._present.sum(axis=1)
+        filled = np.where(self._present, self.values, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_mean = (self._present * t).sum(axis=1) / n
+            y_mean = filled.sum(axis=1) / n
+            dt = np.where(self._present, t - t_mean[:, None], 0.0)
+            slopes = (dt * (filled - y_mean[:, None])).sum(axis=1) / (dt ** 2).sum(axis=1)
+        slopes = np.where(n > 1, slopes, 0.0)
+        return slopes, y_mean - slopes * t_mean
+
+    # "increasing", "decreasing" or "stable" per series, from its fitted slope relative to its mean
+    def trends(self, stable_slope=STABLE_SLOPE):
+        relative = self.relative_slopes()
+        return np.where(relative > stable_slope, "increasing",
+                        np.where(relative < -stable_slope, "decreasing", "stable"))
+
+    def relative_slopes(self):
+        slopes, _ = self.linear_fits()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(self._present, self.values, 0.0).sum(axis=1) / self._present.sum(axis=1)
+            return np.where(means != 0, slopes / np.abs(means), 0.0)
+
+    # Linear extrapolation of each series for the next periods, shape (series, periods)
+    def forecasts(self, periods=FORECAST_PERIODS):
+        slopes, intercepts = self.linear_fits()
+        future = np.arange(len(self.periods), len(self.periods) + periods, dtype=np.float64)
+        return intercepts[:, None] + slopes[:, None] * future
+
+    # One plain-Python summary row per series, with SUMMARY_FIELDS as keys
+    def summary(self):
+        if not self.periods:
+            return []
+        first, last = self.endpoints()
+        changes = self.period_changes()
+        last_changes = changes[:, -1] if changes.shape[1] else np.full(len(self.labels), np.nan)
+        rolling = self.rolling_means()[:, -1]
+        forecasts = self.forecasts()[:, -1]
+        return [
+            {
+                "series": label,
+                "periods": int(count),
+                "first": _round(first[i]),
+                "last": _round(last[i]),
+                "changePct": _round(total * 100, 2),
+                "lastChangePct": _round(last_changes[i] * 100, 2),
+                "rollingAvg": _round(rolling[i]),
+                "trend": str(trend),
+                "slopePctPerPeriod": _round(slope * 100, 2),
+                "forecast": _round(forecasts[i]),
+            }
+            for i, (label, count, total, trend, slope) in enumerate(zip(
+                self.labels, self._present.sum(axis=1), self.total_changes(), self.trends(), self.relative_slopes()))
+        ]
+
+
+def _round(value, digits=4):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+# Summary rows for the store's market_data records, one per metric. When records name a submarket in
+# group_field, the market-wide rows are the mean over the submarkets each month, followed by one row per
+# submarket and metric.
+def market_summary(market_data, group_field="submarket"):
+    if not any(record.get(group_field) for record in market_data):
+        return SeriesMatrix.from_records(market_data).summary()
+    by_group = SeriesMatrix.from_records(market_data, group_field=group_field)
+    return by_group.group_means().summary() + by_group.summary()
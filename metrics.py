@@ -0,0 +1,263 @@
+"""Process-wide performance metrics with rolling percentiles and a Prometheus text export."""
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+
+# Every metric the app records: name -> (Prometheus type, help text)
+METRICS = {
+    "propinsight_llm_requests_total": ("counter", "Model generate_content calls."),
+    "propinsight_llm_errors_total": ("counter", "Model calls that raised, by exception type."),
+    "propinsight_llm_request_seconds": ("summary", "Model call latency, until the last chunk for streamed calls."),
+    "propinsight_llm_input_tokens": ("summary", "Prompt tokens per model call, as reported by the model."),
+    "propinsight_llm_output_tokens": ("summary", "Response tokens per model call, as reported by the model."),
+    "propinsight_llm_cache_requests_total": ("counter", "Response cache lookups by analysis and result."),
+    "propinsight_llm_batches_total": ("counter", "Batched model requests by analysis, first tries and retries."),
+    "propinsight_llm_batch_items_total": ("counter", "Items settled in batched requests, by analysis and outcome."),
+    "propinsight_script_run_seconds": ("summary", "Wall time of a full script run, by page."),
+    "propinsight_page_render_seconds": ("summary", "Wall time of the selected page's branch of the script."),
+    "propinsight_page_elements": ("summary", "Elements the selected page's branch sent to the browser."),
+    "propinsight_fragment_run_seconds": ("summary", "Wall time of a fragment's run, within a page run or on its own."),
+    "propinsight_startup_seconds": ("gauge", "One-time startup costs of this process, by phase."),
+    "propinsight_session_state_bytes": ("summary", "Approximate bytes held in a session's state after each script run."),
+    "propinsight_shared_table_bytes": ("gauge", "Bytes held by the lookup tables every session shares, by table."),
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Samples kept per series for the rolling quantiles, and the oldest sample age considered
+WINDOW_SAMPLES = 1000
+WINDOW_SECONDS = 600
+
+
+class RollingSummary:
+    """Quantiles over the most recent samples plus lifetime count and sum.
+
+    Not thread-safe on its own; Metrics guards it with its lock.
+    """
+
+    def __init__(self, max_samples=WINDOW_SAMPLES, max_age=WINDOW_SECONDS):
+        self.max_age = max_age
+        self.count = 0
+        self.sum = 0.0
+        self._samples = deque(maxlen=max_samples)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self._samples.append((time.monotonic(), value))
+
+    # Nearest-rank quantiles of the samples still inside the window (None when there are none)
+    def quantiles(self, quantiles=QUANTILES):
+        cutoff = time.monotonic() - self.max_age
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        ordered = sorted(value for _, value in self._samples)
+        if not ordered:
+            return {q: None for q in quantiles}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+
+
+# Approximate bytes held by obj and everything it references, counting each object once. Classes, functions
+# and modules belong to the whole process, so they and what they reference are not counted.
+def deep_sizeof(obj):
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        else:
+            if hasattr(item, "__dict__"):
+                stack.append(vars(item))
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _number(value):
+    return "NaN" if value is None else repr(float(value))
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and rolling summaries, one series per label set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._last_export = 0.0
+
+    def _get(self, name, labels):
+        kind = METRICS[name][0]
+        key = (name, tuple(sorted(labels.items())))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = RollingSummary() if kind == "summary" else [0]
+        return series
+
+    def increment(self, name, amount=1, **labels):
+        with self._lock:
+            self._get(name, labels)[0] += amount
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            self._get(name, labels).observe(value)
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._get(name, labels)[0] = value
+
+    # One dict per series: name, kind, labels, and either value or count/sum/p50/p95/p99
+    def snapshot(self):
+        rows = []
+        with self._lock:
+            for (name, labels), series in sorted(self._series.items()):
+                row = {"name": name, "kind": METRICS[name][0], "labels": dict(labels)}
+                if isinstance(series, RollingSummary):
+                    row.update(count=series.count, sum=series.sum)
+                    for q, value in series.quantiles().items():
+                        row[f"p{round(q * 100)}"] = value
+                else:
+                    row["value"] = series[0]
+                rows.append(row)
+        return rows
+
+    # Every series in the Prometheus text exposition format
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            described = set()
+            for (name, labels), series in sorted(self._series.items()):
+                kind, help_text = METRICS[name]
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {kind}")
+                if kind != "summary":
+                    lines.append(f"{name}{_label_text(labels)} {series[0]}")
+                    continue
+                for q, value in series.quantiles().items():
+                    lines.append(f"{name}{_label_text(labels, quantile=q)} {_number(value)}")
+                lines.append(f"{name}_sum{_label_text(labels)} {_number(series.sum)}")
+                lines.append(f"{name}_count{_label_text(labels)} {series.count}")
+        return "\n".join(lines) + "\n"
+
+    # Atomically replace path with the Prometheus text, as the node_exporter textfile collector expects
+    def write_prometheus(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".propinsight-metrics-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    # Write the export file unless it was written less than interval seconds ago
+    def export_if_due(self, path, interval):
+        now = time.monotonic()
+        with self._lock:
+            if self._last_export and now - self._last_export < interval:
+                return False
+            self._last_export = now
+        self.write_prometheus(path)
+        return True
+
+
+class InstrumentedBackend:
+    """Wraps a backend to record latency, token usage and errors of every generate_content call.
+
+    Streamed calls are measured when their last chunk has been read, since
+    that is when the model has finished and usage is reported.
+    """
+
+    def __init__(self, inner, metrics):
+        self.inner = inner
+        self.metrics = metrics
+        self.model_name = inner.model_name
+
+    def _finish(self, start, stream, response=None, error=None):
+        labels = {"stream": str(stream).lower()}
+        self.metrics.increment("propinsight_llm_requests_total", **labels)
+        self.metrics.observe("propinsight_llm_request_seconds", time.perf_counter() - start, **labels)
+        if error is not None:
+            self.metrics.increment("propinsight_llm_errors_total", error=type(error).__name__, **labels)
+            return
+        usage = getattr(response, "usage_metadata", None)
+        input_tokens = getattr(usage, "prompt_token_count", None)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        if input_tokens is not None:
+            self.metrics.observe("propinsight_llm_input_tokens", input_tokens, **labels)
+        if output_tokens is not None:
+            self.metrics.observe("propinsight_llm_output_tokens", output_tokens, **labels)
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        start = time.perf_counter()
+        try:
+            response = self.inner.generate_content(prompt, stream=stream, generation_config=generation_config)
+        except Exception as e:
+            self._finish(start, stream, error=e)
+            raise
+        if not stream:
+            self._finish(start, stream, response)
+            return response
+        return _MeasuredStream(response, lambda error=None: self._finish(start, stream, response, error))
+
+    def count_tokens(self, prompt):
+        return self.inner.count_tokens(prompt)
+
+
+class _MeasuredStream:
+    """A streamed response that reports back once it has been read to the end or failed."""
+
+    def __init__(self, response, on_finish):
+        self._response = response
+        self._on_finish = on_finish
+
+    def __iter__(self):
+        try:
+            yield from self._response
+        except Exception as e:
+            self._on_finish(e)
+            raise
+        self._on_finish()
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class DeltaCounter:
+    """Stands in for a script run context's enqueue function, counting the elements sent."""
+
+    def __init__(self, enqueue):
+        self.enqueue = enqueue
+        self.count = 0
+
+    def __call__(self, msg):
+        if msg.HasField("delta"):
+            self.count += 1
+        self.enqueue(msg)
@@ -0,0 +1,179 @@
+"""Background precomputation of AI analyses whenever the portfolio data changes."""
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+
+class AnalysisResults:
+    """Latest result of each precomputed analysis, shared by every session.
+
+    An entry keeps the last good value with its computed-at time and data
+    version, a partial snapshot while a new value streams in, and the last
+    error. Readers get a copy, so they never see an update half applied.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _update(self, name, **fields):
+        with self._lock:
+            entry = self._entries.setdefault(name, {
+                "value": None, "computed_at": None, "version": None, "partial": None,
+                "computing": False, "stale": False, "error": None,
+            })
+            entry.update(fields)
+
+    def get(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            return dict(entry) if entry else None
+
+    def mark_stale(self, name):
+        self._update(name, stale=True)
+
+    def start(self, name):
+        self._update(name, computing=True, partial=None)
+
+    def partial(self, name, value):
+        self._update(name, partial=value)
+
+    def finish(self, name, value, version):
+        self._update(name, value=value, version=version, computed_at=datetime.now(), partial=None,
+                     computing=False, stale=False, error=None)
+
+    def fail(self, name, error):
+        self._update(name, partial=None, computing=False, error=error)
+
+
+# Workers that have not been stopped, so a replacement can retire its predecessor
+_workers = weakref.WeakSet()
+
+
+def running_workers():
+    return list(_workers)
+
+
+class PrecomputeWorker:
+    """Daemon thread that recomputes analyses when the data store's version changes.
+
+    ``plan(changes, results)`` returns ``(name, compute)`` pairs for the analyses
+    affected by ``changes`` (the store's change log since the last pass, or None
+    when everything must be recomputed) and for those whose last computation
+    failed. ``compute(on_partial)`` returns the new value. Analyses in a pass run
+    concurrently on a small pool; the previous value stays readable, marked
+    stale, until its replacement is stored. After a pass with failures the
+    worker plans again, with no changes, once a backoff delay has passed, so a
+    transient error does not stick until the data next changes.
+
+    Once the first pass has run, a new version is only acted on after it has
+    held for ``quiet_period`` seconds. A bulk import bumps the version once per
+    chunk, and analysing each half-imported state would spend model calls on
+    results that are stale as soon as the import finishes.
+    """
+
+    def __init__(self, store, results, plan, max_workers=4, poll_interval=2.0, retry_delay=30.0,
+                 max_retry_delay=600.0, quiet_period=10.0):
+        self.store = store
+        self.results = results
+        self.plan = plan
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.quiet_period = quiet_period
+        self.version = None
+        self.passes = 0
+        self._failed_passes = 0
+        self._retry_at = None
+        # Latest version seen and when it was first seen, for the quiet period
+        self._pending_version = None
+        self._pending_since = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._caught_up = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="propinsight-precompute")
+        self._thread = threading.Thread(target=self._run, name="propinsight-precompute", daemon=True)
+        _workers.add(self)
+        self._thread.start()
+
+    # Check the data version now instead of at the next poll; a version still inside its quiet period waits
+    def wake(self):
+        self._wake.set()
+
+    # Stop after the current pass; analyses already running finish but nothing new starts
+    def stop(self):
+        _workers.discard(self)
+        self._stopped.set()
+        self._wake.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # Block until a pass has covered the store's current version; returns False on timeout
+    def wait_idle(self, timeout=None):
+        with self._caught_up:
+            return self._caught_up.wait_for(lambda: self.version == self.store.version, timeout)
+
+    # Run one analysis and store its outcome; returns whether it succeeded
+    def _compute(self, name, compute, version):
+        self.results.start(name)
+        try:
+            value = compute(lambda partial: self.results.partial(name, partial))
+        except Exception as e:
+            self.results.fail(name, str(e))
+            return False
+        self.results.finish(name, value, version)
+        return True
+
+    # Whether version has gone unchanged for the quiet period; the first pass never waits
+    def _settled(self, version):
+        if self.version is None:
+            return True
+        now = time.monotonic()
+        if version != self._pending_version:
+            self._pending_version = version
+            self._pending_since = now
+        return now - self._pending_since >= self.quiet_period
+
+    def _run(self):
+        while not self._stopped.is_set():
+            version = self.store.version
+            retry_due = self._retry_at is not None and time.monotonic() >= self._retry_at
+            # While the data is still changing, neither a new pass nor a retry would see all of it
+            settled = version == self.version or self._settled(version)
+            if settled and (version != self.version or retry_due):
+                changes = None if self.version is None else self.store.changes_since(self.version)
+                jobs = self.plan(changes, self.results)
+                for name, _ in jobs:
+                    self.results.mark_stale(name)
+                try:
+                    futures = [self._pool.submit(self._compute, name, compute, version) for name, compute in jobs]
+                    wait(futures)
+                except RuntimeError:
+                    # The pool was shut down by stop()
+                    break
+                if self._stopped.is_set():
+                    break
+                if all(future.result() for future in futures):
+                    self._failed_passes = 0
+                    self._retry_at = None
+                else:
+                    self._failed_passes += 1
+                    delay = min(self.max_retry_delay, self.retry_delay * 2 ** (self._failed_passes - 1))
+                    self._retry_at = time.monotonic() + delay
+                with self._caught_up:
+                    self.version = version
+                    self.passes += 1
+                    self._caught_up.notify_all()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+# How long ago computed_at was, as text for a "computed at" caption
+def describe_age(computed_at):
+    seconds = max(0, int(time.time() - computed_at.timestamp()))
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{seconds // 60} min ago"
+    return computed_at.strftime("%Y-%m-%d %H:%M")
@@ -0,0 +1,102 @@
+"""Compact prompt encodings and input-token accounting for the analysis prompts."""
+import json
+import threading
+
+# Characters per token assumed when trimming tables; count_tokens has the final say
+CHARS_PER_TOKEN = 4
+
+# Fields each analysis prompt actually uses; ids, addresses and timestamps are dropped
+PROPERTY_FIELDS = ("name", "units", "status", "currentRent", "occupancyRate", "lastRenoDate")
+# Batched prompts keep the id so answers can be matched back to their records
+RECOMMENDATION_FIELDS = ("id",) + PROPERTY_FIELDS
+COMPETITOR_FIELDS = ("name", "avgRent", "units", "occupancyRate", "amenities", "proximity", "nearestProperty")
+
+
+class PromptBudgetExceeded(ValueError):
+    """Raised when a prompt is larger than its function's input-token budget."""
+
+
+def _cell(value):
+    if isinstance(value, list):
+        value = ";".join(str(v) for v in value)
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif value is None:
+        value = ""
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _row(record, fields):
+    return "|".join(_cell(record.get(field)) for field in fields)
+
+
+# Encode records as one header line plus one pipe-separated row per record, keeping only fields.
+# With token_budget set, rows past the budget are left out and counted in a closing line.
+def encode_table(records, fields, token_budget=None):
+    shown = len(records) if token_budget is None else rows_within_budget(records, fields, token_budget)
+    lines = ["|".join(fields)] + [_row(record, fields) for record in records[:shown]]
+    if shown < len(records):
+        lines.append(f"({len(records) - shown} more rows omitted)")
+    return "\n".join(lines)
+
+
+# Estimated tokens of the row encode_table writes for record
+def row_tokens(record, fields):
+    return (len(_row(record, fields)) + 1) / CHARS_PER_TOKEN
+
+
+# How many leading records encode_table keeps within token_budget
+def rows_within_budget(records, fields, token_budget):
+    chars = len("|".join(fields))
+    for index, record in enumerate(records):
+        chars += len(_row(record, fields)) + 1
+        if chars > token_budget * CHARS_PER_TOKEN:
+            return index
+    return len(records)
+
+
+# Length of json.dumps(records), the form the prompts used to embed, without building the string
+def json_length(records):
+    if isinstance(records, dict):
+        return len(json.dumps(records))
+    return sum(len(json.dumps(record)) for record in records) + max(0, 2 * len(records) - 2) + 2
+
+
+class TokenAccounting:
+    """Per-function totals of counted prompt tokens, reported usage and estimated savings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._functions = {}
+
+    def _stats(self, name):
+        return self._functions.setdefault(name, {
+            "calls": 0, "prompt_tokens": 0, "input_tokens": 0, "output_tokens": 0, "legacy_tokens": 0,
+        })
+
+    # Record a prompt as it is sent; legacy_tokens is its estimated size with the JSON encoding
+    def record(self, name, prompt_tokens, legacy_tokens=None):
+        with self._lock:
+            stats = self._stats(name)
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["legacy_tokens"] += legacy_tokens if legacy_tokens is not None else prompt_tokens
+
+    # Record the usage metadata reported once a response is complete
+    def record_usage(self, name, usage):
+        with self._lock:
+            stats = self._stats(name)
+            stats["input_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+            stats["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._functions.items()}
+
+    # Total estimated input tokens saved versus the JSON encoding, and the fraction saved
+    def savings(self):
+        with self._lock:
+            legacy = sum(stats["legacy_tokens"] for stats in self._functions.values())
+            actual = sum(stats["prompt_tokens"] for stats in self._functions.values())
+        saved = legacy - actual
+        return saved, (saved / legacy if legacy else 0.0)
@@ -0,0 +1,141 @@
+"""Immutable column-wise record tables, shared by every session without per-row dicts."""
+import math
+import sys
+from array import array
+from collections.abc import Mapping
+
+# String columns with at most this many distinct values are stored as one byte per row
+MAX_CATEGORIES = 256
+
+
+class _NumberColumn:
+    """Machine numbers in an array; in float columns, NaN stands for a missing value."""
+
+    __slots__ = ("values", "nullable")
+
+    def __init__(self, typecode, values):
+        self.nullable = typecode == "d"
+        self.values = array(typecode, (math.nan if v is None else v for v in values))
+
+    def __getitem__(self, row):
+        value = self.values[row]
+        return None if self.nullable and value != value else value
+
+
+class _CategoryColumn:
+    """Each distinct string once, interned, plus a one-byte code per row."""
+
+    __slots__ = ("labels", "codes")
+
+    def __init__(self, values):
+        self.labels = [sys.intern(label) for label in sorted(set(values))]
+        codes = {label: code for code, label in enumerate(self.labels)}
+        self.codes = array("B", (codes[value] for value in values))
+
+    def __getitem__(self, row):
+        return self.labels[self.codes[row]]
+
+
+# The most compact column that gives back exactly the values stored
+def _column(values):
+    present = [v for v in values if v is not None]
+    kinds = {type(v) for v in present}
+    if kinds == {int} and len(present) == len(values):
+        try:
+            return _NumberColumn("q", values)
+        except OverflowError:
+            return values
+    if float in kinds and kinds <= {int, float}:
+        return _NumberColumn("d", values)
+    if kinds == {str} and len(present) == len(values):
+        distinct = len(set(values))
+        if distinct <= MAX_CATEGORIES and distinct * 2 <= len(values):
+            return _CategoryColumn(values)
+    return values
+
+
+class RecordTable:
+    """Rows of one table held as immutable columns.
+
+    Integer and float columns are arrays of machine numbers, string columns
+    with few distinct values (statuses, types, categories) are dictionary
+    encoded over interned labels, and anything else is a plain list. Rows are
+    read through Record views holding only the table and a row number, so
+    handing out a row copies nothing.
+    """
+
+    def __init__(self, fields, columns):
+        self.fields = tuple(fields)
+        self._positions = {field: i for i, field in enumerate(self.fields)}
+        self._columns = [_column(list(values)) for values in columns]
+        self._length = len(columns[0]) if columns else 0
+
+    # Table of records (dicts or other mappings), keeping only fields
+    @classmethod
+    def from_records(cls, records, fields):
+        return cls(fields, [[record.get(field) for record in records] for field in fields])
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self._length
+        if not 0 <= row < self._length:
+            raise IndexError("RecordTable index out of range")
+        return Record(self, row)
+
+    def __iter__(self):
+        return (Record(self, row) for row in range(self._length))
+
+    def value(self, row, field):
+        return self._columns[self._positions[field]][row]
+
+    # Every value of field, in row order
+    def column(self, field):
+        column = self._columns[self._positions[field]]
+        return [column[row] for row in range(self._length)]
+
+    # Bytes held by the columns, counting each distinct object once
+    def nbytes(self):
+        total = sys.getsizeof(self._columns)
+        for column in self._columns:
+            if isinstance(column, _NumberColumn):
+                total += sys.getsizeof(column.values)
+            elif isinstance(column, _CategoryColumn):
+                total += sys.getsizeof(column.codes) + sum(sys.getsizeof(label) for label in column.labels)
+            else:
+                total += sys.getsizeof(column) + sum(sys.getsizeof(v) for v in {id(v): v for v in column}.values())
+        return total
+
+
+class Record(Mapping):
+    """Read-only dict-like view of one row of a RecordTable."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    # Inlined rather than going through RecordTable.value: index builds read every row this way
+    def __getitem__(self, field):
+        table = self._table
+        return table._columns[table._positions[field]][self._row]
+
+    def get(self, field, default=None):
+        table = self._table
+        position = table._positions.get(field)
+        return default if position is None else table._columns[position][self._row]
+
+    def __iter__(self):
+        return iter(self._table.fields)
+
+    def __len__(self):
+        return len(self._table.fields)
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {field: self[field] for field in self._table.fields}
@@ -0,0 +1,279 @@
+"""In-process BM25 retrieval over portfolio records for grounding chat answers."""
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from llm import estimate_tokens
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have how i in is it me my of on or "
+    "our show tell that the their them there these this to us was we what when where "
+    "which who why with you your".split()
+)
+
+# Text fields indexed per table
+TEXT_FIELDS = {
+    "properties": ("name", "address", "status"),
+    "financial_records": ("date", "type", "category", "description"),
+    "market_data": ("month", "submarket"),
+    "competitors": ("name", "amenities"),
+}
+
+# Numeric fields kept per document for attribute filters
+NUMERIC_FIELDS = {
+    "properties": ("units", "currentRent", "occupancyRate"),
+    "financial_records": ("propertyId", "amount"),
+    "market_data": ("avgPrice", "avgRent", "vacancyRate"),
+    "competitors": ("avgRent", "units", "occupancyRate", "proximity"),
+}
+
+# Field that phrases like "under $2000" constrain, per table
+PRICE_FIELDS = {
+    "properties": "currentRent",
+    "financial_records": "amount",
+    "market_data": "avgRent",
+    "competitors": "avgRent",
+}
+
+# Words in a query that point at a table, used as a small ranking boost
+TABLE_HINTS = {
+    "properties": {"property", "properties", "building", "buildings", "unit", "units", "vacant", "occupied"},
+    "financial_records": {"income", "expense", "expenses", "cost", "costs", "paid", "revenue", "financial"},
+    "market_data": {"market", "trend", "trends", "vacancy", "price", "prices"},
+    "competitors": {"competitor", "competitors", "competition", "amenities"},
+}
+
+PRICE_FILTER_PATTERN = re.compile(
+    r"\b(under|below|less than|over|above|more than|at least|at most)\s+\$?([\d,]+(?:\.\d+)?)(k?)\b"
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _document_text(table, record):
+    parts = []
+    for field in TEXT_FIELDS[table]:
+        value = record.get(field)
+        if isinstance(value, list):
+            parts.extend(str(v) for v in value)
+        elif value is not None:
+            parts.append(str(value))
+    return " ".join(parts)
+
+
+# Turn phrases like "under $2,000" into (lower, upper) bounds on a table's price field
+def parse_price_filter(query):
+    match = PRICE_FILTER_PATTERN.search(query.lower())
+    if not match:
+        return None
+    operator, number, thousands = match.groups()
+    value = float(number.replace(",", "")) * (1000 if thousands else 1)
+    if operator in ("under", "below", "less than", "at most"):
+        return (None, value)
+    return (value, None)
+
+
+class RetrievalIndex:
+    """BM25 inverted index over properties, financial records, market data and competitors.
+
+    Documents are keyed by ``(table, id)``. Only postings and the numeric filter
+    fields are held in memory; matching records are fetched from the store.
+    ``sync`` applies the store's change log so updates are incremental. A full
+    re-index (the first sync, or after the change log stops covering the index,
+    as after another process writes the file) is built into a fresh index and
+    swapped in, so searches keep answering from the old one meanwhile; with
+    ``background=True`` it runs on a daemon thread and ``sync`` returns at once.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.version = None
+        self._store_id = None
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._numeric = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        # Held for the whole of a full re-index, so only one runs at a time
+        self._rebuild_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def upsert(self, table, record):
+        doc_id = (table, record["id"])
+        with self._lock:
+            self._remove(doc_id)
+            terms = Counter(tokenize(_document_text(table, record)))
+            for term, frequency in terms.items():
+                self._postings[term][doc_id] = frequency
+            length = sum(terms.values())
+            self._doc_terms[doc_id] = tuple(terms)
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+            self._numeric[doc_id] = {field: record.get(field) for field in NUMERIC_FIELDS[table]}
+
+    def _remove(self, doc_id):
+        if doc_id not in self._doc_lengths:
+            return
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        del self._numeric[doc_id]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._numeric.clear()
+            self._total_length = 0
+
+    # Changes since the indexed version with the version they bring it to; changes are None when a full re-index is due
+    def _pending_changes(self, store):
+        if self._store_id != id(store) or self.version is None:
+            return store.version, None
+        return store.version_and_changes(self.version)
+
+    # Bring the index up to date with the store, re-indexing only changed rows when possible
+    def sync(self, store, background=False):
+        with self._lock:
+            version, changes = self._pending_changes(store)
+            if changes is not None:
+                for table, ids in changes:
+                    for record in store.get_records(table, ids):
+                        self.upsert(table, record)
+                self.version = version
+                return
+        if not background:
+            self._rebuild(store)
+        elif not self._rebuild_lock.locked():
+            threading.Thread(target=self._rebuild, args=(store,), name="propinsight-retrieval-index",
+                             daemon=True).start()
+
+    # Index every record into a fresh index, then swap it in
+    def _rebuild(self, store):
+        with self._rebuild_lock:
+            with self._lock:
+                if self._pending_changes(store)[1] is not None:
+                    # Another rebuild finished while this one waited; sync covers the rest
+                    return
+            # Read before the rows, so rows written during the rebuild are applied again by the next sync
+            version = store.version
+            fresh = RetrievalIndex(self.k1, self.b)
+            for table in TEXT_FIELDS:
+                for record in store.iter_records(table):
+                    fresh.upsert(table, record)
+            with self._lock:
+                self._postings = fresh._postings
+                self._doc_terms = fresh._doc_terms
+                self._doc_lengths = fresh._doc_lengths
+                self._numeric = fresh._numeric
+                self._total_length = fresh._total_length
+                self._store_id = id(store)
+                self.version = version
+
+    def _matches(self, doc_id, filters):
+        values = self._numeric[doc_id]
+        for field, (lower, upper) in filters.items():
+            value = values.get(field)
+            if value is None:
+                return False
+            if lower is not None and value < lower:
+                return False
+            if upper is not None and value > upper:
+                return False
+        return True
+
+    # Top-k (score, table, id) for a query; filters map table -> {field: (lower, upper)}
+    def search(self, query, k=5, tables=None, filters=None):
+        terms = tokenize(query)
+        hinted = {table for table, hints in TABLE_HINTS.items() if hints.intersection(terms)}
+        with self._lock:
+            count = len(self._doc_lengths)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count or 1.0
+            scores = defaultdict(float)
+            for term in set(terms):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    length_norm = 1 - self.b + self.b * self._doc_lengths[doc_id] / average_length
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+            def candidates():
+                for doc_id, score in scores.items():
+                    table = doc_id[0]
+                    if tables is not None and table not in tables:
+                        continue
+                    table_filters = (filters or {}).get(table)
+                    if table_filters and not self._matches(doc_id, table_filters):
+                        continue
+                    yield (score * (1.5 if table in hinted else 1.0), table, doc_id[1])
+
+            results = heapq.nlargest(k, candidates())
+
+            # Queries like "vacant buildings under $2000" may match few terms; fill up from the filters alone
+            if len(results) < k and filters and hinted:
+                seen = {(table, record_id) for _, table, record_id in results}
+                for doc_id in self._numeric:
+                    if len(results) >= k:
+                        break
+                    table = doc_id[0]
+                    if table in hinted and table in filters and doc_id not in seen and self._matches(doc_id, filters[table]):
+                        results.append((0.0, table, doc_id[1]))
+            return results
+
+
+# Search the index and fetch the matching records from the store, best match first. A full
+# re-index runs in the background; until it finishes, results come from what the index holds.
+def retrieve(index, store, query, k=5):
+    index.sync(store, background=True)
+    price_filter = parse_price_filter(query)
+    filters = {table: {field: price_filter} for table, field in PRICE_FIELDS.items()} if price_filter else None
+    hits = index.search(query, k=k, filters=filters)
+    by_table = defaultdict(list)
+    for _, table, record_id in hits:
+        by_table[table].append(record_id)
+    records = {}
+    for table, ids in by_table.items():
+        for record in store.get_records(table, ids):
+            records[(table, record["id"])] = record
+    return [(table, records[(table, record_id)]) for _, table, record_id in hits if (table, record_id) in records]
+
+
+TABLE_LABELS = {
+    "properties": "Property",
+    "financial_records": "Financial record",
+    "market_data": "Market data",
+    "competitors": "Competitor",
+}
+
+
+# Render retrieved records as prompt lines, stopping before token_budget is exceeded
+def format_records(hits, token_budget):
+    lines = []
+    used = 0
+    for table, record in hits:
+        fields = ", ".join(f"{key}={value}" for key, value in record.items() if value not in (None, ""))
+        line = f"- {TABLE_LABELS[table]}: {fields}"
+        tokens = estimate_tokens(line)
+        if used + tokens > token_budget:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+"""Sample portfolio used to seed an empty data store (would be loaded from a database in a real app)."""
+
+SAMPLE_PROPERTIES = [
+    {
+        "id": 1,
+        "name": "Lakeside Apartments",
+        "address": "123 Lake Drive, Laketown",
+        "units": 24,
+        "status": "occupied",
+        "currentRent": 1800,
+        "lastRenoDate": "2022-05-15",
+        "occupancyRate": 0.92,
+        "latitude": 39.7392,
+        "longitude": -104.9903,
+    },
+    {
+        "id": 2,
+        "name": "Highland Towers",
+        "address": "456 Mountain View, Highland",
+        "units": 16,
+        "status": "occupied",
+        "currentRent": 2100,
+        "lastRenoDate": "2021-08-10",
+        "occupancyRate": 0.88,
+        "latitude": 39.7684,
+        "longitude": -105.0128,
+    },
+    {
+        "id": 3,
+        "name": "Meadow Gardens",
+        "address": "789 Green Valley, Meadowville",
+        "units": 12,
+        "status": "vacant",
+        "currentRent": 1650,
+        "lastRenoDate": "2023-01-20",
+        "occupancyRate": 0.75,
+        "latitude": 39.6787,
+        "longitude": -104.9614,
+    },
+    {
+        "id": 4,
+        "name": "Sunset Condos",
+        "address": "101 Sunset Boulevard, Westside",
+        "units": 8,
+        "status": "pending_renewal",
+        "currentRent": 2300,
+        "lastRenoDate": "2022-11-05",
+        "occupancyRate": 0.95,
+        "latitude": 39.7121,
+        "longitude": -105.0811,
+    }
+]
+
+SAMPLE_FINANCIAL_RECORDS = [
+    {
+        "id": 1,
+        "propertyId": 1,
+        "date": "2023-01-15",
+        "type": "income",
+        "amount": 43200,
+        "category": "rent",
+        "description": "January rent collection"
+    },
+    {
+        "id": 2,
+        "propertyId": 1,
+        "date": "2023-01-25",
+        "type": "expense",
+        "amount": 5500,
+        "category": "maintenance",
+        "description": "HVAC system repair"
+    },
+    {
+        "id": 3,
+        "propertyId": 2,
+        "date": "2023-01-15",
+        "type": "income",
+        "amount": 33600,
+        "category": "rent",
+        "description": "January rent collection"
+    },
+    {
+        "id": 4,
+        "propertyId": 2,
+        "date": "2023-01-20",
+        "type": "expense",
+        "amount": 2800,
+        "category": "utilities",
+        "description": "Water and electricity"
+    }
+]
+
+SAMPLE_MARKET_DATA = [
+    {
+        "id": 1,
+        "month": "2023-01-01",
+        "avgPrice": 255000,
+        "avgRent": 1850,
+        "vacancyRate": 0.05,
+        "inventoryCount": 120,
+        "avgDaysOnMarket": 35
+    },
+    {
+        "id": 2,
+        "month": "2023-02-01",
+        "avgPrice": 258000,
+        "avgRent": 1870,
+        "vacancyRate": 0.045,
+        "inventoryCount": 115,
+        "avgDaysOnMarket": 32
+    },
+    {
+        "id": 3,
+        "month": "2023-03-01",
+        "avgPrice": 262000,
+        "avgRent": 1890,
+        "vacancyRate": 0.042,
+        "inventoryCount": 110,
+        "avgDaysOnMarket": 30
+    },
+    {
+        "id": 4,
+        "month": "2023-04-01",
+        "avgPrice": 265000,
+        "avgRent": 1900,
+        "vacancyRate": 0.04,
+        "inventoryCount": 105,
+        "avgDaysOnMarket": 28
+    }
+]
+
+SAMPLE_COMPETITORS = [
+    {
+        "id": 1,
+        "name": "Horizon Properties",
+        "avgRent": 2100,
+        "units": 45,
+        "occupancyRate": 0.95,
+        "amenities": ["Pool", "Gym", "Covered Parking"],
+        "proximity": 2.5,
+        "lastUpdated": "2023-04-01",
+        "latitude": 39.7505,
+        "longitude": -104.9991
+    },
+    {
+        "id": 2,
+        "name": "Prestige Rentals",
+        "avgRent": 1950,
+        "units": 32,
+        "occupancyRate": 0.90,
+        "amenities": ["Pool", "Pet Friendly", "On-site Laundry"],
+        "proximity": 1.8,
+        "lastUpdated": "2023-03-25",
+        "latitude": 39.722,
+        "longitude": -104.987
+    },
+    {
+        "id": 3,
+        "name": "Urban Living",
+        "avgRent": 2200,
+        "units": 50,
+        "occupancyRate": 0.93,
+        "amenities": ["Gym", "Rooftop Terrace", "Smart Home Features"],
+        "proximity": 3.2,
+        "lastUpdated": "2023-04-05",
+        "latitude": 39.695,
+        "longitude": -105.042
+    }
+]
@@ -0,0 +1,188 @@
+"""Process-wide rate limiting, retries and prioritization for model calls."""
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from llm import estimate_tokens
+
+# Lower values are admitted first; chat pre-empts background analyses waiting for quota
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# HTTP statuses worth retrying: quota exhaustion and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Wait times kept per priority for the queue metrics
+WAIT_SAMPLES = 500
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to one minute's allowance.
+
+    Not thread-safe on its own; the scheduler guards it with its lock.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self._level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Seconds until amount is available
+    def delay(self, amount):
+        self._refill()
+        return 0.0 if self._level >= amount else (amount - self._level) / self.rate
+
+    # Take amount; the level may go negative when a charge is corrected upwards afterwards
+    def take(self, amount):
+        self._refill()
+        self._level -= amount
+
+
+def is_retryable(error):
+    code = getattr(error, "code", None)
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        code = None
+    return code in RETRYABLE_STATUS or isinstance(error, (ConnectionError, TimeoutError))
+
+
+class ModelScheduler:
+    """Admits model calls under requests/min and tokens/min limits, highest priority first.
+
+    Callers queue in priority then arrival order and only the head of the queue
+    may take quota, so once limits bind an interactive request overtakes every
+    background request still waiting. Calls failing with a retryable error are
+    retried with exponential backoff and full jitter, queueing again each time.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_retries=3, base_delay=1.0, max_delay=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_NAMES}
+        self.admitted = 0
+        self.throttled = 0
+        self.retries = 0
+
+    def _acquire(self, priority, tokens):
+        tokens = min(tokens, self._tokens.capacity)
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+        throttled = False
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if self._queue[0] == ticket:
+                        delay = max(self._requests.delay(1), self._tokens.delay(tokens))
+                        if delay <= 0:
+                            self._requests.take(1)
+                            self._tokens.take(tokens)
+                            break
+                        throttled = True
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+            self.admitted += 1
+            self.throttled += int(throttled)
+            self._waits[priority].append(time.monotonic() - start)
+
+    # Correct a call's token charge once its actual prompt size is known
+    def adjust_tokens(self, delta):
+        with self._cond:
+            self._tokens.take(delta)
+
+    # Run fn() once admitted, retrying retryable failures with backoff; tokens is the expected cost
+    def run(self, fn, priority=BACKGROUND, tokens=1):
+        attempt = 0
+        while True:
+            self._acquire(priority, tokens)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+            with self._cond:
+                self.retries += 1
+            time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+            attempt += 1
+
+    def stats(self):
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._queue:
+                depth[PRIORITY_NAMES[priority]] += 1
+            waits = {}
+            for priority, samples in self._waits.items():
+                ordered = sorted(samples)
+                waits[PRIORITY_NAMES[priority]] = {
+                    "avg_ms": 1000 * sum(ordered) / len(ordered) if ordered else 0.0,
+                    "p95_ms": 1000 * ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0.0,
+                }
+            return {
+                "queue_depth": depth,
+                "wait": waits,
+                "admitted": self.admitted,
+                "throttled": self.throttled,
+                "retries": self.retries,
+            }
+
+
+class ScheduledBackend:
+    """Wraps a backend so every generate_content call goes through a ModelScheduler.
+
+    Accepts an extra ``priority`` argument; admission is charged the estimated
+    prompt tokens, corrected from usage metadata for non-streamed calls.
+    """
+
+    def __init__(self, inner, scheduler):
+        self.inner = inner
+        self.scheduler = scheduler
+        self.model_name = inner.model_name
+
+    def generate_content(self, prompt, stream=False, generation_config=None, priority=BACKGROUND):
+        estimate = estimate_tokens(prompt)
+        response = self.scheduler.run(
+            lambda: self.inner.generate_content(prompt, stream=stream, generation_config=generation_config),
+            priority=priority,
+            tokens=estimate,
+        )
+        if not stream:
+            usage = getattr(response, "usage_metadata", None)
+            actual = getattr(usage, "prompt_token_count", None)
+            if actual:
+                self.scheduler.adjust_tokens(actual - estimate)
+        return response
+
+    def count_tokens(self, prompt):
+        return self.inner.count_tokens(prompt)
+
+
+# Create a scheduler configured from environment variables
+def scheduler_from_env():
+    return ModelScheduler(
+        requests_per_minute=float(os.getenv("PROPINSIGHT_RPM", "60")),
+        tokens_per_minute=float(os.getenv("PROPINSIGHT_TPM", "1000000")),
+        max_retries=int(os.getenv("PROPINSIGHT_MAX_RETRIES", "3")),
+    )
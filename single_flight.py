@@ -0,0 +1,70 @@
+"""Coalesce identical concurrent calls so only one of them does the work."""
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its outcome.
+
+    The first caller for a key (the leader) runs the function. Callers that
+    arrive while it runs wait and receive the same result, or the same
+    exception if it fails. If the leader is cancelled instead, for example by a
+    Streamlit rerun or stop, which are BaseExceptions, waiters do not inherit
+    the cancellation: one of them becomes the new leader and retries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.leaders = 0
+        self.shared = 0
+
+    # Call fn() once for all concurrent callers with this key; waiters give up after timeout seconds
+    def do(self, key, fn, timeout=None):
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self.leaders += 1
+                else:
+                    self.shared += 1
+
+            if leader:
+                return self._lead(key, flight, fn)
+
+            if not flight.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for the in-flight call for {key[:12]}")
+            if flight.abandoned:
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+    def _lead(self, key, flight, fn):
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        except BaseException:
+            flight.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"leaders": self.leaders, "shared": self.shared, "in_flight": len(self._flights)}
@@ -0,0 +1,146 @@
+"""Grid index over latitude/longitude for nearest-competitor and radius queries."""
+import heapq
+import math
+from collections import defaultdict
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = math.pi * EARTH_RADIUS_MILES / 180
+
+# Side of a grid cell; about the spacing of competitors in a dense metro, so a query touches few cells
+DEFAULT_CELL_MILES = 1.0
+
+
+# Great-circle distance in miles
+def haversine_miles(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _located(record):
+    return record.get("latitude") is not None and record.get("longitude") is not None
+
+
+class SpatialIndex:
+    """Records bucketed into square cells of cell_miles on a side.
+
+    Cells come from an equirectangular projection at the records' mean
+    latitude, which is accurate at metro scale; distances reported are
+    great-circle miles. Records without coordinates are left out.
+    """
+
+    def __init__(self, records, cell_miles=DEFAULT_CELL_MILES):
+        located = [r for r in records if _located(r)]
+        self.cell_miles = cell_miles
+        self.size = len(located)
+        mean_latitude = sum(r["latitude"] for r in located) / len(located) if located else 0.0
+        self._x_scale = MILES_PER_DEGREE * math.cos(math.radians(mean_latitude)) / cell_miles
+        self._y_scale = MILES_PER_DEGREE / cell_miles
+        self._cells = defaultdict(list)
+        for record in located:
+            lat, lon = float(record["latitude"]), float(record["longitude"])
+            self._cells[self._cell(lat, lon)].append((lat, lon, record))
+        xs = [x for x, _ in self._cells] or [0]
+        ys = [y for _, y in self._cells] or [0]
+        self._bounds = (min(xs), max(xs), min(ys), max(ys))
+
+    def _cell(self, latitude, longitude):
+        return math.floor(longitude * self._x_scale), math.floor(latitude * self._y_scale)
+
+    # Cells exactly r steps (Chebyshev distance) from cell (x, y)
+    def _ring(self, x, y, r):
+        if r == 0:
+            yield x, y
+            return
+        for dx in range(-r, r + 1):
+            yield x + dx, y - r
+            yield x + dx, y + r
+        for dy in range(-r + 1, r):
+            yield x - r, y + dy
+            yield x + r, y + dy
+
+    # Rings that can still hold records: beyond this one every cell is empty
+    def _max_ring(self, x, y):
+        min_x, max_x, min_y, max_y = self._bounds
+        return max(abs(x - min_x), abs(x - max_x), abs(y - min_y), abs(y - max_y))
+
+    # The k records closest to the point as (miles, record), nearest first, optionally no further than max_miles
+    def nearest(self, latitude, longitude, k, max_miles=None):
+        if not self.size or k <= 0:
+            return []
+        x, y = self._cell(latitude, longitude)
+        heap = []  # (-miles, order, record), the k best so far with the furthest on top
+        order = 0
+        for r in range(self._max_ring(x, y) + 1):
+            for cell in self._ring(x, y, r):
+                for lat, lon, record in self._cells.get(cell, ()):
+                    miles = haversine_miles(latitude, longitude, lat, lon)
+                    if max_miles is not None and miles > max_miles:
+                        continue
+                    order += 1
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-miles, order, record))
+                    elif miles < -heap[0][0]:
+                        heapq.heapreplace(heap, (-miles, order, record))
+            # Anything outside rings 0..r is at least r cells away from the query point
+            reach = r * self.cell_miles
+            if (len(heap) == k and -heap[0][0] <= reach) or (max_miles is not None and reach >= max_miles):
+                break
+        return [(-neg_miles, record) for neg_miles, _, record in sorted(heap, key=lambda item: (-item[0], item[1]))]
+
+    # Every record within miles of the point as (miles, record), nearest first
+    def within(self, latitude, longitude, miles):
+        if not self.size:
+            return []
+        x, y = self._cell(latitude, longitude)
+        rings = min(math.ceil(miles / self.cell_miles), self._max_ring(x, y))
+        found = []
+        for r in range(rings + 1):
+            for cell in self._ring(x, y, r):
+                for lat, lon, record in self._cells.get(cell, ()):
+                    distance = haversine_miles(latitude, longitude, lat, lon)
+                    if distance <= miles:
+                        found.append((distance, record))
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+class CompetitorIndex:
+    """Competitors by location, answering each property's nearest competitive set.
+
+    Without coordinates on either side, competitors are ranked by their
+    recorded proximity to the portfolio instead, as before they had locations.
+    """
+
+    def __init__(self, competitors, cell_miles=DEFAULT_CELL_MILES):
+        self.spatial = SpatialIndex(competitors, cell_miles)
+        self.size = len(competitors)
+        self._by_proximity = sorted((c for c in competitors if c.get("proximity") is not None),
+                                    key=lambda c: c["proximity"])
+
+    # Whether distances from prop are measured, rather than the recorded proximity
+    def measures(self, prop):
+        return _located(prop) and self.spatial.size > 0
+
+    # A property's k nearest competitors as (miles, competitor), nearest first
+    def nearest(self, prop, k, max_miles=None):
+        if self.measures(prop):
+            return self.spatial.nearest(float(prop["latitude"]), float(prop["longitude"]), k, max_miles)
+        return [(c["proximity"], c) for c in self._by_proximity[:k]
+                if max_miles is None or c["proximity"] <= max_miles]
+
+    # Union of the properties' k nearest competitors, each once, copied with proximity set to its distance
+    # from the nearest of those properties and nearestProperty to that property's name; nearest first
+    def competitive_set(self, properties, k, max_miles=None):
+        closest = {}
+        for prop in properties:
+            name = prop.get("name") if self.measures(prop) else None
+            for miles, competitor in self.nearest(prop, k, max_miles):
+                key = competitor.get("id", id(competitor))
+                if key not in closest or miles < closest[key][0]:
+                    closest[key] = (miles, competitor, name)
+        return [
+            {**competitor, "proximity": round(miles, 2), "nearestProperty": name}
+            for miles, competitor, name in sorted(closest.values(), key=lambda item: item[0])
+        ]
@@ -0,0 +1,201 @@
+"""Response schemas, validation and incremental JSON parsing for the structured analyses."""
+import json
+
+
+def _string_list():
+    return {"type": "array", "items": {"type": "string"}}
+
+
+def _enum(*values):
+    return {"type": "string", "format": "enum", "enum": list(values)}
+
+
+# The market figures are computed locally; the model only supplies the narrative
+MARKET_NARRATIVE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "insights": _string_list(),
+        "recommendations": _string_list(),
+    },
+    "required": ["insights", "recommendations"],
+}
+
+# Recommendations for a batch of properties, one entry per property id in the prompt
+RECOMMENDATIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "recommendations": _string_list(),
+                },
+                "required": ["id", "recommendations"],
+            },
+        },
+    },
+    "required": ["results"],
+}
+
+COMPETITOR_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "competitivePosition": _enum("strong", "moderate", "weak"),
+        "strengths": _string_list(),
+        "weaknesses": _string_list(),
+        "opportunities": _string_list(),
+        "threats": _string_list(),
+        "strategies": _string_list(),
+    },
+    "required": ["competitivePosition", "strengths", "weaknesses", "opportunities", "threats", "strategies"],
+}
+
+
+# Generation config asking the model for JSON that matches schema
+def json_generation_config(schema):
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+# Check value against the subset of OpenAPI schema used above; returns a list of problems
+def validate(value, schema, path="$"):
+    kind = schema["type"]
+    if kind == "object":
+        if not isinstance(value, dict):
+            return [f"{path} must be an object"]
+        errors = [f"{path}.{key} is missing" for key in schema.get("required", ()) if key not in value]
+        for key, field_schema in schema["properties"].items():
+            if key in value:
+                errors.extend(validate(value[key], field_schema, f"{path}.{key}"))
+        return errors
+    if kind == "array":
+        if not isinstance(value, list):
+            return [f"{path} must be an array"]
+        errors = []
+        for index, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+        return errors
+    if kind == "number":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return [f"{path} must be a number"]
+        return []
+    if kind == "integer":
+        if isinstance(value, bool) or not isinstance(value, int):
+            return [f"{path} must be an integer"]
+        return []
+    if not isinstance(value, str):
+        return [f"{path} must be a string"]
+    if "enum" in schema and value not in schema["enum"]:
+        return [f"{path} must be one of {schema['enum']}, got {value!r}"]
+    return []
+
+
+class PartialJSONParser:
+    """Parses a streamed JSON object as it arrives.
+
+    Characters are scanned once, tracking nesting and string state. Whenever a
+    top-level field or an item of a top-level array completes, the text so far
+    is closed off and decoded, so ``feed`` can hand back a growing snapshot
+    such as ``{"trend": "increasing", "insights": ["first insight"]}`` long
+    before the closing brace arrives.
+    """
+
+    # Only cut points at this depth or shallower produce a new snapshot
+    SNAPSHOT_DEPTH = 2
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self._stack = []
+        self._in_string = False
+        self._string_is_key = False
+        self._escaped = False
+        self._cut = None
+        self._snapshot = None
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def _mark(self, position):
+        if 0 < len(self._stack) <= self.SNAPSHOT_DEPTH:
+            self._cut = (position, "".join("}" if c[0] == "{" else "]" for c in reversed(self._stack)))
+
+    # Add a chunk of streamed text; returns a new snapshot dict if more of the object completed, else None
+    def feed(self, chunk):
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        previous_cut = self._cut
+        stack = self._stack
+        for index, char in enumerate(chunk, start=offset):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if not self._string_is_key:
+                        self._mark(index + 1)
+            elif char == '"':
+                self._in_string = True
+                self._string_is_key = bool(stack) and stack[-1][0] == "{" and stack[-1][1]
+            elif char in "{[":
+                stack.append([char, char == "{"])
+                self._mark(index + 1)
+            elif char in "}]":
+                if stack:
+                    stack.pop()
+                self._mark(index + 1)
+                if not stack:
+                    self._cut = (index + 1, "")
+            elif char == ",":
+                self._mark(index)
+                if stack and stack[-1][0] == "{":
+                    stack[-1][1] = True
+            elif char == ":":
+                if stack:
+                    stack[-1][1] = False
+
+        if self._cut is None or self._cut == previous_cut:
+            return None
+        position, closing = self._cut
+        try:
+            snapshot = json.loads(self.text[:position] + closing)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(snapshot, dict) or snapshot == self._snapshot:
+            return None
+        self._snapshot = snapshot
+        return snapshot
+
+
+REPAIR_PROMPT = """The JSON below was meant to match this schema but failed validation.
+
+        Schema:
+        {schema}
+
+        Problems:
+        {problems}
+
+        JSON:
+        {text}
+
+        Return only the corrected JSON object, keeping every valid value unchanged."""
+
+
+# Decode a complete reply and validate it; returns (value, problems), value is None if undecodable
+def parse_reply(text, schema):
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError as e:
+        return None, [f"not valid JSON: {e}"]
+    problems = validate(value, schema)
+    return (value if not problems else None), problems
+
+
+# Prompt asking the model to fix a reply that failed parse_reply
+def repair_prompt(text, schema, problems):
+    return REPAIR_PROMPT.format(schema=json.dumps(schema), problems="\n".join(f"- {p}" for p in problems), text=text)
@@ -0,0 +1,69 @@
+import json
+
+from batch_analysis import ResultLog, _entry, plan_items
+from datastore import PortfolioStore
+
+
+def _store(count):
+    store = PortfolioStore(":memory:")
+    store.insert_many("properties", [{"id": i, "name": f"Property {i}"} for i in range(1, count + 1)])
+    return store
+
+
+def test_result_log_resumes_finished_items_and_retries_errors(tmp_path):
+    path = tmp_path / "results.jsonl"
+    log = ResultLog(str(path))
+    log.write([_entry("recommendations", 1, ["a"]), _entry("recommendations", 2, error="boom")])
+    log.close()
+
+    reopened = ResultLog(str(path))
+    reopened.close()
+    assert reopened.done == {("recommendations", 1)}
+    assert reopened.resumed == 1
+
+
+def test_result_log_drops_a_torn_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    log = ResultLog(str(path))
+    log.write([_entry("market", "market", {"trend": "stable"})])
+    log.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"analysis": "recommendations", "key": 7, "res')
+
+    reopened = ResultLog(str(path))
+    reopened.write([_entry("recommendations", 7, ["b"])])
+    reopened.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["key"] for line in lines] == ["market", 7]
+    assert reopened.done == {("market", "market"), ("recommendations", 7)}
+
+
+def test_result_log_fresh_discards_earlier_results(tmp_path):
+    path = tmp_path / "results.jsonl"
+    log = ResultLog(str(path))
+    log.write([_entry("market", "market", {})])
+    log.close()
+
+    fresh = ResultLog(str(path), fresh=True)
+    fresh.close()
+    assert fresh.done == set()
+    assert path.read_text(encoding="utf-8") == ""
+
+
+def test_plan_items_skips_finished_items():
+    store = _store(7)
+    done = {("market", "market"), ("recommendations", 2), ("recommendations", 5)}
+
+    items = list(plan_items(store, {"market", "competitors", "recommendations"}, 2, done))
+
+    assert items[0] == ("competitors", None)
+    chunks = [[prop["id"] for prop in payload] for analysis, payload in items[1:]]
+    assert all(analysis == "recommendations" for analysis, _ in items[1:])
+    assert chunks == [[1, 3], [4, 6], [7]]
+
+
+def test_plan_items_only_plans_the_requested_analyses():
+    store = _store(3)
+
+    assert list(plan_items(store, {"market"}, 10, set())) == [("market", None)]
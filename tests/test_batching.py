@@ -0,0 +1,69 @@
+import threading
+
+from batching import BatchRunner, pack_batches
+
+
+def test_pack_batches_respects_budget_and_max_items():
+    batches = pack_batches(list(range(10)), cost=lambda item: 3, budget=10, max_items=2)
+    assert batches == [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]
+    assert pack_batches([1, 20, 1], cost=lambda item: item, budget=10) == [[1], [20], [1]]
+
+
+def _runner(run_batch, **options):
+    return BatchRunner(run_batch, cost=lambda item: 1, budget=100, max_items=4, **options)
+
+
+def test_only_items_missing_from_a_reply_are_retried():
+    calls = []
+    lock = threading.Lock()
+
+    def run_batch(batch):
+        ids = [item["id"] for item in batch]
+        with lock:
+            calls.append(ids)
+            first_try = len(calls) <= 2
+        # Item 3 is left out of its first reply
+        return {i: f"result {i}" for i in ids if not (i == 3 and first_try)}
+
+    results, failures = _runner(run_batch).run([{"id": i} for i in range(1, 9)])
+
+    assert results == {i: f"result {i}" for i in range(1, 9)}
+    assert failures == {}
+    assert sorted(calls[:2]) == [[1, 2, 3, 4], [5, 6, 7, 8]]
+    assert calls[2:] == [[3]]
+
+
+def test_replies_rejected_by_check_are_retried_until_attempts_run_out():
+    calls = []
+
+    def run_batch(batch):
+        calls.append([item["id"] for item in batch])
+        return {item["id"]: [] if item["id"] == 2 else ["ok"] for item in batch}
+
+    runner = _runner(run_batch, check=lambda reply: None if reply else "empty", max_attempts=3, max_workers=1)
+    results, failures = runner.run([{"id": 1}, {"id": 2}])
+
+    assert results == {1: ["ok"]}
+    assert failures == {2: "empty"}
+    assert calls == [[1, 2], [2], [2]]
+    assert runner.stats() == {"batches": 1, "retry_batches": 2, "items": 2, "retried": 2, "failed": 1}
+
+
+def test_a_batch_that_raises_is_retried_in_halves_to_isolate_the_bad_item():
+    def run_batch(batch):
+        ids = [item["id"] for item in batch]
+        if 3 in ids:
+            raise RuntimeError("bad row")
+        return {i: i * 10 for i in ids}
+
+    results, failures = _runner(run_batch, max_attempts=4).run([{"id": i} for i in range(1, 5)])
+
+    assert results == {1: 10, 2: 20, 4: 40}
+    assert failures == {3: "RuntimeError: bad row"}
+
+
+def test_no_items_makes_no_calls():
+    def run_batch(batch):
+        raise AssertionError("called")
+
+    assert _runner(run_batch).run([]) == ({}, {})
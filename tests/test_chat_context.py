@@ -0,0 +1,67 @@
+from chat_context import ChatContext, format_turn
+
+
+def _count(text):
+    return len(text.split())
+
+
+def _history(count):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * 8}
+            for i in range(count)]
+
+
+def test_short_history_is_sent_unchanged_without_summarizing():
+    calls = []
+    history = _history(2)
+
+    block = ChatContext(budget=100).build(history, 10, _count, lambda *args: calls.append(args))
+
+    assert calls == []
+    assert block == "Recent conversation:\n" + "\n".join(format_turn(m) for m in history)
+    assert all("tokens" in message for message in history)
+
+
+def test_overflow_folds_oldest_turns_into_the_summary_under_target():
+    context = ChatContext(budget=60, target_ratio=0.5)
+    history = _history(8)
+    folded = []
+
+    def summarize(summary, turns):
+        folded.append(turns)
+        return "user asked about rent"
+
+    block = context.build(history, 10, _count, summarize)
+
+    assert len(folded) == 1 and "turn 0" in folded[0]
+    assert block.startswith("Summary of the earlier conversation:\nuser asked about rent")
+    window = history[context.summarized_upto:]
+    assert sum(message["tokens"] for message in window) <= (60 - 10 - context.summary_tokens) * 0.5
+    assert "turn 7" in block and "turn 0" not in block
+
+
+def test_counts_each_message_once_across_builds():
+    counted = []
+
+    def count(text):
+        counted.append(text)
+        return _count(text)
+
+    context = ChatContext(budget=1000)
+    history = _history(3)
+    context.build(history, 0, count, lambda *args: None)
+    history.append({"role": "user", "content": "another"})
+    context.build(history, 0, count, lambda *args: None)
+
+    assert len(counted) == 4
+
+
+def test_failed_summary_drops_folded_turns_and_cleared_history_resets():
+    context = ChatContext(budget=40)
+    history = _history(6)
+
+    block = context.build(history, 0, _count, lambda summary, turns: None)
+
+    assert context.summary == "" and context.summarized_upto > 0
+    assert "turn 0" not in block
+    context.build([], 0, _count, lambda *args: None)
+    assert context.summarized_upto == 0
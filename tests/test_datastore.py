@@ -0,0 +1,67 @@
+from datastore import PortfolioStore
+
+
+def _property(id, name="Unit"):
+    return {"id": id, "name": name, "status": "occupied"}
+
+
+def test_table_version_only_moves_for_writes_to_that_table():
+    store = PortfolioStore()
+    store.insert_many("properties", [_property(1)])
+    properties_version = store.table_version("properties")
+    store.insert_many("competitors", [{"id": 1, "name": "Rival"}])
+
+    assert store.table_version("properties") == properties_version
+    assert store.table_version("competitors") == store.version
+    assert store.table_version("properties", "competitors") == store.version
+    assert store.table_version("financial_records") == 0
+
+
+def test_changes_since_lists_writes_and_row_versions_follow_them():
+    store = PortfolioStore()
+    store.insert_many("properties", [_property(1), _property(2)])
+    start = store.version
+    store.insert_many("properties", [_property(2, "Renamed")])
+
+    assert store.changes_since(start) == [("properties", [2])]
+    assert store.changes_since(store.version) == []
+    assert store.row_versions("properties", [1, 2]) == [start, store.version]
+
+
+def test_external_writes_invalidate_everything(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    store = PortfolioStore(path)
+    store.insert_many("properties", [_property(1)])
+    before = store.version
+
+    PortfolioStore(path).insert_many("financial_records", [{"id": 1, "propertyId": 1, "amount": 10.0}])
+
+    assert store.version > before
+    assert store.changes_since(before) is None
+    assert store.table_version("properties") == store.version
+    assert store.row_versions("properties", [1]) == [store.version]
+
+
+def test_market_data_pages_in_month_order_and_reports_submarkets():
+    store = PortfolioStore()
+    store.insert_many("market_data", [{"id": i, "month": f"2024-{13 - i:02d}"} for i in range(1, 13)])
+    assert not store.has_submarkets()
+
+    page = store.list_market_data(limit=5, offset=5)
+    store.insert_many("market_data", [{"id": 13, "month": "2025-01", "submarket": "north"}])
+
+    assert [row["month"] for row in page] == [f"2024-{m:02d}" for m in range(6, 11)]
+    assert store.has_submarkets()
+
+
+def test_unused_financial_record_indexes_are_dropped_from_existing_files(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    store = PortfolioStore(path)
+    store._conn.execute('CREATE INDEX idx_financial_records_date ON financial_records ("date")')
+    store._conn.commit()
+
+    indexes = {row[0] for row in PortfolioStore(path)._conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    assert "idx_financial_records_date" not in indexes
+    assert "idx_properties_status" in indexes
@@ -0,0 +1,85 @@
+import io
+import json
+
+import pytest
+
+from datastore import PortfolioStore
+from importer import ImportValidationError, import_stream, validate_row
+
+PROPERTY = {"id": 1, "name": "Sunset", "status": "occupied", "units": 10, "currentRent": 1800, "occupancyRate": 0.9}
+RECORD = {"id": 1, "propertyId": 1, "date": "2023-01-05", "type": "income", "amount": 500, "category": "rent"}
+
+
+def _jsonl(*rows):
+    return io.BytesIO("".join((row if isinstance(row, str) else json.dumps(row)) + "\n" for row in rows).encode())
+
+
+def _import(stream, table, file_format="jsonl", **options):
+    store = PortfolioStore(":memory:")
+    return store, import_stream(stream, table, file_format, store, **options)
+
+
+def test_csv_values_are_parsed_and_unknown_columns_dropped():
+    csv = ("id,name,status,units,currentRent,occupancyRate,latitude,longitude,nickname\n"
+           "1,Sunset,occupied,10,1800.50,0.9,39.7,-104.9,sunny\n"
+           "2,Oak,vacant,4,900,0,,,\n")
+    store, report = _import(io.BytesIO(csv.encode()), "properties", "csv")
+
+    assert (report.rows_written, report.rows_rejected) == (2, 0)
+    first, second = store.list_properties()
+    assert first["currentRent"] == 1800.5 and first["units"] == 10 and first["latitude"] == 39.7
+    assert "nickname" not in first
+    assert second["latitude"] is None
+
+
+@pytest.mark.parametrize("row, problem", [
+    ("[1, 2]", "row must be an object"),
+    ("not json", "Expecting value"),
+    ({**RECORD, "amount": "nan"}, "amount must be a finite number"),
+    ({**RECORD, "amount": 1e400}, "amount must be a finite number"),
+    ({**RECORD, "id": "inf"}, "id must be a finite number"),
+    ({**RECORD, "id": "1e400"}, "id must be a finite number"),
+    ({**RECORD, "id": 1.5}, "id must be a whole number"),
+    ({**RECORD, "type": "refund"}, "type must be one of"),
+    ({**RECORD, "date": "05/01/2023"}, "date Invalid isoformat"),
+    ({key: value for key, value in RECORD.items() if key != "category"}, "category is missing"),
+])
+def test_bad_rows_are_rejected_one_at_a_time(row, problem):
+    store, report = _import(_jsonl(RECORD | {"id": 10}, row, RECORD | {"id": 11}), "financial_records")
+
+    assert (report.rows_written, report.rows_rejected) == (2, 1)
+    assert report.errors[0].startswith("line 2: ")
+    assert problem in report.errors[0]
+    assert store.financial_record_columns()[0] == [10, 11]
+
+
+@pytest.mark.parametrize("field, value", [("occupancyRate", 1.2), ("latitude", 91), ("longitude", -181)])
+def test_rates_and_coordinates_are_range_checked(field, value):
+    with pytest.raises(ValueError, match=field):
+        validate_row("properties", {**PROPERTY, field: value})
+
+
+def test_strict_mode_stops_at_the_first_bad_row():
+    with pytest.raises(ImportValidationError, match="financial_records line 2"):
+        _import(_jsonl(RECORD, {**RECORD, "amount": "x"}), "financial_records", strict=True)
+
+
+def test_amenities_accept_json_lists_and_semicolon_strings():
+    competitor = {"id": 1, "name": "Rival", "avgRent": 2000, "units": 50, "occupancyRate": 0.9, "proximity": 1.2}
+    assert validate_row("competitors", {**competitor, "amenities": "Pool; Gym"})["amenities"] == ["Pool", "Gym"]
+    assert validate_row("competitors", {**competitor, "amenities": '["Pool"]'})["amenities"] == ["Pool"]
+
+
+def test_rows_are_written_a_chunk_at_a_time_with_progress():
+    reports = []
+    rows = [{**RECORD, "id": i} for i in range(1, 8)]
+    store, report = _import(_jsonl(*rows), "financial_records", chunk_size=3,
+                            progress=lambda r: reports.append((r.chunks, r.rows_written)))
+
+    assert reports == [(1, 3), (2, 6), (3, 7)]
+    assert store.count("financial_records") == 7
+
+
+def test_unknown_tables_are_refused():
+    with pytest.raises(ValueError, match="Unknown table"):
+        _import(_jsonl(RECORD), "tenants")
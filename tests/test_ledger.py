@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from ledger import Ledger, PropertyIndex
+
+PROPERTIES = [{"id": 2, "name": "Maple Court"}, {"id": 1, "name": "Harbor View"}]
+
+
+def _ledger():
+    return Ledger(
+        ids=[3, 1, 2, 4],
+        property_ids=[1, 2, 1, 9],
+        dates=["2024-03-01", "2024-01-01", "2024-02-01", "2024-01-15"],
+        types=["income", "expense", "income", "expense"],
+        amounts=[100.0, 40.0, 250.0, 10.0],
+        categories=["rent", "repairs", "rent", "utilities"],
+        descriptions=["March", "Boiler", "February", "Water"],
+    )
+
+
+def test_totals_group_by_each_column_within_a_mask():
+    ledger = _ledger()
+
+    assert ledger.totals("type") == {"expense": 50.0, "income": 350.0}
+    assert ledger.totals("propertyId") == {1: 350.0, 2: 40.0, 9: 10.0}
+    assert ledger.totals("category", ledger.mask(property_id=1)) == {"rent": 350.0, "repairs": 0.0, "utilities": 0.0}
+    with pytest.raises(ValueError):
+        ledger.totals("description")
+
+
+def test_mask_filters_and_unknown_types_match_nothing():
+    ledger = _ledger()
+
+    assert ledger.mask(property_id=1, record_type="income").tolist() == [True, False, True, False]
+    assert not ledger.mask(record_type="refund").any()
+
+
+def test_ordered_rows_sorts_the_masked_rows():
+    ledger = _ledger()
+    everything = ledger.mask()
+
+    assert ledger.ids[ledger.ordered_rows(everything)].tolist() == [1, 2, 3, 4]
+    assert ledger.ids[ledger.ordered_rows(everything, "amount", descending=True)].tolist() == [2, 3, 1, 4]
+    assert ledger.ids[ledger.ordered_rows(ledger.mask(record_type="expense"), "date")].tolist() == [1, 4]
+
+
+def test_table_joins_property_names_and_formats_rows():
+    ledger = _ledger()
+    table = ledger.table(ledger.ordered_rows(ledger.mask(), "date"), PropertyIndex(PROPERTIES))
+
+    assert table["Property"] == ["Maple Court", "Unknown", "Harbor View", "Harbor View"]
+    assert table["Type"] == ["Expense", "Expense", "Income", "Income"]
+    assert table["Amount"][0] == "$40.00"
+
+
+def test_property_index_maps_unknown_ids_and_keeps_the_first_duplicate_name():
+    index = PropertyIndex(PROPERTIES + [{"id": 3, "name": "Harbor View"}])
+
+    assert index.id_by_name["Harbor View"] == 1
+    assert index.names_for(np.array([3, 7, 2])).tolist() == ["Harbor View", "Unknown", "Maple Court"]
+    assert PropertyIndex([]).names_for(np.array([1])).tolist() == ["Unknown"]
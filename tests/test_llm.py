@@ -0,0 +1,50 @@
+import pytest
+
+from llm import LLMResponse, ReplayBackend, ReplayMissError, estimate_tokens
+
+
+class _Model:
+    """Backend whose token counts differ from the character estimate, like a real tokenizer."""
+
+    model_name = "test-model"
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        return LLMResponse([f"answer to {prompt}"], prompt_tokens=1000 + len(prompt), output_tokens=7)
+
+    def count_tokens(self, prompt):
+        return 500 + len(prompt)
+
+
+def test_replay_returns_recorded_text_and_token_counts(tmp_path):
+    path = str(tmp_path / "replay.jsonl")
+    recorder = ReplayBackend(path, inner=_Model())
+    recorded = recorder.generate_content("hello", generation_config={"temperature": 0})
+    assert recorder.count_tokens("hello world") == 511
+
+    replay = ReplayBackend(path)
+    response = replay.generate_content("hello", stream=True, generation_config={"temperature": 0})
+
+    assert "".join(chunk.text for chunk in response) == recorded.text == "answer to hello"
+    assert response.usage_metadata.prompt_token_count == 1005
+    assert response.usage_metadata.candidates_token_count == 7
+    assert replay.count_tokens("hello world") == 511
+    assert replay.count_tokens("never counted") == estimate_tokens("never counted")
+
+
+def test_replay_rejects_prompts_it_has_not_seen(tmp_path):
+    path = str(tmp_path / "replay.jsonl")
+    ReplayBackend(path, inner=_Model()).generate_content("hello")
+
+    with pytest.raises(ReplayMissError):
+        ReplayBackend(path).generate_content("hello", generation_config={"temperature": 1})
+
+
+def test_files_recorded_without_token_counts_still_replay(tmp_path):
+    path = tmp_path / "replay.jsonl"
+    key = ReplayBackend._key("hello", None)
+    path.write_text(f'{{"key": "{key}", "text": "old answer"}}\n', encoding="utf-8")
+
+    response = ReplayBackend(str(path)).generate_content("hello")
+
+    assert response.text == "old answer"
+    assert response.usage_metadata.prompt_token_count == estimate_tokens("hello")
@@ -0,0 +1,78 @@
+import llm_cache
+from llm_cache import ResponseCache, make_cache_key
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def _cache(monkeypatch, **options):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock.time)
+    return ResponseCache(**options), clock
+
+
+def test_cache_keys_depend_on_every_part_but_not_on_dict_order():
+    key = make_cache_key("analyze", 1, "model", {"a": 1, "b": 2})
+    assert key == make_cache_key("analyze", 1, "model", {"b": 2, "a": 1})
+    assert key != make_cache_key("analyze", 2, "model", {"a": 1, "b": 2})
+    assert key != make_cache_key("analyze", 1, "other-model", {"a": 1, "b": 2})
+    assert key != make_cache_key("analyze", 1, "model", {"a": 1, "b": 3})
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache, clock = _cache(monkeypatch, ttl_seconds=60)
+    cache.set("k", {"v": 1})
+    clock.now += 59
+    assert cache.get("k") == {"v": 1}
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 0}
+
+
+def test_the_least_recently_used_entry_is_evicted(monkeypatch):
+    cache, _ = _cache(monkeypatch, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_count_false_leaves_the_counters_alone(monkeypatch):
+    cache, _ = _cache(monkeypatch)
+    cache.set("k", 1)
+    cache.get("k", count=False)
+    cache.get("missing", count=False)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 0)
+
+
+def test_the_backing_file_survives_a_restart_and_keeps_the_most_read_entries(monkeypatch, tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache, clock = _cache(monkeypatch, max_entries=2, path=path)
+    cache.set("a", [1])
+    clock.now += 1
+    cache.set("b", [2])
+    clock.now += 1
+    # A memory hit must count as a use on disk too, so "b" is the one pruned
+    cache.get("a")
+    clock.now += 1
+    cache.set("c", [3])
+
+    restarted = ResponseCache(max_entries=2, path=path)
+    assert restarted.get("a") == [1]
+    assert restarted.get("c") == [3]
+    assert restarted.get("b") is None
+
+
+def test_expired_entries_on_disk_are_misses(monkeypatch, tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache, clock = _cache(monkeypatch, ttl_seconds=10, path=path)
+    cache.set("k", "v")
+    clock.now += 11
+    assert ResponseCache(ttl_seconds=10, path=path).get("k") is None
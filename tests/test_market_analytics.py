@@ -0,0 +1,59 @@
+import math
+
+from market_analytics import UNASSIGNED_GROUP, SeriesMatrix, market_summary
+
+
+def _month(month, rent, submarket=None, **fields):
+    return {"month": month, "avgRent": rent, "submarket": submarket, **fields}
+
+
+def _row(summary, series):
+    return next(row for row in summary if row["series"] == series)
+
+
+def test_duplicate_period_records_are_averaged_per_metric():
+    records = [
+        _month("2024-01", 1000.0, vacancyRate=0.05),
+        _month("2024-01", 1200.0),
+        _month("2024-02", 1300.0, vacancyRate=0.04),
+    ]
+
+    matrix = SeriesMatrix.from_records(records, metrics=("avgRent", "vacancyRate"))
+
+    assert matrix.periods == ["2024-01", "2024-02"]
+    assert matrix.values.tolist() == [[1100.0, 1300.0], [0.05, 0.04]]
+
+
+def test_summary_reports_change_trend_and_forecast():
+    records = [_month(f"2024-0{i}", 1000.0 + 100 * i) for i in range(1, 5)]
+
+    row = _row(SeriesMatrix.from_records(records, metrics=("avgRent",)).summary(), "avgRent")
+
+    assert (row["periods"], row["first"], row["last"]) == (4, 1100.0, 1400.0)
+    assert row["trend"] == "increasing"
+    assert row["changePct"] == round(300 / 1100 * 100, 2)
+    assert row["forecast"] == 1700.0
+
+
+def test_missing_periods_are_skipped():
+    records = [_month("2024-01", 1000.0), _month("2024-02", None), _month("2024-03", 1000.0)]
+
+    matrix = SeriesMatrix.from_records(records, metrics=("avgRent",))
+
+    assert math.isnan(matrix.values[0, 1])
+    assert _row(matrix.summary(), "avgRent")["periods"] == 2
+
+
+def test_market_summary_averages_submarkets_and_keeps_unassigned_rows():
+    records = [
+        _month("2024-01", 1000.0, "north"),
+        _month("2024-01", 2000.0, "south"),
+        _month("2024-01", 3000.0),
+        _month("2024-01", 900.0, "north"),
+    ]
+
+    summary = market_summary(records)
+
+    assert _row(summary, "north:avgRent")["last"] == 950.0
+    assert _row(summary, f"{UNASSIGNED_GROUP}:avgRent")["last"] == 3000.0
+    assert _row(summary, "avgRent")["last"] == round((950.0 + 2000.0 + 3000.0) / 3, 4)
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from precompute import AnalysisResults, PrecomputeWorker
+
+
+class _Store:
+    def __init__(self):
+        self.version = 0
+
+    def changes_since(self, version):
+        return [("properties", [self.version])]
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _worker(store, plan, **kwargs):
+    kwargs.setdefault("poll_interval", 0.01)
+    return PrecomputeWorker(store, AnalysisResults(), plan, max_workers=1, **kwargs)
+
+
+def test_first_pass_runs_immediately_and_stores_results():
+    store = _Store()
+    seen = []
+
+    def plan(changes, results):
+        seen.append(changes)
+        return [("summary", lambda on_partial: "ok")]
+
+    worker = _worker(store, plan, quiet_period=60)
+    try:
+        assert worker.wait_idle(timeout=5)
+        assert seen == [None]
+        entry = worker.results.get("summary")
+        assert entry["value"] == "ok" and entry["version"] == 0 and not entry["stale"]
+    finally:
+        worker.stop()
+
+
+def test_waits_for_the_version_to_settle_before_replanning():
+    store = _Store()
+    planned = []
+
+    def plan(changes, results):
+        planned.append(store.version)
+        return []
+
+    worker = _worker(store, plan, quiet_period=0.5)
+    try:
+        assert worker.wait_idle(timeout=5)
+        # An import bumping the version chunk by chunk
+        for _ in range(5):
+            store.version += 1
+            time.sleep(0.05)
+        assert planned == [0]
+        assert worker.wait_idle(timeout=5)
+        assert planned == [0, 5]
+    finally:
+        worker.stop()
+
+
+def test_failed_analysis_is_retried_after_the_backoff():
+    store = _Store()
+    attempts = []
+    lock = threading.Lock()
+
+    def compute(on_partial):
+        with lock:
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("model unavailable")
+        return "ok"
+
+    def plan(changes, results):
+        return [("summary", compute)]
+
+    worker = _worker(store, plan, retry_delay=0.05)
+    try:
+        _wait_until(lambda: (worker.results.get("summary") or {}).get("value") == "ok")
+        entry = worker.results.get("summary")
+        assert entry["error"] is None and len(attempts) == 2
+    finally:
+        worker.stop()
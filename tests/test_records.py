@@ -0,0 +1,55 @@
+import pytest
+
+from records import RecordTable, _CategoryColumn, _NumberColumn
+
+FIELDS = ("id", "name", "status", "rent", "notes")
+
+
+def _records(count):
+    return [{
+        "id": i,
+        "name": f"Unit {i}",
+        "status": "occupied" if i % 3 else "vacant",
+        "rent": None if i == 2 else 1000.5 + i,
+        "notes": None if i % 2 else "corner",
+    } for i in range(count)]
+
+
+def test_rows_read_back_exactly_what_was_stored():
+    records = _records(10)
+    table = RecordTable.from_records(records, FIELDS)
+
+    assert len(table) == 10
+    assert [row.to_dict() for row in table] == records
+    assert table[-1]["name"] == "Unit 9"
+    assert table.column("rent")[2] is None
+    assert table.value(4, "status") == "occupied"
+
+
+def test_columns_use_compact_encodings():
+    table = RecordTable.from_records(_records(10), FIELDS)
+    columns = dict(zip(FIELDS, table._columns))
+
+    assert isinstance(columns["id"], _NumberColumn)
+    assert isinstance(columns["rent"], _NumberColumn)
+    assert isinstance(columns["status"], _CategoryColumn)
+    assert isinstance(columns["name"], list)
+    assert isinstance(columns["notes"], list)
+
+
+def test_records_behave_like_read_only_mappings():
+    row = RecordTable.from_records(_records(3), FIELDS)[1]
+
+    assert dict(row) == row.to_dict()
+    assert row.get("missing", "default") == "default"
+    assert "status" in row and len(row) == len(FIELDS)
+    with pytest.raises(TypeError):
+        row["name"] = "changed"
+    with pytest.raises(IndexError):
+        RecordTable.from_records(_records(3), FIELDS)[3]
+
+
+def test_empty_and_oversized_values_are_kept():
+    assert len(RecordTable(("id",), [[]])) == 0
+    table = RecordTable.from_records([{"id": 2 ** 70}, {"id": 1}], ("id",))
+    assert table.column("id") == [2 ** 70, 1]
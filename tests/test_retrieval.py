@@ -0,0 +1,95 @@
+import threading
+import time
+
+from datastore import PortfolioStore
+from retrieval import RetrievalIndex, parse_price_filter, retrieve
+
+
+def _property(id, name, rent=1500.0):
+    return {"id": id, "name": name, "address": f"{id} Main St", "status": "occupied", "currentRent": rent}
+
+
+def _ids(hits):
+    return [record_id for _, _, record_id in hits]
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_sync_applies_only_the_changed_rows():
+    store = PortfolioStore()
+    store.insert_many("properties", [_property(1, "Harbor View"), _property(2, "Maple Court")])
+    index = RetrievalIndex()
+    index.sync(store)
+    assert _ids(index.search("harbor")) == [1]
+
+    store.insert_many("properties", [_property(1, "Willow Lofts")])
+    index.sync(store)
+
+    assert index.version == store.version
+    assert index.search("harbor") == []
+    assert _ids(index.search("willow")) == [1]
+    assert len(index) == 2
+
+
+def test_sync_rebuilds_after_another_process_writes(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    store = PortfolioStore(path)
+    store.insert_many("properties", [_property(1, "Harbor View")])
+    index = RetrievalIndex()
+    index.sync(store)
+
+    PortfolioStore(path).insert_many("properties", [_property(2, "Cedar House")])
+    index.sync(store)
+
+    assert index.version == store.version
+    assert _ids(index.search("cedar")) == [2]
+
+
+def test_no_write_is_lost_when_syncing_alongside_writers():
+    store = PortfolioStore()
+    index = RetrievalIndex()
+    index.sync(store)
+    done = threading.Event()
+
+    def write():
+        for i in range(1, 201):
+            store.insert_many("properties", [_property(i, f"Tower{i}")])
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not done.is_set():
+        index.sync(store)
+    writer.join()
+    index.sync(store)
+
+    assert len(index) == 200
+    assert all(_ids(index.search(f"tower{i}", k=1)) == [i] for i in range(1, 201))
+
+
+def test_background_sync_builds_the_index_off_the_calling_thread():
+    store = PortfolioStore()
+    store.insert_many("properties", [_property(1, "Harbor View")])
+    index = RetrievalIndex()
+
+    index.sync(store, background=True)
+    _wait_until(lambda: index.version == store.version)
+
+    assert _ids(index.search("harbor")) == [1]
+
+
+def test_retrieve_filters_on_price_and_returns_records():
+    store = PortfolioStore()
+    store.insert_many("properties", [_property(1, "Harbor View", 2500.0), _property(2, "Maple Court", 1200.0)])
+    index = RetrievalIndex()
+    index.sync(store)
+
+    hits = retrieve(index, store, "occupied properties under $2,000")
+
+    assert parse_price_filter("under $2k") == (None, 2000.0)
+    assert [(table, record["id"]) for table, record in hits] == [("properties", 2)]
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from llm import LLMResponse
+from scheduler import BACKGROUND, INTERACTIVE, ModelScheduler, ScheduledBackend, is_retryable
+
+
+class _QuotaError(Exception):
+    code = 429
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_retryable_errors_are_retried_and_others_raise_at_once():
+    scheduler = ModelScheduler(6000, 10 ** 6, max_retries=2, base_delay=0.001)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _QuotaError()
+        return "ok"
+
+    assert scheduler.run(flaky) == "ok"
+    assert scheduler.stats()["retries"] == 2
+    with pytest.raises(ValueError):
+        scheduler.run(lambda: (_ for _ in ()).throw(ValueError("bad prompt")))
+    assert scheduler.stats()["retries"] == 2
+    assert is_retryable(TimeoutError()) and not is_retryable(ValueError())
+
+
+def test_gives_up_after_max_retries():
+    scheduler = ModelScheduler(6000, 10 ** 6, max_retries=1, base_delay=0.001)
+
+    def always_fails():
+        raise _QuotaError()
+
+    with pytest.raises(_QuotaError):
+        scheduler.run(always_fails)
+    assert scheduler.stats()["retries"] == 1
+
+
+def test_interactive_calls_overtake_queued_background_calls():
+    scheduler = ModelScheduler(requests_per_minute=240, tokens_per_minute=10 ** 6)
+    for _ in range(240):
+        scheduler.run(lambda: None)
+    order = []
+
+    def call(label, priority):
+        scheduler.run(lambda: order.append(label), priority=priority)
+
+    threads = [threading.Thread(target=call, args=(f"background {i}", BACKGROUND)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    _wait_until(lambda: scheduler.stats()["queue_depth"]["background"] == 2)
+    threads.append(threading.Thread(target=call, args=("chat", INTERACTIVE)))
+    threads[-1].start()
+    for thread in threads:
+        thread.join()
+
+    assert order[0] == "chat"
+    assert scheduler.stats()["throttled"] >= 2
+
+
+def test_scheduled_backend_corrects_the_token_charge_from_usage():
+    class Backend:
+        model_name = "test-model"
+
+        def generate_content(self, prompt, stream=False, generation_config=None):
+            return LLMResponse(["ok"], prompt_tokens=900)
+
+        def count_tokens(self, prompt):
+            return 900
+
+    scheduler = ModelScheduler(6000, tokens_per_minute=1000)
+    backend = ScheduledBackend(Backend(), scheduler)
+
+    assert backend.generate_content("short prompt", priority=INTERACTIVE).text == "ok"
+    assert scheduler._tokens.delay(200) > 0
@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def _run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    leader = _run_concurrently(1, lambda: results.append(flight.do("key", compute)))
+    started.wait(5)
+    waiters = _run_concurrently(4, lambda: results.append(flight.do("key", compute)))
+    # Waiters register before the leader is released
+    _wait_until(lambda: flight.stats()["shared"] >= 4)
+    release.set()
+    for thread in leader + waiters:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["answer"] * 5
+    assert flight.stats() == {"leaders": 1, "shared": 4, "in_flight": 0}
+
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise ValueError("quota")
+
+    def call():
+        try:
+            flight.do("key", compute)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = _run_concurrently(1, call)
+    started.wait(5)
+    threads += _run_concurrently(2, call)
+    _wait_until(lambda: flight.stats()["shared"] >= 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ["quota"] * 3
+
+
+def test_a_cancelled_leader_hands_over_to_a_waiter():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def cancelled():
+        calls.append("cancelled")
+        started.set()
+        release.wait(5)
+        raise KeyboardInterrupt
+
+    def leader():
+        with pytest.raises(KeyboardInterrupt):
+            flight.do("key", cancelled)
+
+    def compute():
+        calls.append("retried")
+        return "answer"
+
+    threads = _run_concurrently(1, leader)
+    started.wait(5)
+    threads += _run_concurrently(1, lambda: results.append(flight.do("key", compute)))
+    _wait_until(lambda: flight.stats()["shared"] >= 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ["cancelled", "retried"]
+    assert results == ["answer"]
+
+
+def test_different_keys_run_independently_and_sequential_calls_rerun():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.do("a", lambda: 3) == 3
+    assert flight.stats()["leaders"] == 3
+
+
+def test_waiters_time_out():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    threads = _run_concurrently(1, lambda: flight.do("key" * 8, slow))
+    started.wait(5)
+    with pytest.raises(TimeoutError):
+        flight.do("key" * 8, slow, timeout=0.05)
+    release.set()
+    threads[0].join(5)
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from spatial import CompetitorIndex, SpatialIndex, haversine_miles
+
+
+def _records(count, seed):
+    rng = random.Random(seed)
+    records = [
+        {"id": i, "latitude": rng.uniform(39.55, 39.95), "longitude": rng.uniform(-105.15, -104.70)}
+        for i in range(count)
+    ]
+    # A few without coordinates, which the index leaves out
+    records += [{"id": count + i, "latitude": None, "longitude": None} for i in range(3)]
+    return records
+
+
+def _brute_force(records, latitude, longitude, k, max_miles=None):
+    distances = sorted(
+        (haversine_miles(latitude, longitude, r["latitude"], r["longitude"]), r["id"])
+        for r in records if r["latitude"] is not None
+    )
+    if max_miles is not None:
+        distances = [(miles, i) for miles, i in distances if miles <= max_miles]
+    return distances[:k]
+
+
+@pytest.mark.parametrize("cell_miles", [0.25, 1.0, 5.0])
+def test_nearest_agrees_with_brute_force(cell_miles):
+    records = _records(2000, seed=1)
+    index = SpatialIndex(records, cell_miles)
+    rng = random.Random(2)
+    # Query points inside the records' area and well outside it
+    queries = [(rng.uniform(39.55, 39.95), rng.uniform(-105.15, -104.70)) for _ in range(30)]
+    queries += [(40.5, -104.9), (39.0, -106.0)]
+    for latitude, longitude in queries:
+        for k in (1, 7, 50):
+            found = [(miles, record["id"]) for miles, record in index.nearest(latitude, longitude, k)]
+            expected = _brute_force(records, latitude, longitude, k)
+            assert [miles for miles, _ in found] == pytest.approx([miles for miles, _ in expected])
+            assert {i for _, i in found} == {i for _, i in expected}
+
+
+def test_nearest_within_a_radius_agrees_with_brute_force():
+    records = _records(1000, seed=3)
+    index = SpatialIndex(records)
+    for k, max_miles in ((10, 1.5), (500, 3.0)):
+        found = index.nearest(39.75, -104.9, k, max_miles)
+        expected = _brute_force(records, 39.75, -104.9, k, max_miles)
+        assert [record["id"] for _, record in found] == [i for _, i in expected]
+
+
+def test_within_returns_every_record_in_range():
+    records = _records(1000, seed=4)
+    index = SpatialIndex(records)
+    found = {record["id"] for _, record in index.within(39.7, -105.0, 2.0)}
+    assert found == {i for _, i in _brute_force(records, 39.7, -105.0, len(records), 2.0)}
+
+
+def test_competitors_without_coordinates_fall_back_to_recorded_proximity():
+    competitors = [{"id": i, "proximity": p, "latitude": None, "longitude": None} for i, p in enumerate([3.0, 1.0, 2.0])]
+    index = CompetitorIndex(competitors)
+    assert not index.measures({"latitude": 39.7, "longitude": -105.0})
+    assert [c["id"] for _, c in index.nearest({"latitude": 39.7, "longitude": -105.0}, 2)] == [1, 2]
@@ -0,0 +1,57 @@
+import json
+
+from structured_output import PartialJSONParser
+
+DOCUMENT = {
+    "trend": "increasing",
+    "insights": ['rents up 5% in "downtown"', "a brace } and bracket ] inside text", "back\\slash"],
+    "recommendations": ["raise rents", "tab\there"],
+}
+
+
+def _feed(chunks):
+    parser = PartialJSONParser()
+    snapshots = [snapshot for snapshot in (parser.feed(chunk) for chunk in chunks) if snapshot is not None]
+    return parser, snapshots
+
+
+def test_one_character_at_a_time_gives_growing_snapshots_and_the_exact_text():
+    text = json.dumps(DOCUMENT)
+    parser, snapshots = _feed(text)
+
+    assert parser.text == text
+    assert snapshots[-1] == DOCUMENT
+    # The opening brace alone gives an empty object
+    assert snapshots[:2] == [{}, {"trend": "increasing"}]
+    # Each snapshot extends the one before it
+    for earlier, later in zip(snapshots, snapshots[1:]):
+        for key, value in earlier.items():
+            assert later[key][:len(value)] == value if isinstance(value, list) else later[key] == value
+
+
+def test_escapes_split_across_chunks_do_not_end_strings_early():
+    text = json.dumps(DOCUMENT)
+    # Cut right after every backslash so each escape spans two chunks
+    chunks, start = [], 0
+    for index, char in enumerate(text):
+        if char == "\\":
+            chunks.append(text[start:index + 1])
+            start = index + 1
+    chunks.append(text[start:])
+
+    parser, snapshots = _feed(chunks)
+
+    assert snapshots[-1] == DOCUMENT
+    for snapshot in snapshots:
+        for insight in snapshot.get("insights", []):
+            assert insight in DOCUMENT["insights"]
+
+
+def test_snapshots_hold_only_completed_fields():
+    parser = PartialJSONParser()
+    assert parser.feed('{"trend": "incr') == {}
+    # An array shows up empty as soon as it opens, and gains each item once the item is complete
+    assert parser.feed('easing", "insights": ["fir') == {"trend": "increasing", "insights": []}
+    assert parser.feed('st"') == {"trend": "increasing", "insights": ["first"]}
+    assert parser.feed("]}") is None
+    assert parser.text == '{"trend": "increasing", "insights": ["first"]}'